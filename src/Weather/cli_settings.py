@@ -0,0 +1,14 @@
+"""
+Settings for the lean entry point cli.py: the settings of the project, with only the apps of the data pipeline
+
+Leaving out the admin, auth, sessions, messages and staticfiles apps saves importing them, their models and the admin
+modules of the project on every start of a command.
+"""
+
+from Weather.settings import *  # noqa: F401, F403
+
+INSTALLED_APPS = ['common', 'data_sources', 'measurements', 'stations']
+
+MIDDLEWARE = []
+
+TEMPLATES = []
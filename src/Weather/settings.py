@@ -38,6 +38,8 @@ PREREQ_APPS = [
 ]
 
 PROJECT_APPS = [
+    'api',
+    'benchmarks',
     'common',
     'data_sources',
     'measurements',
@@ -86,6 +88,25 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/2.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Responses of the JSON api. Imports change the cache keys, so entries never expire but are evicted when full.
+    'api': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'api',
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100,
+            'CULL_FREQUENCY': 4,
+        },
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/2.0/ref/settings/#auth-password-validators
 
@@ -108,3 +129,29 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/2.0/howto/static-files/
 
 STATIC_URL = '/static/'
+
+# Logging
+# https://docs.djangoproject.com/en/2.0/topics/logging/
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {
+            'format': '{asctime} {levelname} {name}: {message}',
+            'style': '{',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'simple',
+        },
+    },
+    'loggers': {
+        app: {
+            'handlers': ['console'],
+            'level': 'INFO',
+        } for app in PROJECT_APPS
+    },
+}
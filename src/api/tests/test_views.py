@@ -0,0 +1,118 @@
+import os.path
+import tempfile
+from datetime import date, datetime, timedelta
+from unittest import mock
+
+import pytz
+from django.core.cache import caches
+from django.test import TestCase
+
+from common import utils
+from common.utils import touch_last_import
+from measurements.latest import LatestObservations
+from measurements.models import DailyAggregate, Measurement
+from stations.models import Station
+from stations.spatial import StationIndex
+
+
+class ApiTest(TestCase):
+    """
+    Query the JSON api with a few stations and measurements, in a temporary data directory
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for patcher in [
+            mock.patch('common.utils.last_import_file', os.path.join(directory.name, 'last_import')),
+            mock.patch.object(LatestObservations, 'FILE', os.path.join(directory.name, 'latest.pickle')),
+            mock.patch.object(LatestObservations, '_instance', None),
+            mock.patch.object(StationIndex, '_instance', None),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        caches['api'].clear()
+        self.addCleanup(caches['api'].clear)
+
+        for code, longitude, latitude, name in [(260, 5.18, 52.1, 'DE BILT'), (280, 6.585, 53.125, 'EELDE'),
+                                                (310, 3.596, 51.442, 'VLISSINGEN')]:
+            station = Station.objects.create(code=code, longitude=longitude, latitude=latitude, altitude=0, name=name)
+            start = datetime(2021, 1, 28, tzinfo=pytz.utc)
+            Measurement.objects.bulk_create(
+                Measurement(station=station, time=start + timedelta(hours=hour), temperature=hour)
+                for hour in range(3)
+            )
+            DailyAggregate.objects.create(station=station, day=date(2021, 1, 28), temperature_min=0,
+                                          temperature_max=2, temperature_sum=3, temperature_count=3)
+        touch_last_import()
+
+    def test_measurements_pages_with_a_cursor(self):
+        response = self.client.get('/api/measurements/', {'stations': '260:280', 'fields': 'temperature', 'limit': 4})
+        self.assertEqual(response.status_code, 200)
+        page = response.json()
+        self.assertEqual([(result['station'], result['temperature']) for result in page['results']],
+                         [(260, 0), (260, 1), (260, 2), (280, 0)])
+        self.assertIn('after=280:2021012800', page['next'])
+
+        page = self.client.get(page['next']).json()
+        self.assertEqual([(result['station'], result['time'], result['temperature']) for result in page['results']],
+                         [(280, '2021-01-28T01:00:00Z', 1), (280, '2021-01-28T02:00:00Z', 2)])
+        self.assertIsNone(page['next'])
+
+    def test_aggregates_page_with_a_cursor(self):
+        page = self.client.get('/api/aggregates/daily/', {'fields': 'temperature_max', 'limit': 2}).json()
+        self.assertEqual([result['station'] for result in page['results']], [260, 280])
+        self.assertIn('after=280:20210128', page['next'])
+
+        page = self.client.get(page['next']).json()
+        self.assertEqual(page['results'], [{'station': 310, 'day': '2021-01-28', 'temperature_max': 2.0}])
+        self.assertIsNone(page['next'])
+
+    def test_invalid_parameters(self):
+        for url, params, error in [
+            ('/api/measurements/', {'after': '260'}, 'Invalid cursor 260'),
+            ('/api/measurements/', {'after': '260:2021012899'}, 'Invalid cursor 260:2021012899'),
+            ('/api/aggregates/daily/', {'after': 'x:20210128'}, 'Invalid cursor x:20210128'),
+            ('/api/measurements/', {'fields': 'temperature,humidity'}, 'Unknown fields humidity.'),
+            ('/api/measurements/', {'start': '2021-01-28'}, 'Invalid start 2021-01-28, expected YYYYMMDD'),
+            ('/api/measurements/', {'limit': 0}, 'The limit must be between 1 and'),
+        ]:
+            with self.subTest(url=url, params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertTrue(response.json()['error'].startswith(error), response.json()['error'])
+
+    def test_conditional_requests(self):
+        response = self.client.get('/api/stations/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        response = self.client.get('/api/stations/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # An import changes the ETag, so clients get the new data
+        last_import = datetime.now().timestamp() + 60
+        os.utime(utils.last_import_file, (last_import, last_import))
+        response = self.client.get('/api/stations/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_nearby_stations(self):
+        results = self.client.get('/api/stations/nearby/', {'latitude': 52, 'longitude': 5, 'k': 2}).json()['results']
+        self.assertEqual([result['code'] for result in results], [260, 310])
+        self.assertLess(results[0]['distance'], results[1]['distance'])
+
+        results = self.client.get('/api/stations/nearby/', {'latitude': 52.1, 'longitude': 5.18}).json()['results']
+        self.assertEqual([(result['code'], result['distance']) for result in results], [(260, 0)])
+
+        results = self.client.get('/api/stations/nearby/',
+                                  {'latitude': 52.1, 'longitude': 5.18, 'radius': 150}).json()['results']
+        self.assertEqual([result['code'] for result in results], [260, 310, 280])
+        results = self.client.get('/api/stations/nearby/',
+                                  {'latitude': 52.1, 'longitude': 5.18, 'radius': 10}).json()['results']
+        self.assertEqual([result['code'] for result in results], [260])
+
+        for k in [0, -1]:
+            response = self.client.get('/api/stations/nearby/', {'latitude': 52, 'longitude': 5, 'k': k})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'error': 'The number of stations k must be at least 1'})
@@ -0,0 +1,13 @@
+from django.urls import path
+
+from api import views
+
+urlpatterns = [
+    path('stations/', views.stations, name='stations'),
+    path('stations/nearby/', views.nearby_stations, name='nearby_stations'),
+    path('measurements/', views.measurements, name='measurements'),
+    path('measurements/latest/', views.latest_measurements, name='latest_measurements'),
+    path('measurements/downsampled/', views.downsampled_measurements, name='downsampled_measurements'),
+    path('aggregates/daily/', views.daily_aggregates, name='daily_aggregates'),
+    path('aggregates/monthly/', views.monthly_aggregates, name='monthly_aggregates'),
+]
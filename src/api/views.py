@@ -0,0 +1,303 @@
+import hashlib
+import json
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from functools import wraps
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pytz
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Model, Q
+from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET
+
+from common.utils import datetime_from_day_and_hour, last_import
+from data_sources.data_mode import DataMode
+from measurements.csv_exporter import CsvExporter
+from measurements.downsampling import Downsampler
+from measurements.latest import LatestObservations
+from measurements.models import Aggregate, DailyAggregate, Measurement, MonthlyAggregate
+from stations.models import Station
+from stations.spatial import StationIndex
+
+DEFAULT_LIMIT = 1000
+MAX_LIMIT = 5000
+DEFAULT_POINTS = 1000
+MAX_POINTS = 5000
+
+HOURLY_FIELDS = CsvExporter.MEASUREMENT_FIELDS[DataMode.per_hour][1:]
+AGGREGATE_FIELDS = [f'{field}_{statistic}'
+                    for field in Aggregate.FIELDS for statistic in ['min', 'max', 'sum', 'count']]
+
+
+class BadRequest(Exception):
+    pass
+
+
+class JSONEncoder(DjangoJSONEncoder):
+    """
+    JSON encoder that writes decimals as numbers instead of strings
+    """
+
+    def default(self, o):
+        if isinstance(o, Decimal):
+            return float(o)
+        return super().default(o)
+
+
+def json_api(view: Callable[..., Dict]) -> Callable[..., HttpResponse]:
+    """
+    Turn a view that returns a dictionary into a read-only, cached JSON endpoint
+
+    The data only changes when something is imported, so the time of the last import is used to:
+    - send ETag and Last-Modified headers, and answer a conditional request with 304 Not Modified
+    - key the response cache, so an import implicitly invalidates all cached responses
+
+    The response cache is the bounded 'api' cache, which evicts entries when it is full. Invalid query parameters are
+    answered with 400 Bad Request.
+    """
+
+    @wraps(view)
+    def cached_view(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        cache = caches['api']
+        key = _etag(request)
+        content = cache.get(key)
+        if content is None:
+            try:
+                content = json.dumps(view(request, *args, **kwargs), cls=JSONEncoder)
+            except BadRequest as e:
+                return JsonResponse({'error': str(e)}, status=400)
+            cache.set(key, content)
+        return HttpResponse(content, content_type='application/json')
+
+    conditional_view = condition(etag_func=_etag, last_modified_func=_last_modified)(cached_view)
+    # Clients may keep responses, but have to check with the ETag whether they are still valid
+    return require_GET(cache_control(no_cache=True)(conditional_view))
+
+
+def _etag(request: HttpRequest, *args, **kwargs) -> str:
+    changed = last_import()
+    version = changed.timestamp() if changed else None
+    return hashlib.md5(f'{version}:{request.get_full_path()}'.encode()).hexdigest()
+
+
+def _last_modified(request: HttpRequest, *args, **kwargs) -> Optional[datetime]:
+    return last_import()
+
+
+@json_api
+def stations(request: HttpRequest) -> Dict:
+    """
+    List the stations, optionally only those with the codes in the stations parameter
+    """
+
+    queryset = Station.objects.all()
+    codes = _parse_stations(request.GET.get('stations'))
+    if codes:
+        queryset = queryset.filter(code__in=codes)
+    return {'results': list(queryset.values(*CsvExporter.STATION_FIELDS))}
+
+
+@json_api
+def nearby_stations(request: HttpRequest) -> Dict:
+    """
+    Stations nearest to a location, with their distance in km
+
+    Query parameters:
+    - latitude, longitude: location in degrees
+    - k: number of stations, defaults to 1
+    - radius: return all stations within this number of km instead of the k nearest
+    """
+
+    params = request.GET
+    latitude = _parse_float(params.get('latitude'), 'latitude')
+    longitude = _parse_float(params.get('longitude'), 'longitude')
+    index = StationIndex.get()
+    if params.get('radius'):
+        nearby = index.within(latitude, longitude, _parse_float(params['radius'], 'radius'))
+    else:
+        k = _parse_int(params.get('k', 1), 'k')
+        if k < 1:
+            raise BadRequest('The number of stations k must be at least 1')
+        nearby = index.nearest(latitude, longitude, k)
+
+    results = []
+    for station, distance in nearby:
+        result = {field: getattr(station, field) for field in CsvExporter.STATION_FIELDS}
+        result['distance'] = round(distance, 3)
+        results.append(result)
+    return {'results': results}
+
+
+@json_api
+def measurements(request: HttpRequest) -> Dict:
+    """
+    Series of hourly measurements
+    """
+
+    return _series(request, Measurement, 'time', HOURLY_FIELDS, '%Y%m%d%H')
+
+
+@json_api
+def latest_measurements(request: HttpRequest) -> Dict:
+    """
+    Latest hourly measurement of every station, optionally only of the stations in the stations parameter
+    """
+
+    snapshot = LatestObservations.get()
+    codes = _parse_stations(request.GET.get('stations'))
+    observations = [snapshot.station(code) for code in codes] if codes else snapshot.all()
+    return {'results': [observation.as_dict() for observation in observations if observation is not None]}
+
+
+@json_api
+def downsampled_measurements(request: HttpRequest) -> Dict:
+    """
+    Hourly series of a single field, downsampled per station to at most the given number of points
+
+    Query parameters:
+    - stations: station codes separated by :
+    - field: name of the measurement field
+    - start, end: first and last day YYYYMMDD
+    - points: maximum number of points per station
+    - method: lttb or minmax
+    """
+
+    params = request.GET
+    codes = _parse_stations(params.get('stations'))
+    if not codes:
+        raise BadRequest('Choose one or more stations')
+    field = params.get('field')
+    if field not in HOURLY_FIELDS:
+        raise BadRequest(f'Unknown field {field}. Choose from: {", ".join(HOURLY_FIELDS)}')
+    points = _parse_int(params.get('points', DEFAULT_POINTS), 'points')
+    if not 3 <= points <= MAX_POINTS:
+        raise BadRequest(f'The number of points must be between 3 and {MAX_POINTS}')
+    method = params.get('method', 'lttb')
+    if method not in Downsampler.METHODS:
+        raise BadRequest(f'Unknown method {method}. Choose from: {", ".join(Downsampler.METHODS)}')
+    start, end = _parse_day(params.get('start'), 'start'), _parse_day(params.get('end'), 'end')
+
+    results = []
+    for code in codes:
+        times, values = Downsampler.series(code, field, start, end, points, method)
+        results.append({
+            'station': code,
+            'time': np.datetime_as_string(times.astype('datetime64[s]'), timezone='UTC').tolist(),
+            field: values.tolist(),
+        })
+    return {'results': results}
+
+
+@json_api
+def daily_aggregates(request: HttpRequest) -> Dict:
+    """
+    Series of daily aggregates of the hourly measurements
+    """
+
+    return _series(request, DailyAggregate, 'day', AGGREGATE_FIELDS, '%Y%m%d')
+
+
+@json_api
+def monthly_aggregates(request: HttpRequest) -> Dict:
+    """
+    Series of monthly aggregates of the hourly measurements
+    """
+
+    return _series(request, MonthlyAggregate, 'month', AGGREGATE_FIELDS, '%Y%m')
+
+
+def _series(request: HttpRequest, model: Model, time_field: str, fields: List[str], cursor_format: str) -> Dict:
+    """
+    Page through a series ordered by station and time, filtered by the query parameters:
+    - stations: station codes separated by :
+    - start, end: first and last day YYYYMMDD
+    - fields: field names separated by ,
+    - limit: maximum number of results
+    - after: cursor of the last result of the previous page
+
+    Pages use keyset pagination on the unique station and time: the next page starts after the station and time of
+    the last result, instead of skipping a number of rows. This keeps every page as cheap as the first one.
+    """
+
+    params = request.GET
+    selected_fields = params['fields'].split(',') if params.get('fields') else fields
+    unknown_fields = set(selected_fields) - set(fields)
+    if unknown_fields:
+        raise BadRequest(f'Unknown fields {", ".join(sorted(unknown_fields))}. Choose from: {", ".join(fields)}')
+    limit = _parse_int(params.get('limit', DEFAULT_LIMIT), 'limit')
+    if not 1 <= limit <= MAX_LIMIT:
+        raise BadRequest(f'The limit must be between 1 and {MAX_LIMIT}')
+
+    queryset = model.objects.all()
+    codes = _parse_stations(params.get('stations'))
+    if codes:
+        queryset = queryset.filter(station_id__in=codes)
+    start, end = _parse_day(params.get('start'), 'start'), _parse_day(params.get('end'), 'end')
+    if time_field == 'time':
+        start = start and datetime_from_day_and_hour(start, 0)
+        end = end and datetime_from_day_and_hour(end + timedelta(days=1), 0)
+        if end:
+            queryset = queryset.filter(time__lt=end)
+    elif end:
+        queryset = queryset.filter(**{f'{time_field}__lte': end})
+    if start:
+        queryset = queryset.filter(**{f'{time_field}__gte': start})
+    if params.get('after'):
+        station, time = _parse_cursor(params['after'], cursor_format, time_field == 'time')
+        queryset = queryset.filter(Q(station_id__gt=station) | Q(station_id=station, **{f'{time_field}__gt': time}))
+
+    # One result more than the limit shows whether there is a next page
+    names = ['station', time_field] + selected_fields
+    rows = queryset.order_by('station_id', time_field).values_list('station_id', time_field, *selected_fields)
+    results = [dict(zip(names, row)) for row in rows[:limit + 1]]
+
+    next_page = None
+    if len(results) > limit:
+        results = results[:limit]
+        last = results[-1]
+        next_params = params.copy()
+        next_params['after'] = f'{last["station"]}:{last[time_field].strftime(cursor_format)}'
+        next_page = f'{request.path}?{next_params.urlencode(safe=":,")}'
+    return {'results': results, 'next': next_page}
+
+
+def _parse_stations(stations: Optional[str]) -> Optional[List[int]]:
+    if not stations:
+        return None
+    return [_parse_int(code, 'stations') for code in stations.split(':')]
+
+
+def _parse_int(value: str, name: str) -> int:
+    try:
+        return int(value)
+    except ValueError:
+        raise BadRequest(f'Invalid {name}: {value}')
+
+
+def _parse_float(value: Optional[str], name: str) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise BadRequest(f'Invalid {name}: {value}')
+
+
+def _parse_day(day: Optional[str], name: str) -> Optional[date]:
+    if not day:
+        return None
+    try:
+        return datetime.strptime(day, '%Y%m%d').date()
+    except ValueError:
+        raise BadRequest(f'Invalid {name} {day}, expected YYYYMMDD')
+
+
+def _parse_cursor(cursor: str, cursor_format: str, aware: bool):
+    try:
+        station, time = cursor.split(':')
+        time = datetime.strptime(time, cursor_format)
+        return int(station), pytz.utc.localize(time) if aware else time.date()
+    except ValueError:
+        raise BadRequest(f'Invalid cursor {cursor}')
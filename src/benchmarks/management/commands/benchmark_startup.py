@@ -0,0 +1,74 @@
+import json
+import os.path
+
+from django.core.management import BaseCommand, CommandError
+
+from benchmarks.startup import StartupBenchmark
+from common.utils import data_dir
+
+BENCHMARK_DIR = os.path.join(data_dir, 'benchmarks')
+
+
+class Command(BaseCommand):
+    help = 'Measure how long the management commands take to start, and compare the results with a baseline'
+
+    def handle(self, *args, **options):
+        entry_points = options['entry_points'].split(',') if options['entry_points'] else None
+        commands = options['commands'].split(',') if options['commands'] else None
+        try:
+            results = StartupBenchmark(entry_points, commands, options['repeat'], options['top']).run()
+        except AssertionError as e:
+            raise CommandError(str(e))
+
+        os.makedirs(BENCHMARK_DIR, exist_ok=True)
+        full_path_to_file = os.path.join(BENCHMARK_DIR, f'startup_{results["created"][:19].replace(":", "")}.json')
+        self._save(results, full_path_to_file)
+        self._print(results)
+        print(f'Results have been saved to {full_path_to_file}')
+
+        baseline_path = options['baseline']
+        if options['save_baseline']:
+            self._save(results, baseline_path)
+            print(f'Results have been saved as baseline to {baseline_path}')
+            return
+        if not os.path.exists(baseline_path):
+            print(f'No baseline at {baseline_path} to compare with, save one with --save-baseline')
+            return
+
+        with open(baseline_path, 'r') as f:
+            baseline = json.load(f)
+        regressions = StartupBenchmark.compare(results, baseline, options['tolerance'])
+        if regressions:
+            raise CommandError(f'{len(regressions)} regressions compared with {baseline_path}:\n' +
+                               '\n'.join(regressions))
+        print(f'No regressions compared with {baseline_path}')
+
+    def add_arguments(self, parser):
+        help_entry_points = 'Entry points separated by ,, defaults to manage.py and cli.py'
+        parser.add_argument('--entry-points', type=str, help=help_entry_points)
+        help_commands = 'Commands separated by ,, defaults to the commands of cli.py'
+        parser.add_argument('--commands', type=str, help=help_commands)
+        help_repeat = 'Number of times every command is started, of which the fastest counts'
+        parser.add_argument('--repeat', type=int, default=5, help=help_repeat)
+        help_top = 'Number of packages with the largest import time to show per command'
+        parser.add_argument('--top', type=int, default=5, help=help_top)
+        help_baseline = 'Full path to the baseline results'
+        parser.add_argument('--baseline', type=str, default=os.path.join(BENCHMARK_DIR, 'startup_baseline.json'),
+                            help=help_baseline)
+        help_save_baseline = 'Save the results as the new baseline instead of comparing with it'
+        parser.add_argument('--save-baseline', action='store_true', help=help_save_baseline)
+        help_tolerance = 'Fraction by which a command may start slower than the baseline before it is a regression'
+        parser.add_argument('--tolerance', type=float, default=0.25, help=help_tolerance)
+
+    @staticmethod
+    def _save(results, full_path_to_file: str):
+        with open(full_path_to_file, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    @staticmethod
+    def _print(results):
+        print(f'{"command":>40} {"seconds":>9} {"imports s":>10} {"modules":>8}')
+        for name, result in results['benchmarks'].items():
+            print(f'{name:>40} {result["seconds"]:>9.3f} {result["import_seconds"]:>10.3f} {result["modules"]:>8}')
+            for package, seconds in result['largest_packages'].items():
+                print(f'{package:>40} {"":>9} {seconds:>10.3f}')
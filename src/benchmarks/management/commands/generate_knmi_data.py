@@ -0,0 +1,32 @@
+import os.path
+
+from django.core.management import BaseCommand
+
+from benchmarks.synthetic import SyntheticKnmi
+from common.utils import data_dir
+from data_sources.data_mode import DataMode
+
+
+class Command(BaseCommand):
+    help = 'Write a KNMI csv file with synthetic daily or hourly measurements'
+
+    def handle(self, *args, **options):
+        data_mode = DataMode(options['data_mode'])
+        full_path_to_file = options['file'] or os.path.join(data_dir, f'synthetic_{data_mode.name}_knmi.csv')
+        nr_lines = SyntheticKnmi.write(data_mode, full_path_to_file, options['stations'], options['years'],
+                                       options['start_year'], options['seed'])
+        print(f'Successfully wrote {nr_lines} lines to {full_path_to_file}')
+
+    def add_arguments(self, parser):
+        help_data_mode = 'Data mode: day or hour'
+        parser.add_argument('data_mode', type=str, help=help_data_mode)
+        help_file = 'Full path to the csv file, defaults to synthetic_<data mode>_knmi.csv in the data directory'
+        parser.add_argument('--file', type=str, help=help_file)
+        help_stations = 'Number of stations'
+        parser.add_argument('--stations', type=int, default=10, help=help_stations)
+        help_years = 'Number of years per station'
+        parser.add_argument('--years', type=int, default=1, help=help_years)
+        help_start_year = 'First year of the measurements'
+        parser.add_argument('--start-year', type=int, default=2015, help=help_start_year)
+        help_seed = 'Seed of the random measurements'
+        parser.add_argument('--seed', type=int, default=1, help=help_seed)
@@ -0,0 +1,89 @@
+import json
+import os.path
+import tempfile
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+
+from benchmarks.suite import BenchmarkSuite
+from common.utils import data_dir
+
+BENCHMARK_DIR = os.path.join(data_dir, 'benchmarks')
+
+
+class Command(BaseCommand):
+    help = 'Benchmark import, export and queries on synthetic KNMI data and compare the results with a baseline'
+
+    def handle(self, *args, **options):
+        names = options['benchmarks'].split(',') if options['benchmarks'] else None
+        with tempfile.TemporaryDirectory() as work_dir:
+            # Never touch the real database: run against a fresh test database in the work directory
+            connection.settings_dict['TEST']['NAME'] = os.path.join(work_dir, 'benchmark.sqlite3')
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                suite = BenchmarkSuite(work_dir, options['stations'], options['years'], options['seed'],
+                                       options['repeat'], memory=not options['no_memory'])
+                results = suite.run(names)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        os.makedirs(BENCHMARK_DIR, exist_ok=True)
+        full_path_to_file = os.path.join(BENCHMARK_DIR, f'results_{results["created"][:19].replace(":", "")}.json')
+        self._save(results, full_path_to_file)
+        self._print(results)
+        print(f'Results have been saved to {full_path_to_file}')
+
+        baseline_path = options['baseline']
+        if options['save_baseline']:
+            self._save(results, baseline_path)
+            print(f'Results have been saved as baseline to {baseline_path}')
+            return
+        if not os.path.exists(baseline_path):
+            print(f'No baseline at {baseline_path} to compare with, save one with --save-baseline')
+            return
+
+        with open(baseline_path, 'r') as f:
+            baseline = json.load(f)
+        try:
+            regressions = BenchmarkSuite.compare(results, baseline, options['tolerance'])
+        except AssertionError as e:
+            raise CommandError(str(e))
+        if regressions:
+            raise CommandError(f'{len(regressions)} regressions compared with {baseline_path}:\n' +
+                               '\n'.join(regressions))
+        print(f'No regressions compared with {baseline_path}')
+
+    def add_arguments(self, parser):
+        help_stations = 'Number of stations in the synthetic data'
+        parser.add_argument('--stations', type=int, default=5, help=help_stations)
+        help_years = 'Number of years per station in the synthetic data'
+        parser.add_argument('--years', type=int, default=1, help=help_years)
+        help_seed = 'Seed of the synthetic data'
+        parser.add_argument('--seed', type=int, default=1, help=help_seed)
+        help_benchmarks = 'Names of the benchmarks to measure separated by ,, defaults to all'
+        parser.add_argument('--benchmarks', type=str, help=help_benchmarks)
+        help_repeat = 'Number of times every benchmark is timed, of which the fastest counts'
+        parser.add_argument('--repeat', type=int, default=3, help=help_repeat)
+        help_no_memory = 'Skip measuring the peak memory, which runs every benchmark a second time'
+        parser.add_argument('--no-memory', action='store_true', help=help_no_memory)
+        help_baseline = 'Full path to the baseline results'
+        parser.add_argument('--baseline', type=str, default=os.path.join(BENCHMARK_DIR, 'baseline.json'),
+                            help=help_baseline)
+        help_save_baseline = 'Save the results as the new baseline instead of comparing with it'
+        parser.add_argument('--save-baseline', action='store_true', help=help_save_baseline)
+        help_tolerance = 'Fraction by which a result may be worse than the baseline before it is a regression'
+        parser.add_argument('--tolerance', type=float, default=0.25, help=help_tolerance)
+
+    @staticmethod
+    def _save(results, full_path_to_file: str):
+        with open(full_path_to_file, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    @staticmethod
+    def _print(results):
+        print(f'{"benchmark":>28} {"rows":>9} {"seconds":>9} {"rows/s":>10} {"peak MB":>9}')
+        for name, result in results['benchmarks'].items():
+            peak_memory = result.get('peak_memory_mb')
+            print(f'{name:>28} {result["rows"]:>9} {result["seconds"]:>9.3f} {result["rows_per_second"] or 0:>10.0f} '
+                  f'{"" if peak_memory is None else f"{peak_memory:.1f}":>9}')
+        print(f'{"database size":>28} {results["database_size_mb"]:.1f} MB')
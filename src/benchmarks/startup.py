@@ -0,0 +1,119 @@
+import os
+import platform
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import django
+import pytz
+
+from common.utils import src_dir
+
+
+class StartupBenchmark:
+    """
+    Measure how long management commands take to start, per entry point
+
+    Every command is started as `python -X importtime <entry point> <command> --help`, which loads the settings and
+    the apps, imports the command and exits before it does any work. The fastest of a number of runs counts. The
+    import times that Python reports are summed per top-level package, which shows what makes up the startup.
+    """
+
+    ENTRY_POINTS = ['manage.py', 'cli.py']
+    COMMANDS = ['download_from_knmi', 'export_measurements', 'reset_stations']
+
+    def __init__(self, entry_points: List[str] = None, commands: List[str] = None, repeat: int = 5, top: int = 10):
+        """
+        :param entry_points: Scripts in the source directory to start the commands with
+        :param commands: Names of the management commands
+        :param repeat: Number of times every command is started
+        :param top: Number of packages with the largest import time to report per command
+        """
+
+        self.entry_points = entry_points or self.ENTRY_POINTS
+        self.commands = commands or self.COMMANDS
+        self.repeat = repeat
+        self.top = top
+
+    def run(self) -> Dict:
+        """
+        :return: Environment and the results per entry point and command
+        """
+
+        results = {}
+        for entry_point in self.entry_points:
+            for command in self.commands:
+                results[f'{entry_point} {command}'] = self._measure(entry_point, command)
+        return {
+            'created': datetime.now(tz=pytz.utc).isoformat(),
+            'environment': {'python': platform.python_version(), 'django': django.get_version()},
+            'benchmarks': results,
+        }
+
+    def _measure(self, entry_point: str, command: str) -> Dict:
+        # Every entry point chooses its own settings
+        env = {name: value for name, value in os.environ.items() if name != 'DJANGO_SETTINGS_MODULE'}
+        seconds, import_times = None, None
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            completed = subprocess.run([sys.executable, '-X', 'importtime', entry_point, command, '--help'],
+                                       cwd=src_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                       universal_newlines=True)
+            duration = time.perf_counter() - start
+            if completed.returncode != 0:
+                raise AssertionError(f'{entry_point} {command} failed:\n{completed.stderr[-2000:]}')
+            if seconds is None or duration < seconds:
+                seconds, import_times = duration, self._parse_import_times(completed.stderr)
+
+        packages = defaultdict(float)
+        for module, self_time in import_times:
+            packages[module.split('.')[0]] += self_time
+        return {
+            'seconds': seconds,
+            'import_seconds': sum(packages.values()),
+            'modules': len(import_times),
+            'largest_packages': dict(sorted(packages.items(), key=lambda package: package[1], reverse=True)[:self.top]),
+        }
+
+    @staticmethod
+    def _parse_import_times(output: str) -> List[Tuple[str, float]]:
+        """
+        Parse the report of -X importtime
+
+        >>> StartupBenchmark._parse_import_times('import time: self [us] | cumulative | imported package\\n'
+        ...                                      'import time:       481 |     258575 | django.core.management')
+        [('django.core.management', 0.000481)]
+
+        :return: Module and the time to import it in seconds, without the modules it imports, per imported module
+        """
+
+        import_times = []
+        for line in output.splitlines():
+            if not line.startswith('import time:'):
+                continue
+            self_time, _, module = line[len('import time:'):].split('|')
+            if not self_time.strip().isdigit():
+                continue
+            import_times.append((module.strip(), int(self_time) / 1e6))
+        return import_times
+
+    @staticmethod
+    def compare(results: Dict, baseline: Dict, tolerance: float = 0.25) -> List[str]:
+        """
+        Compare results with a baseline of the same machine
+
+        A command regresses when it takes longer to start than the baseline by more than the tolerance.
+
+        :return: Description of every regression
+        """
+
+        regressions = []
+        for name, result in results['benchmarks'].items():
+            base = baseline['benchmarks'].get(name)
+            if base is not None and result['seconds'] > base['seconds'] * (1 + tolerance):
+                regressions.append(f'{name}: starts in {result["seconds"]:.3f} s, baseline {base["seconds"]:.3f} s')
+        return regressions
+
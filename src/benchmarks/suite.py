@@ -0,0 +1,263 @@
+import logging
+import os.path
+import platform
+import time
+import tracemalloc
+from contextlib import ExitStack
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional
+from unittest import mock
+
+import django
+import pytz
+from django.core.management import call_command
+from django.db import connection
+
+from benchmarks.synthetic import SyntheticKnmi
+from data_sources.knmi import DataMode, Knmi
+from measurements.aggregates import Aggregates
+from measurements.columnar_exporter import ColumnarExporter
+from measurements.csv_exporter import CsvExporter
+from measurements.latest import LatestObservations
+from measurements.models import DailyAggregate, DailyMeasurement, Measurement, MonthlyAggregate
+from stations.models import Station
+
+logger = logging.getLogger(__name__)
+
+
+class Benchmark(NamedTuple):
+    """
+    A single benchmark: setup prepares the database, run does the measured work and returns the number of rows
+    """
+
+    name: str
+    run: Callable[[], int]
+    setup: Optional[Callable[[], None]] = None
+
+
+class BenchmarkSuite:
+    """
+    Measure the ingest, export and query hot paths on synthetic KNMI files of a given scale
+
+    Every benchmark is timed a number of times, of which the fastest counts, since slower runs only add noise from the
+    rest of the machine. It is run once more under tracemalloc for its peak memory, since tracing allocations slows
+    down the code it measures. The benchmarks depend on each other and run in order: the imports
+    fill the database that the exports and queries read.
+
+    The suite runs against whatever database is configured, so run it against a test database. The files that the
+    imports write next to the database, like the latest observations, the time of the last import and the rejects, are
+    kept in the work directory for the whole run.
+    """
+
+    START_YEAR = 2015
+
+    def __init__(self, work_dir: str, nr_stations: int = 5, years: int = 1, seed: int = 1, repeat: int = 3,
+                 memory: bool = True):
+        """
+        :param work_dir: Directory for the synthetic files and the exports
+        :param nr_stations: Number of stations in the synthetic files
+        :param years: Number of years per station in the synthetic files
+        :param seed: Seed of the synthetic measurements
+        :param repeat: Number of times every benchmark is timed
+        :param memory: Also measure the peak memory of every benchmark
+        """
+
+        self.work_dir = work_dir
+        self.nr_stations = nr_stations
+        self.years = years
+        self.seed = seed
+        self.repeat = repeat
+        self.memory = memory
+        self.hourly_file = os.path.join(work_dir, 'per_hour_knmi.csv')
+        self.daily_file = os.path.join(work_dir, 'per_day_knmi.csv')
+
+    def benchmarks(self) -> List[Benchmark]:
+        return [
+            Benchmark('reset_stations', self._reset_stations),
+            Benchmark('parse_hourly', lambda: self._parse_hourly(fast_parsing=True)),
+            Benchmark('parse_hourly_field_by_field', lambda: self._parse_hourly(fast_parsing=False)),
+            Benchmark('import_hourly', lambda: Knmi.import_weather(DataMode.per_hour, self.hourly_file),
+                      self._delete_hourly),
+            Benchmark('reimport_hourly', lambda: Knmi.import_weather(DataMode.per_hour, self.hourly_file)),
+            Benchmark('import_daily', lambda: Knmi.import_weather(DataMode.per_day, self.daily_file),
+                      DailyMeasurement.objects.all().delete),
+            Benchmark('rebuild_aggregates', Aggregates.rebuild),
+            Benchmark('export_csv', self._export_csv),
+            Benchmark('export_columns', self._export_columns),
+            Benchmark('query_station_month', self._query_station_month),
+            Benchmark('query_all_stations_day', self._query_all_stations_day),
+        ]
+
+    def run(self, names: List[str] = None) -> Dict:
+        """
+        Generate the synthetic files and run the benchmarks
+
+        :param names: Names of the benchmarks to run, defaults to all. The others still run to prepare the database,
+                      but are not measured.
+        :return: Scale, environment, database size and the results per benchmark
+        """
+
+        for data_mode, full_path_to_file in [(DataMode.per_hour, self.hourly_file),
+                                              (DataMode.per_day, self.daily_file)]:
+            nr_lines = SyntheticKnmi.write(data_mode, full_path_to_file, self.nr_stations, self.years,
+                                           self.START_YEAR, self.seed)
+            logger.info(f'{nr_lines} synthetic lines have been written to {full_path_to_file}')
+
+        # Benchmarks log every batch, which would end up in the measurements
+        logging.disable(logging.INFO)
+        try:
+            with self._work_data_files():
+                results = {}
+                for benchmark in self.benchmarks():
+                    if names is None or benchmark.name in names:
+                        results[benchmark.name] = self._measure(benchmark)
+                    else:
+                        self._call(benchmark)
+        finally:
+            logging.disable(logging.NOTSET)
+
+        return {
+            'created': datetime.now(tz=pytz.utc).isoformat(),
+            'scale': {'stations': self.nr_stations, 'years': self.years, 'seed': self.seed},
+            'environment': {
+                'python': platform.python_version(), 'django': django.get_version(), 'database': connection.vendor,
+                'machine': platform.machine(),
+            },
+            'database_size_mb': self._database_size() / 1e6,
+            'benchmarks': results,
+        }
+
+    def _work_data_files(self) -> ExitStack:
+        """
+        Redirect the files in data/ that the imports write to the work directory
+
+        The last import time is what the API derives its ETags from, so touching the real one would invalidate the
+        caches of every client.
+        """
+
+        stack = ExitStack()
+        for patcher in [
+            mock.patch('data_sources.knmi.data_dir', self.work_dir),
+            mock.patch('common.utils.last_import_file', os.path.join(self.work_dir, 'last_import')),
+            mock.patch.object(LatestObservations, 'FILE', os.path.join(self.work_dir, 'latest_observations.pickle')),
+            mock.patch.object(LatestObservations, '_instance', None),
+            mock.patch.object(LatestObservations, '_version', None),
+        ]:
+            stack.enter_context(patcher)
+        return stack
+
+    def _measure(self, benchmark: Benchmark) -> Dict:
+        seconds = None
+        for _ in range(self.repeat):
+            self._setup(benchmark)
+            start = time.perf_counter()
+            rows = benchmark.run()
+            duration = time.perf_counter() - start
+            seconds = duration if seconds is None else min(seconds, duration)
+        result = {'rows': rows, 'seconds': seconds, 'rows_per_second': rows / seconds if seconds else None}
+
+        if self.memory:
+            self._setup(benchmark)
+            tracemalloc.start()
+            try:
+                benchmark.run()
+                result['peak_memory_mb'] = tracemalloc.get_traced_memory()[1] / 1e6
+            finally:
+                tracemalloc.stop()
+        return result
+
+    def _call(self, benchmark: Benchmark):
+        self._setup(benchmark)
+        benchmark.run()
+
+    @staticmethod
+    def _setup(benchmark: Benchmark):
+        if benchmark.setup is not None:
+            benchmark.setup()
+
+    def _reset_stations(self) -> int:
+        call_command('reset_stations')
+        return Station.objects.count()
+
+    def _parse_hourly(self, fast_parsing: bool) -> int:
+        stations = {station.code: station for station in Station.objects.all()}
+        for cached_parser in [Knmi._parse_tenths, Knmi._parse_integer, Knmi._parse_day]:
+            cached_parser.cache_clear()
+        return sum(1 for _ in Knmi._read_hourly_measurements(self.hourly_file, stations, fast_parsing))
+
+    @staticmethod
+    def _delete_hourly():
+        Measurement.objects.all().delete()
+        DailyAggregate.objects.all().delete()
+        MonthlyAggregate.objects.all().delete()
+        LatestObservations.invalidate()
+
+    def _export_csv(self) -> int:
+        CsvExporter.export(DataMode.per_hour, directory=self.work_dir)
+        return Measurement.objects.count()
+
+    def _export_columns(self) -> int:
+        ColumnarExporter.export(DataMode.per_hour, directory=self.work_dir)
+        return Measurement.objects.count()
+
+    def _query_station_month(self) -> int:
+        rows = 0
+        for station in SyntheticKnmi.station_codes()[:self.nr_stations]:
+            for month in range(1, 13):
+                start = datetime(self.START_YEAR, month, 1, tzinfo=pytz.utc)
+                end = (start + timedelta(days=31)).replace(day=1)
+                rows += len(Measurement.objects.filter(station_id=station, time__gte=start, time__lt=end)
+                            .values_list('time', 'temperature'))
+        return rows
+
+    def _query_all_stations_day(self) -> int:
+        rows = 0
+        day = date(self.START_YEAR, 1, 1)
+        while day.year == self.START_YEAR:
+            start = datetime(day.year, day.month, day.day, tzinfo=pytz.utc)
+            rows += len(Measurement.objects.filter(time__gte=start, time__lt=start + timedelta(days=1))
+                        .values_list('station_id', 'temperature'))
+            day += timedelta(days=1)
+        return rows
+
+    @staticmethod
+    def _database_size() -> int:
+        if connection.vendor == 'sqlite':
+            return os.path.getsize(connection.settings_dict['NAME'])
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_database_size(current_database())')
+            return cursor.fetchone()[0]
+
+    @staticmethod
+    def compare(results: Dict, baseline: Dict, tolerance: float = 0.25) -> List[str]:
+        """
+        Compare results with a baseline of the same scale
+
+        A benchmark regresses when its rows per second dropped, or its peak memory grew, by more than the tolerance.
+        Memory may always grow by 1 MB, to ignore noise in small allocations. The database may not grow by more than
+        the tolerance either.
+
+        :return: Description of every regression
+        """
+
+        if results['scale'] != baseline['scale']:
+            raise AssertionError(f'Results of scale {results["scale"]} cannot be compared with a baseline of scale '
+                                 f'{baseline["scale"]}')
+
+        regressions = []
+        for name, result in results['benchmarks'].items():
+            base = baseline['benchmarks'].get(name)
+            if base is None:
+                continue
+            if result['rows_per_second'] and base['rows_per_second'] and \
+                    result['rows_per_second'] < base['rows_per_second'] * (1 - tolerance):
+                regressions.append(f'{name}: {result["rows_per_second"]:.0f} rows/s, '
+                                   f'baseline {base["rows_per_second"]:.0f} rows/s')
+            if 'peak_memory_mb' in result and 'peak_memory_mb' in base and \
+                    result['peak_memory_mb'] > base['peak_memory_mb'] * (1 + tolerance) + 1:
+                regressions.append(f'{name}: {result["peak_memory_mb"]:.1f} MB peak memory, '
+                                   f'baseline {base["peak_memory_mb"]:.1f} MB')
+        if results['database_size_mb'] > baseline['database_size_mb'] * (1 + tolerance):
+            regressions.append(f'database: {results["database_size_mb"]:.1f} MB, '
+                               f'baseline {baseline["database_size_mb"]:.1f} MB')
+        return regressions
@@ -0,0 +1,113 @@
+import os.path
+from datetime import date, timedelta
+from typing import List
+
+import numpy as np
+
+from common.utils import data_dir
+from data_sources.knmi import DataMode, Knmi
+
+
+class SyntheticKnmi:
+    """
+    Write KNMI csv files with random but plausible measurements, at any number of stations and years
+
+    Temperatures follow a yearly and a daily cycle, other measurements are uniformly distributed within their usual
+    range, and about one percent of the values is missing. The stations are taken from the stations file, so the
+    files can be imported after reset_stations.
+    """
+
+    HEADERS = {
+        DataMode.per_day: '# STN,YYYYMMDD,DDVEC,FHVEC,   FG,  FHX, FHXH,  FHN, FHNH,  FXX, FXXH,   TG,   TN,  TNH,   '
+                          'TX,  TXH, T10N,T10NH,   SQ,   SP,    Q,   DR,   RH,  RHX, RHXH, EV24,   PG,   PX,  PXH,   '
+                          'PN,  PNH,  VVN, VVNH,  VVX, VVXH,   NG,   UG,   UX,  UXH,   UN,  UNH',
+        DataMode.per_hour: '# STN,YYYYMMDD,   HH,   DD,   FH,   FF,   FX,    T, T10N,   TD,   SQ,    Q,   DR,   RH,    '
+                           'P,   VV,    N,    U,   WW,   IX,    M,    R,    S,    O,    Y',
+    }
+    NR_COLUMNS = {DataMode.per_day: 41, DataMode.per_hour: 25}
+
+    # Range of the encoded values per field, as they appear in the csv
+    RANGES = {
+        'wind_direction': (0, 360), 'wind_speed': (0, 150), 'vector_wind_speed': (0, 150), 'max_wind_speed': (0, 200),
+        'min_wind_speed': (0, 50), 'gust_of_wind': (0, 250), 'sunshine': (0, 10), 'sunshine_percentage': (0, 100),
+        'radiation': (0, 300), 'precipitation_duration': (0, 10), 'precipitation': (-1, 50),
+        'max_precipitation': (-1, 50), 'evapotranspiration': (0, 50), 'air_pressure': (9800, 10400),
+        'max_air_pressure': (9800, 10400), 'min_air_pressure': (9800, 10400), 'visibility': (0, 89),
+        'min_visibility': (0, 89), 'max_visibility': (0, 89), 'cloud_cover': (0, 9), 'relative_humidity': (30, 100),
+        'max_relative_humidity': (30, 100), 'min_relative_humidity': (30, 100), 'flag': (0, 1),
+    }
+    MISSING_FRACTION = 0.01
+
+    @staticmethod
+    def write(data_mode: DataMode, full_path_to_file: str, nr_stations: int = 10, years: int = 1,
+              start_year: int = 2015, seed: int = 1) -> int:
+        """
+        Write a synthetic KNMI csv file
+
+        :param data_mode: Write daily or hourly measurements
+        :param full_path_to_file: Full path to the csv file
+        :param nr_stations: Number of stations, at most the number of stations in the stations file
+        :param years: Number of years per station
+        :param start_year: First year of the measurements
+        :param seed: Seed of the random generator, so the same arguments always give the same file
+        :return: Number of data lines
+        """
+
+        random = np.random.RandomState(seed)
+        stations = SyntheticKnmi.station_codes()[:nr_stations]
+        first_day = date(start_year, 1, 1)
+        days = [first_day + timedelta(days=i) for i in range((date(start_year + years, 1, 1) - first_day).days)]
+        hourly = data_mode == DataMode.per_hour
+        hours = range(1, 25) if hourly else [None]
+
+        nr_lines = 0
+        with open(full_path_to_file, 'w') as f:
+            f.write(f'{SyntheticKnmi.HEADERS[data_mode]}\n')
+            # Identifying columns are the same for every station
+            day_column = [day.strftime('%Y%m%d') for day in days for _ in hours]
+            hour_column = [hour for _ in days for hour in hours]
+            day_of_year = np.array([day.timetuple().tm_yday for day in days for _ in hours])
+            hour_of_day = np.array([hour or 12 for _ in days for hour in hours])
+            for station in stations:
+                columns = SyntheticKnmi._columns(data_mode, random, day_of_year, hour_of_day)
+                identifiers = [[station] * len(day_column), day_column] + ([hour_column] if hourly else [])
+                lines = zip(*identifiers, *columns)
+                f.writelines(','.join(f'{value:>5}' for value in line) + '\n' for line in lines)
+                nr_lines += len(day_column)
+        return nr_lines
+
+    @staticmethod
+    def _columns(data_mode: DataMode, random: np.random.RandomState, day_of_year: np.ndarray,
+                 hour_of_day: np.ndarray) -> List[List[str]]:
+        if data_mode == DataMode.per_hour:
+            tenths, integers, flags = Knmi.HOURLY_TENTHS_COLUMNS, Knmi.HOURLY_INTEGER_COLUMNS, Knmi.HOURLY_FLAG_COLUMNS
+        else:
+            tenths, integers, flags = Knmi.DAILY_TENTHS_COLUMNS, Knmi.DAILY_INTEGER_COLUMNS, {}
+
+        # Measurements start after the station, day and, for hourly files, hour columns
+        first_column = 3 if data_mode == DataMode.per_hour else 2
+        columns = [[''] * len(day_of_year) for _ in range(first_column, SyntheticKnmi.NR_COLUMNS[data_mode])]
+        seasonal = 100 - 80 * np.cos(2 * np.pi * day_of_year / 366) - 40 * np.cos(2 * np.pi * hour_of_day / 24)
+        for field, index in {**tenths, **integers, **flags}.items():
+            if 'temperature' in field and not field.endswith('_hour'):
+                values = seasonal + random.normal(0, 30, len(day_of_year))
+            elif field.endswith('_hour'):
+                values = random.randint(1, 25, len(day_of_year))
+            else:
+                low, high = SyntheticKnmi.RANGES['flag' if field in flags else field]
+                values = random.randint(low, high + 1, len(day_of_year))
+            values = [str(value) for value in values.astype(np.int64).tolist()]
+            if field not in flags:
+                for missing in np.flatnonzero(random.random_sample(len(values)) < SyntheticKnmi.MISSING_FRACTION):
+                    values[missing] = ''
+            columns[index - first_column] = values
+        return columns
+
+    @staticmethod
+    def station_codes() -> List[int]:
+        """
+        :return: Codes of the stations in the stations file, as they are imported by reset_stations
+        """
+
+        with open(os.path.join(data_dir, 'stations.csv'), 'r') as f:
+            return [int(line.split()[1][:3]) for line in f if line.strip()]
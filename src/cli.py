@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+"""
+Lean entry point for the commands that cron starts many times per hour, like one download per station:
+
+    python cli.py download_from_knmi hour --stations 260
+    python cli.py export_measurements hour --stations 260
+    python cli.py reset_stations
+
+Unlike manage.py, it only loads the apps of the data pipeline, see Weather/cli_settings.py, skips the system checks,
+which manage.py runs for the whole project, and imports the standard distutils instead of the one of setuptools. Use
+manage.py for every other command. Track the startup with the benchmark_startup command.
+"""
+import os
+import sys
+
+# App of every command that can be started from here
+COMMANDS = {
+    'download_from_knmi': 'data_sources',
+    'export_measurements': 'measurements',
+    'reset_stations': 'stations',
+}
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in COMMANDS:
+        sys.stderr.write(f'Usage: {sys.argv[0]} {{{",".join(COMMANDS)}}} [options]\n')
+        sys.exit(1)
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "Weather.cli_settings")
+    # Django imports distutils, which setuptools replaces by its own copy that imports all of pkg_resources. That
+    # takes longer than the rest of Django. Python ships distutils up to 3.11, and setuptools installs its import hook
+    # before this script runs, unless SETUPTOOLS_USE_DISTUTILS=stdlib.
+    if sys.version_info < (3, 12) and '_distutils_hack' in sys.modules:
+        sys.modules['_distutils_hack'].remove_shim()
+    import django
+    from django.core.management import load_command_class
+
+    django.setup()
+    command = load_command_class(COMMANDS[sys.argv[1]], sys.argv[1])
+    command.requires_system_checks = False
+    command.run_from_argv(sys.argv)
@@ -0,0 +1,125 @@
+import logging
+from typing import Dict, Iterable, List, Type
+
+from django.db import connection, models
+
+from common import instrumentation
+
+logger = logging.getLogger(__name__)
+
+
+class BulkLoad:
+    """
+    Tune the database connection for loading many rows, and optionally drop and rebuild secondary indexes around it
+
+    On SQLite the database is switched to write-ahead logging, so readers like the admin and the API are not blocked
+    while the load writes, and they do not block it either. The journal mode is stored in the database and stays on
+    afterwards. The other pragmas only apply to this connection and are restored when the load ends:
+    - synchronous NORMAL, which is safe with write-ahead logging: a crash cannot corrupt the database, but may lose
+      the last transactions
+    - a larger page cache and memory-mapped reads
+    - temporary tables and indexes in memory, which speeds up rebuilding indexes
+
+    Dropping indexes only pays off for large backfills: inserting into the table no longer has to maintain them, but
+    queries that need them are slow until they have been rebuilt at the end of the load. Unique constraints are never
+    dropped, since the imports rely on them. Indexes that are missing when the load ends are created, so indexes that
+    were lost by an interrupted load are restored by the next one.
+    """
+
+    PRAGMAS = {
+        'synchronous': 'NORMAL',
+        # Negative sizes are in KiB
+        'cache_size': -64 * 1024,
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+    }
+
+    def __init__(self, model_classes: List[Type[models.Model]], drop_indexes: bool = False):
+        """
+        :param model_classes: Models whose tables are loaded
+        :param drop_indexes: Drop the secondary indexes of the models during the load
+        """
+
+        self.model_classes = model_classes
+        self.drop_indexes = drop_indexes
+        self._previous_pragmas: Dict[str, str] = {}
+
+    def __enter__(self) -> 'BulkLoad':
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode = WAL')
+                for pragma, value in self.PRAGMAS.items():
+                    cursor.execute(f'PRAGMA {pragma}')
+                    row = cursor.fetchone()
+                    # Pragmas that do not apply, like memory-mapped reads of an in-memory database, return nothing
+                    if row is None:
+                        continue
+                    self._previous_pragmas[pragma] = row[0]
+                    cursor.execute(f'PRAGMA {pragma} = {value}')
+
+        if self.drop_indexes:
+            with instrumentation.stage('drop_indexes'), connection.schema_editor() as schema_editor:
+                for model_class in self.model_classes:
+                    existing = self._existing_indexes(model_class)
+                    for index in model_class._meta.indexes:
+                        if index.name in existing:
+                            schema_editor.remove_index(model_class, index)
+                            logger.info(f'Index {index.name} has been dropped for the load')
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            if self.drop_indexes:
+                self.rebuild_indexes()
+        finally:
+            if self._previous_pragmas:
+                with connection.cursor() as cursor:
+                    for pragma, value in self._previous_pragmas.items():
+                        cursor.execute(f'PRAGMA {pragma} = {value}')
+                self._previous_pragmas = {}
+
+    def rebuild_indexes(self):
+        """
+        Create the secondary indexes of the models that do not exist in the database
+        """
+
+        with instrumentation.stage('rebuild_indexes'), connection.schema_editor() as schema_editor:
+            for model_class in self.model_classes:
+                existing = self._existing_indexes(model_class)
+                for index in model_class._meta.indexes:
+                    if index.name not in existing:
+                        schema_editor.add_index(model_class, index)
+                        logger.info(f'Index {index.name} has been rebuilt')
+
+    @staticmethod
+    def _existing_indexes(model_class: Type[models.Model]) -> List[str]:
+        with connection.cursor() as cursor:
+            return list(connection.introspection.get_constraints(cursor, model_class._meta.db_table))
+
+
+def bulk_insert(model_class: Type[models.Model], instances: Iterable[models.Model]):
+    """
+    Insert unsaved instances of a model without their primary key, like bulk_create but faster on SQLite
+
+    Django inserts a batch on SQLite as a compound SELECT of at most 999 variables, which for the measurements means
+    about 24 rows per statement, and compiles every value separately. Raising the batch size to SQLite's actual
+    limits makes it slower still, since SQLite compiles large compound SELECTs slowly. Executing one prepared INSERT
+    for all rows has neither cost, and each execution only binds the variables of a single row. Other databases use
+    bulk_create.
+    """
+
+    if connection.vendor != 'sqlite':
+        model_class.objects.bulk_create(instances)
+        return
+
+    fields = [field for field in model_class._meta.concrete_fields if field is not model_class._meta.pk]
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+    sql = f'INSERT INTO {connection.ops.quote_name(model_class._meta.db_table)} ({columns}) ' \
+          f'VALUES ({", ".join(["%s"] * len(fields))})'
+    params = [
+        [field.get_db_prep_save(field.pre_save(instance, True), connection) for field in fields]
+        for instance in instances
+    ]
+    if params:
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, params)
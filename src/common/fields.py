@@ -0,0 +1,53 @@
+from decimal import Decimal
+from functools import lru_cache
+from typing import Optional
+
+from django import forms
+from django.db import models
+
+
+class TenthsField(models.SmallIntegerField):
+    """
+    Decimal value with one decimal place, stored in the database as a small integer number of tenths
+
+    The KNMI publishes most measurements in tenths of a unit. Storing them as such keeps rows small and inserts cheap,
+    while the model layer still works in whole units: 2.4 degrees is stored as 24.
+
+    Note that aggregates which change the output type, like Avg, are computed on the stored tenths.
+    """
+
+    description = 'Decimal number with one decimal place, stored as tenths'
+
+    def from_db_value(self, value: Optional[int], expression, connection) -> Optional[Decimal]:
+        if value is None:
+            return None
+        return self._from_tenths(value)
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _from_tenths(value: int) -> Decimal:
+        # Measurements only take a small range of values, so the decimals are created once and shared
+        return Decimal(value).scaleb(-1)
+
+    def to_python(self, value) -> Optional[Decimal]:
+        if value is None or isinstance(value, Decimal):
+            return value
+        return Decimal(str(value)).quantize(Decimal('0.1'))
+
+    def get_prep_value(self, value) -> Optional[int]:
+        value = models.Field.get_prep_value(self, value)
+        if value is None:
+            return None
+        return int(self.to_python(value).scaleb(1).to_integral_value())
+
+    def formfield(self, **kwargs):
+        return super().formfield(**{'form_class': forms.DecimalField, 'decimal_places': 1, **kwargs})
+
+
+class LargeTenthsField(TenthsField):
+    """
+    TenthsField for values that do not fit in a small integer, like sums over many measurements
+    """
+
+    def get_internal_type(self) -> str:
+        return 'IntegerField'
@@ -0,0 +1,206 @@
+import cProfile
+import json
+import logging
+import os.path
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, TypeVar
+
+from django.core.management import BaseCommand
+from django.db import connection
+
+from common.utils import data_dir
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# Runs that are being instrumented, innermost last
+_runs: List['Instrumentation'] = []
+
+
+class Instrumentation:
+    """
+    Timers per stage, row counters, database queries and peak memory of a single run, like a management command
+
+    Code marks its stages with the module level stage() and timed() and counts rows with count(). They record into the
+    innermost active run, and cost next to nothing when no run is active. Stages may be nested: the time of a stage
+    includes the time of the stages inside it. Database queries of the main thread are counted and timed per stage,
+    where the time of a query is the time to execute it: fetching its rows counts towards the stage only.
+
+    When the run ends, every stage, counter and the totals are logged as one JSON line each, for monitoring to scrape.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.stages = defaultdict(lambda: {'seconds': 0.0, 'calls': 0, 'queries': 0, 'query_seconds': 0.0})
+        self.counters = defaultdict(int)
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.seconds = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._exit_stack = ExitStack()
+        self._start = None
+
+    def __enter__(self) -> 'Instrumentation':
+        self._start = time.perf_counter()
+        self._exit_stack.enter_context(connection.execute_wrapper(self._record_query))
+        _runs.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _runs.remove(self)
+        self._exit_stack.close()
+        self.seconds = time.perf_counter() - self._start
+        self.log()
+
+    @contextmanager
+    def stage(self, name: str):
+        stack = self._stack()
+        stack.append(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            stack.pop()
+            with self._lock:
+                self.stages[name]['seconds'] += duration
+                self.stages[name]['calls'] += 1
+
+    def count(self, name: str, value: int = 1):
+        with self._lock:
+            self.counters[name] += value
+
+    def _record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            stack = self._stack()
+            with self._lock:
+                self.queries += 1
+                self.query_seconds += duration
+                if stack:
+                    self.stages[stack[-1]]['queries'] += 1
+                    self.stages[stack[-1]]['query_seconds'] += duration
+
+    def _stack(self) -> List[str]:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @staticmethod
+    def peak_rss_mb() -> Optional[float]:
+        """
+        :return: Peak resident memory of this process and its finished child processes in MB, if it is known
+        """
+
+        if resource is None:
+            return None
+        # Linux reports kilobytes, macOS bytes
+        unit = 1 if sys.platform == 'darwin' else 1024
+        peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                   resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+        return peak * unit / 1e6
+
+    def report(self) -> Dict:
+        return {
+            'run': self.name,
+            'seconds': self.seconds and round(self.seconds, 6),
+            'queries': self.queries,
+            'query_seconds': round(self.query_seconds, 6),
+            'peak_rss_mb': self.peak_rss_mb(),
+            'stages': dict(self.stages),
+            'counters': dict(self.counters),
+        }
+
+    def log(self):
+        for name, stage in self.stages.items():
+            stage = {key: round(value, 6) for key, value in stage.items()}
+            logger.info(json.dumps({'event': 'stage', 'run': self.name, 'stage': name, **stage}))
+        for name, value in self.counters.items():
+            logger.info(json.dumps({'event': 'counter', 'run': self.name, 'counter': name, 'value': value}))
+        report = self.report()
+        del report['stages'], report['counters']
+        logger.info(json.dumps({'event': 'run', **report}))
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Time the enclosed code as a stage of the active run, if there is one
+    """
+
+    if not _runs:
+        yield
+        return
+    with _runs[-1].stage(name):
+        yield
+
+
+def timed(iterable: Iterable[T], name: str) -> Iterator[T]:
+    """
+    Time producing every element of a lazy iterable as a stage of the active run, like parsing the next batch
+    """
+
+    iterator = iter(iterable)
+    while True:
+        with stage(name):
+            try:
+                element = next(iterator)
+            except StopIteration:
+                return
+        yield element
+
+
+def count(name: str, value: int = 1):
+    """
+    Add to a counter of the active run, if there is one
+    """
+
+    if _runs:
+        _runs[-1].count(name, value)
+
+
+class InstrumentedCommand(BaseCommand):
+    """
+    Management command that instruments its run and accepts --profile to write a cProfile dump
+
+    The dump can be read with pstats or snakeviz, and turned into a flame graph with flameprof.
+    """
+
+    def create_parser(self, prog_name, subcommand, **kwargs):
+        parser = super().create_parser(prog_name, subcommand, **kwargs)
+        help_profile = 'Write a cProfile dump of the command, by default to data/profiles/<command>_<time>.prof'
+        parser.add_argument('--profile', nargs='?', const='', metavar='FILE', help=help_profile)
+        return parser
+
+    def execute(self, *args, **options):
+        name = self.__module__.rsplit('.', 1)[-1]
+        full_path_to_profile = options.get('profile')
+        with Instrumentation(name):
+            if full_path_to_profile is None:
+                return super().execute(*args, **options)
+
+            if not full_path_to_profile:
+                os.makedirs(os.path.join(data_dir, 'profiles'), exist_ok=True)
+                full_path_to_profile = os.path.join(data_dir, 'profiles',
+                                                    f'{name}_{datetime.now():%Y%m%d%H%M%S}.prof')
+            profiler = cProfile.Profile()
+            try:
+                return profiler.runcall(super().execute, *args, **options)
+            finally:
+                profiler.dump_stats(full_path_to_profile)
+                logger.info(f'Profile has been written to {full_path_to_profile}')
@@ -1,6 +1,7 @@
 import os.path
 from datetime import date, datetime
-from typing import Optional
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, TypeVar
 
 import pytz
 from django.utils import timezone
@@ -8,6 +9,9 @@ from django.utils import timezone
 src_dir = os.path.dirname(os.path.dirname(__file__))
 root_dir = os.path.dirname(src_dir)
 data_dir = os.path.join(root_dir, 'data')
+last_import_file = os.path.join(data_dir, 'last_import')
+
+T = TypeVar('T')
 
 
 def datetime_from_day_and_hour(day: date, hour: Optional[int],
@@ -17,3 +21,41 @@ def datetime_from_day_and_hour(day: date, hour: Optional[int],
     """
 
     return timezone.datetime(day.year, day.month, day.day, hour=hour, tzinfo=tz)
+
+
+def batched(iterable: Iterable[T], size: int) -> Iterator[List[T]]:
+    """
+    Split an iterable into lists of at most size elements, without consuming more than one batch at a time
+
+    >>> list(batched(range(5), 2))
+    [[0, 1], [2, 3], [4]]
+    """
+
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def touch_last_import():
+    """
+    Mark that the stations or measurements in the database have changed
+    """
+
+    with open(last_import_file, 'a'):
+        os.utime(last_import_file)
+
+
+def last_import() -> Optional[datetime]:
+    """
+    Time of the last change to the stations or measurements in the database, or None if it is unknown
+
+    The time is kept as the modification time of a file, so that every process can read it without a database query.
+    """
+
+    try:
+        return datetime.fromtimestamp(os.path.getmtime(last_import_file), tz=pytz.utc)
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,13 @@
+from enum import Enum
+
+
+class DataMode(Enum):
+    """
+    Measurements per day or per hour
+
+    Kept apart from the KNMI import, so that modules that only need the data modes, like the exporters, do not import
+    the importer and its dependencies.
+    """
+
+    per_day = 'day'
+    per_hour = 'hour'
@@ -0,0 +1,235 @@
+import hashlib
+import logging
+import os.path
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional
+
+if TYPE_CHECKING:
+    from data_sources.manifest import DownloadManifest
+
+logger = logging.getLogger(__name__)
+
+
+class DownloadException(Exception):
+    pass
+
+
+class Shard(NamedTuple):
+    """
+    Part of a download: one or more stations over a date range
+    """
+
+    stations: str
+    start: str
+    end: str
+
+    def params(self) -> Dict[str, str]:
+        return {'stns': self.stations, 'start': self.start, 'end': self.end}
+
+
+class ShardedDownloader:
+    """
+    Download a large KNMI request as separate shards, fetched concurrently over a pooled HTTP session
+
+    Every shard is streamed to its own file in chunks and retried with exponential backoff when it fails. When all
+    shards succeeded, they are merged into a single csv file in shard order.
+
+    With a download manifest, shards whose data did not change since they were imported are left out of the merged
+    file, and shard files that are already complete are reused instead of downloaded again.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+    SERVER_ERROR = 500
+
+    def __init__(self, url: str, max_workers: int = 4, max_retries: int = 3, backoff: float = 1.0,
+                 timeout: float = 60, manifest: 'DownloadManifest' = None, data_mode: str = None):
+        self.url = url
+        self.manifest = manifest
+        self.data_mode = data_mode
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+        # Imported here, since importing requests takes longer than starting most commands that never download
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @staticmethod
+    def plan_shards(start: str, end: str, stations: str = 'ALL', shard_days: int = 31) -> List[Shard]:
+        """
+        Split a request into shards per station and per date range
+
+        :param start: string YYYYMMDD(HH) for start time
+        :param end: string YYYYMMDD(HH) for end time
+        :param stations: string with : separated station codes, or ALL for one shard for all stations
+        :param shard_days: Maximum number of days per shard
+        :return: List of shards, ordered by station and then by time
+
+        >>> shards = ShardedDownloader.plan_shards('2021010101', '2021011524', '260:280', shard_days=10)
+        >>> [(shard.stations, shard.start, shard.end) for shard in shards][:2]
+        [('260', '2021010101', '2021011024'), ('260', '2021011101', '2021011524')]
+        """
+
+        hourly = len(start) == len('YYYYMMDDHH')
+        first_day = datetime.strptime(start[:8], '%Y%m%d').date()
+        last_day = datetime.strptime(end[:8], '%Y%m%d').date()
+
+        date_ranges = []
+        shard_start = first_day
+        while shard_start <= last_day:
+            shard_end = min(shard_start + timedelta(days=shard_days - 1), last_day)
+            date_ranges.append((
+                start if shard_start == first_day else ShardedDownloader._format(shard_start, 1 if hourly else None),
+                end if shard_end == last_day else ShardedDownloader._format(shard_end, 24 if hourly else None),
+            ))
+            shard_start = shard_end + timedelta(days=1)
+
+        station_codes = ['ALL'] if stations == 'ALL' else stations.split(':')
+        return [Shard(code, shard_start, shard_end) for code in station_codes for shard_start, shard_end in date_ranges]
+
+    def download(self, shards: List[Shard], full_path_to_file: str, shard_dir: str = None) -> Optional[str]:
+        """
+        Download all shards concurrently and merge them into a single csv file
+
+        :param shards: Shards to download, in the order in which they are merged
+        :param full_path_to_file: Full path to the merged file
+        :param shard_dir: Directory in which the shard files are kept, so that an interrupted download can resume.
+                          Without it, the shard files are written to a temporary directory.
+        :return: Full path to the merged file, or None if none of the shards changed
+        """
+
+        if shard_dir is None:
+            with tempfile.TemporaryDirectory(dir=os.path.dirname(full_path_to_file)) as temporary_dir:
+                return self.download(shards, full_path_to_file, temporary_dir)
+
+        os.makedirs(shard_dir, exist_ok=True)
+        shard_paths = [self.shard_path(shard_dir, shard) for shard in shards]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [
+                executor.submit(self.fetch_shard, shard, shard_path) for shard, shard_path in zip(shards, shard_paths)
+            ]
+            try:
+                for future in as_completed(futures):
+                    future.result()
+            except Exception:
+                for future in futures:
+                    future.cancel()
+                raise
+
+        changed_shard_paths = [shard_path for shard_path, future in zip(shard_paths, futures) if future.result()]
+        logger.info(f'{len(shards)} shards have been downloaded, {len(changed_shard_paths)} of them changed')
+        if not changed_shard_paths:
+            return None
+
+        self.merge(changed_shard_paths, full_path_to_file)
+        return full_path_to_file
+
+    @staticmethod
+    def shard_path(shard_dir: str, shard: Shard) -> str:
+        return os.path.join(shard_dir, f'{shard.stations}_{shard.start}_{shard.end}.csv')
+
+    def fetch_shard(self, shard: Shard, full_path_to_file: str) -> bool:
+        """
+        Download a shard, unless the manifest shows that its file is already complete
+
+        :return: Whether the shard has data that still needs to be imported
+        """
+
+        if self.manifest is None:
+            self.download_shard(shard, full_path_to_file)
+            return True
+
+        state = self.manifest.shard(self.data_mode, shard)
+        if state and state['state'] == self.manifest.DOWNLOADED and os.path.exists(full_path_to_file) and \
+                self.checksum(full_path_to_file) == state['checksum']:
+            logger.info(f'Shard {shard} is resumed from {full_path_to_file}')
+            return True
+
+        self.download_shard(shard, full_path_to_file)
+        changed = self.manifest.record_download(self.data_mode, shard, self.checksum(full_path_to_file))
+        if not changed:
+            os.remove(full_path_to_file)
+        return changed
+
+    def download_shard(self, shard: Shard, full_path_to_file: str) -> str:
+        """
+        Stream a single shard to file, retrying with exponential backoff on connection and server errors
+        """
+
+        import requests
+        from requests.exceptions import ChunkedEncodingError
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._stream_to_file(shard, full_path_to_file)
+                return full_path_to_file
+            except (requests.ConnectionError, requests.Timeout, ChunkedEncodingError, DownloadException) as e:
+                retryable = not isinstance(e, DownloadException) or e.args[1] >= self.SERVER_ERROR
+                if not retryable or attempt == self.max_retries:
+                    raise DownloadException(f'Shard {shard} failed after {attempt + 1} attempts: {e}') from e
+                delay = self.backoff * 2 ** attempt
+                logger.warning(f'Shard {shard} failed, retrying in {delay:.1f} s: {e}')
+                time.sleep(delay)
+
+    def _stream_to_file(self, shard: Shard, full_path_to_file: str):
+        with self.session.get(self.url, params=shard.params(), stream=True, timeout=self.timeout) as response:
+            if response.status_code != 200:
+                raise DownloadException(response.text, response.status_code)
+
+            partial_path_to_file = f'{full_path_to_file}.part'
+            with open(partial_path_to_file, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=self.CHUNK_SIZE):
+                    f.write(chunk)
+
+            # A connection that is closed halfway ends the stream without an error, so check the length of the body
+            content_length = response.headers.get('Content-Length')
+            if content_length is not None and response.raw.tell() < int(content_length):
+                import requests
+                raise requests.ConnectionError(f'Connection closed after {response.raw.tell()} of {content_length} '
+                                               f'bytes')
+            os.replace(partial_path_to_file, full_path_to_file)
+
+    @staticmethod
+    def checksum(full_path_to_file: str) -> str:
+        """
+        Checksum of the data lines of a KNMI csv file, ignoring the comment header
+        """
+
+        sha256 = hashlib.sha256()
+        with open(full_path_to_file, 'rb') as f:
+            for line in f:
+                if not line.startswith(b'#'):
+                    sha256.update(line)
+        return sha256.hexdigest()
+
+    @staticmethod
+    def merge(shard_paths: List[str], full_path_to_file: str):
+        """
+        Concatenate the shard files, keeping the comment header of the first shard only
+        """
+
+        with open(full_path_to_file, 'wb') as merged_file:
+            for i, shard_path in enumerate(shard_paths):
+                with open(shard_path, 'rb') as shard_file:
+                    for line in shard_file:
+                        if i > 0 and line.startswith(b'#'):
+                            continue
+                        if not line.endswith(b'\n'):
+                            line += b'\n'
+                        merged_file.write(line)
+
+    @staticmethod
+    def _format(day: date, hour: Optional[int]) -> str:
+        formatted = day.strftime('%Y%m%d')
+        if hour is not None:
+            formatted += f'{hour:02d}'
+        return formatted
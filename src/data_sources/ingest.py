@@ -0,0 +1,207 @@
+import logging
+import os.path
+import queue
+import shutil
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from django.db import connections
+
+from common.bulk_load import BulkLoad
+from common.instrumentation import Instrumentation
+from common.utils import data_dir, touch_last_import
+from data_sources.downloader import Shard, ShardedDownloader
+from data_sources.knmi import DataMode, Knmi
+from data_sources.manifest import DownloadManifest
+from data_sources.rejects import Reject, RejectsFile
+from measurements.climatology import Climatology
+from stations.models import Station
+
+logger = logging.getLogger(__name__)
+
+
+class IngestService:
+    """
+    Long-running service that periodically downloads the new KNMI measurements and writes them to the database
+
+    Every run of a data mode is a pipeline over the shards of its download:
+    - a thread pool downloads the shards, since that mostly waits on the network
+    - a process pool decodes the downloaded shards into columns, which uses every core
+    - the calling thread is the only one that writes to the database, one shard at a time and in shard order
+
+    Shards are handed to the writer through a bounded queue, so downloading and decoding run at most queue_size shards
+    ahead of the writer, and memory use does not depend on the size of the download. Every shard is recorded as
+    imported in the download manifest as soon as it has been written, so a run that is stopped halfway resumes
+    from the first shard that was not written. Shards that were downloaded but not written are downloaded again.
+
+    The parse workers are forked when the service starts, before any download thread runs, since forking a process
+    with running threads can copy locks in a held state.
+    """
+
+    INTERVALS = {DataMode.per_hour: 60 * 60, DataMode.per_day: 24 * 60 * 60}
+
+    def __init__(self, intervals: Dict[DataMode, float] = None, stations: str = 'ALL', shard_days: int = 31,
+                 io_workers: int = 4, parse_workers: int = None, queue_size: int = 8,
+                 urls: Dict[DataMode, str] = None, manifest: DownloadManifest = None,
+                 start: Dict[DataMode, str] = None):
+        """
+        :param intervals: Seconds between the runs per data mode, defaults to hourly and daily runs
+        :param stations: string with : separated station codes, or ALL for all stations at once
+        :param shard_days: Maximum number of days per shard
+        :param io_workers: Maximum number of shards that are downloaded at the same time
+        :param parse_workers: Number of processes that decode shards, defaults to the number of cores
+        :param queue_size: Maximum number of shards that are downloaded or decoded ahead of the writer
+        :param urls: URL to download from per data mode, defaults to the KNMI website
+        :param manifest: Download manifest to resume from and to record the imported shards in
+        :param start: string YYYYMMDD(HH) per data mode to start stations that have never been imported at, see
+                      Knmi.plan_shards
+        """
+
+        self.intervals = intervals or self.INTERVALS
+        self.stations = stations
+        self.shard_days = shard_days
+        self.io_workers = io_workers
+        self.parse_workers = parse_workers or os.cpu_count()
+        self.queue_size = queue_size
+        self.urls = {**Knmi.URLS, **(urls or {})}
+        self.manifest = manifest or DownloadManifest()
+        self.start = start or {}
+        self._stopped = threading.Event()
+        self._downloads: Optional[ThreadPoolExecutor] = None
+        self._parsers: Optional[ProcessPoolExecutor] = None
+
+    def run(self, once: bool = False):
+        """
+        Run every data mode at its interval until the service is stopped
+
+        :param once: Run every data mode once and return, for example from cron or in a test
+        """
+
+        # Worker processes must not share the database connection of this process
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=self.parse_workers) as self._parsers, \
+                ThreadPoolExecutor(max_workers=self.io_workers) as self._downloads:
+            self._parsers.submit(int).result()
+
+            next_runs = {data_mode: time.monotonic() for data_mode in self.intervals}
+            while not self._stopped.is_set():
+                for data_mode, next_run in next_runs.items():
+                    if self._stopped.is_set() or time.monotonic() < next_run:
+                        continue
+                    try:
+                        self.ingest(data_mode)
+                    except Exception:
+                        logger.exception(f'Ingesting weather information {data_mode.name} failed')
+                    # Runs that were missed while this one took longer than the interval are skipped
+                    next_runs[data_mode] = max(next_run + self.intervals[data_mode], time.monotonic())
+                if once:
+                    break
+                self._stopped.wait(max(min(next_runs.values()) - time.monotonic(), 0))
+        self._parsers, self._downloads = None, None
+        logger.info('Ingest service has stopped')
+
+    def stop(self):
+        """
+        Stop the service after the shard that is being written, safe to call from a signal handler or another thread
+        """
+
+        self._stopped.set()
+
+    def ingest(self, data_mode: DataMode) -> int:
+        """
+        Download, decode and write the new measurements of a data mode
+
+        :return: Number of measurements that were read from the downloaded shards
+        """
+
+        # Shards that an interrupted run downloaded but did not write are planned differently now, since the plan
+        # starts at the last written time
+        shard_dir = os.path.join(data_dir, 'shards', data_mode.name)
+        shutil.rmtree(shard_dir, ignore_errors=True)
+        os.makedirs(shard_dir)
+        self.manifest.discard_downloads(data_mode.value)
+        shards = Knmi.plan_shards(data_mode, stations=self.stations, shard_days=self.shard_days,
+                                  manifest=self.manifest, default_start=self.start.get(data_mode))
+        downloader = ShardedDownloader(self.urls[data_mode], max_workers=self.io_workers, manifest=self.manifest,
+                                       data_mode=data_mode.value)
+        stations = {station.code: station for station in Station.objects.all()}
+        climatology = Climatology.load() if data_mode == DataMode.per_hour else None
+
+        shard_queue: 'queue.Queue[Tuple[Shard, str, Future]]' = queue.Queue(maxsize=self.queue_size)
+        aborted = threading.Event()
+        dispatcher = threading.Thread(target=self._dispatch, name=f'ingest-{data_mode.name}',
+                                      args=(data_mode, shards, shard_dir, downloader, stations, shard_queue, aborted))
+
+        imported, created, updated, changed_shards = 0, 0, 0, 0
+        with Instrumentation(f'ingest_{data_mode.name}'), RejectsFile(Knmi.rejects_path(data_mode)) as rejects_file, \
+                BulkLoad([Knmi.MODELS[data_mode]]):
+            dispatcher.start()
+            try:
+                for _ in shards:
+                    if self._stopped.is_set():
+                        break
+                    shard, shard_path, future = shard_queue.get()
+                    batches = future.result()
+                    if batches is None:
+                        continue
+
+                    shard_imported, shard_created, shard_updated = Knmi.write_columns(
+                        data_mode, batches, climatology, rejects_file
+                    )
+                    imported += shard_imported
+                    created += shard_created
+                    updated += shard_updated
+                    self.manifest.record_import(data_mode.value, Knmi.last_imported_times(data_mode, [shard]), [shard])
+                    os.remove(shard_path)
+                    changed_shards += 1
+            finally:
+                aborted.set()
+                self._cancel(shard_queue)
+                dispatcher.join()
+                self._cancel(shard_queue)
+
+        if created or updated:
+            touch_last_import()
+        logger.info(f'{changed_shards} of {len(shards)} shards {data_mode.name} ingested: {imported} measurements '
+                    f'read, {created} created and {updated} updated')
+        return imported
+
+    def _dispatch(self, data_mode: DataMode, shards: List[Shard], shard_dir: str, downloader: ShardedDownloader,
+                  stations: Dict[int, Station], shard_queue: queue.Queue, aborted: threading.Event):
+        """
+        Submit the shards to the download threads in order, blocking while the writer is queue_size shards behind
+        """
+
+        for shard in shards:
+            shard_path = ShardedDownloader.shard_path(shard_dir, shard)
+            future = self._downloads.submit(self._download_and_decode, data_mode, shard, shard_path, downloader,
+                                            stations)
+            while True:
+                if aborted.is_set():
+                    future.cancel()
+                    return
+                try:
+                    shard_queue.put((shard, shard_path, future), timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+
+    def _download_and_decode(self, data_mode: DataMode, shard: Shard, shard_path: str, downloader: ShardedDownloader,
+                             stations: Dict[int, Station]) -> Optional[List[Tuple[Dict[str, List], List[Reject]]]]:
+        """
+        :return: Batches of columns of the shard, or None if it did not change since it was imported
+        """
+
+        if not downloader.fetch_shard(shard, shard_path):
+            return None
+        return self._parsers.submit(Knmi._read_columns_in_worker, data_mode, shard_path, stations).result()
+
+    @staticmethod
+    def _cancel(shard_queue: queue.Queue):
+        while True:
+            try:
+                shard_queue.get_nowait()[2].cancel()
+            except queue.Empty:
+                return
@@ -1,47 +1,134 @@
 import csv
 import logging
 import os.path
-from datetime import datetime
+import shutil
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
 from decimal import Decimal
-from enum import Enum
-from typing import List, Optional
+from functools import lru_cache
+from itertools import islice, repeat
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple, Type, Union
 
-import requests
-from django.db import transaction
+import pytz
+from django.db import connections, models, transaction
+from django.utils import timezone
 
-from common.utils import data_dir, datetime_from_day_and_hour
-from measurements.models import Measurement
+from common import instrumentation
+from common.bulk_load import BulkLoad, bulk_insert
+from common.utils import batched, data_dir, datetime_from_day_and_hour, touch_last_import
+from data_sources.data_mode import DataMode
+from data_sources.downloader import Shard, ShardedDownloader
+from data_sources.manifest import DownloadManifest
+from data_sources.rejects import Reject, RejectsFile, log_rejects
+from measurements.aggregates import Aggregates
+from measurements.latest import LatestObservations
+from measurements.models import DailyMeasurement, Measurement
 from stations.models import Station
 
+if TYPE_CHECKING:
+    from measurements.climatology import Climatology
+
 logger = logging.getLogger(__name__)
 
 
-class DownloadException(Exception):
-    pass
+class Knmi:
+    BATCH_SIZE = 2000
+    MEASUREMENT_FIELDS = [
+        'wind_direction', 'wind_speed', 'gust_of_wind', 'temperature', 'dew_temperature', 'sunshine', 'radiation',
+        'precipitation_duration', 'precipitation', 'air_pressure', 'visibility', 'cloud_cover', 'relative_humidity',
+        'mist', 'rain', 'snow', 'lightning', 'icing',
+    ]
 
+    # Column positions of the measurement fields in the hourly KNMI csv, by the way they are encoded
+    HOURLY_TENTHS_COLUMNS = {
+        'wind_speed': 4, 'gust_of_wind': 6, 'temperature': 7, 'dew_temperature': 9, 'sunshine': 10,
+        'precipitation_duration': 12, 'precipitation': 13, 'air_pressure': 14,
+    }
+    HOURLY_INTEGER_COLUMNS = {
+        'wind_direction': 3, 'radiation': 11, 'visibility': 15, 'cloud_cover': 16, 'relative_humidity': 17,
+    }
+    HOURLY_FLAG_COLUMNS = {'mist': 20, 'rain': 21, 'snow': 22, 'lightning': 23, 'icing': 24}
+    HOURLY_NR_VALUES = 25
+    # Plausible range of the raw values of the hourly measurement fields, where -1 means less than 0.05
+    HOURLY_RANGES = {
+        'wind_direction': (0, 360), 'wind_speed': (0, 750), 'gust_of_wind': (0, 1000), 'temperature': (-600, 600),
+        'dew_temperature': (-600, 600), 'sunshine': (-1, 10), 'radiation': (0, 500), 'precipitation_duration': (0, 10),
+        'precipitation': (-1, 2000), 'air_pressure': (8500, 11000), 'visibility': (0, 89), 'cloud_cover': (0, 9),
+        'relative_humidity': (0, 100), 'mist': (0, 1), 'rain': (0, 1), 'snow': (0, 1), 'lightning': (0, 1),
+        'icing': (0, 1),
+    }
+    # Wind direction 990 means variable
+    HOURLY_SPECIAL_VALUES = {'wind_direction': [990]}
+    HOURS = [timedelta(hours=hour) for hour in range(24)]
 
-class DataMode(Enum):
-    per_day = 'day'
-    per_hour = 'hour'
+    # Column positions of the measurement fields in the daily KNMI csv, by the way they are encoded
+    DAILY_TENTHS_COLUMNS = {
+        'vector_wind_speed': 3, 'wind_speed': 4, 'max_wind_speed': 5, 'min_wind_speed': 7, 'gust_of_wind': 9,
+        'temperature': 11, 'min_temperature': 12, 'max_temperature': 14, 'min_ground_temperature': 16,
+        'sunshine': 18, 'precipitation_duration': 21, 'precipitation': 22, 'max_precipitation': 23,
+        'evapotranspiration': 25, 'air_pressure': 26, 'max_air_pressure': 27, 'min_air_pressure': 29,
+    }
+    DAILY_INTEGER_COLUMNS = {
+        'wind_direction': 2, 'max_wind_speed_hour': 6, 'min_wind_speed_hour': 8, 'gust_of_wind_hour': 10,
+        'min_temperature_hour': 13, 'max_temperature_hour': 15, 'min_ground_temperature_hour': 17,
+        'sunshine_percentage': 19, 'radiation': 20, 'max_precipitation_hour': 24, 'max_air_pressure_hour': 28,
+        'min_air_pressure_hour': 30, 'min_visibility': 31, 'min_visibility_hour': 32, 'max_visibility': 33,
+        'max_visibility_hour': 34, 'cloud_cover': 35, 'relative_humidity': 36, 'max_relative_humidity': 37,
+        'max_relative_humidity_hour': 38, 'min_relative_humidity': 39, 'min_relative_humidity_hour': 40,
+    }
+    DAILY_MEASUREMENT_FIELDS = [*DAILY_TENTHS_COLUMNS, *DAILY_INTEGER_COLUMNS]
+    DAILY_NR_VALUES = 41
+    # Plausible range of the raw values of the daily measurement fields, where -1 means less than 0.05
+    DAILY_RANGES = {
+        'wind_direction': (0, 360), 'vector_wind_speed': (0, 750), 'wind_speed': (0, 750), 'max_wind_speed': (0, 750),
+        'min_wind_speed': (0, 750), 'gust_of_wind': (0, 1000), 'temperature': (-600, 600),
+        'min_temperature': (-600, 600), 'max_temperature': (-600, 600), 'min_ground_temperature': (-600, 600),
+        'sunshine': (-1, 240), 'sunshine_percentage': (0, 100), 'radiation': (0, 5000),
+        'precipitation_duration': (0, 240), 'precipitation': (-1, 3000), 'max_precipitation': (-1, 2000),
+        'evapotranspiration': (0, 200), 'air_pressure': (8500, 11000), 'max_air_pressure': (8500, 11000),
+        'min_air_pressure': (8500, 11000), 'min_visibility': (0, 89), 'max_visibility': (0, 89),
+        'cloud_cover': (0, 9), 'relative_humidity': (0, 100), 'max_relative_humidity': (0, 100),
+        'min_relative_humidity': (0, 100),
+        **{field_name: (1, 24) for field_name in DAILY_INTEGER_COLUMNS if field_name.endswith('_hour')},
+    }
 
+    # Model, field that identifies a measurement together with the station, and measurement fields per data mode
+    MODELS = {DataMode.per_day: DailyMeasurement, DataMode.per_hour: Measurement}
+    TIME_FIELDS = {DataMode.per_day: 'day', DataMode.per_hour: 'time'}
+    FIELDS = {DataMode.per_day: DAILY_MEASUREMENT_FIELDS, DataMode.per_hour: MEASUREMENT_FIELDS}
+    # Stations that are further behind the most recent station have stopped reporting, like decommissioned stations,
+    # and no longer hold back the time that ALL stations have reached
+    MAX_LAG = {DataMode.per_day: timedelta(days=62), DataMode.per_hour: timedelta(days=7)}
 
-class Knmi:
     URLS = {
         DataMode.per_day: 'http://projects.knmi.nl/klimatologie/daggegevens/getdata_dag.cgi',
         DataMode.per_hour: 'http://projects.knmi.nl/klimatologie/uurgegevens/getdata_uur.cgi',
     }
 
     @staticmethod
-    def download_weather(data_mode: DataMode, start: str = None, end: str = None, stations: str = 'ALL') -> str:
+    def download_weather(data_mode: DataMode, start: str = None, end: str = None, stations: str = 'ALL',
+                         shard_days: int = 31, max_workers: int = 4,
+                         manifest: Optional[DownloadManifest] = None) -> Optional[str]:
         """
         Download the data from the KNMI website and store them in a csv file in the data directory
 
+        The request is split into shards per station and per shard_days days, which are downloaded concurrently.
+
+        With a download manifest, every station is only downloaded from the last time that was imported for it,
+        shards that did not change since the last import of their station are skipped, and shards that were already
+        downloaded by an interrupted run are reused. Call Knmi.record_import after importing the file to update the
+        manifest.
+
         :param data_mode: Download per day or per hour
-        :param start: string YYYYMMDD(HH) for start time
-        :param end: string YYYYMMDD(HH) for end time
-        :param stations: string with : separated station codes.
-                         TODO: Implement the per-station download
-        :return: Full path to generated file
+        :param start: string YYYYMMDD(HH) for start time, defaults to the last imported time per station, see
+                      Knmi.plan_shards
+        :param end: string YYYYMMDD(HH) for end time, defaults to now
+        :param stations: string with : separated station codes, or ALL for all stations at once
+        :param shard_days: Maximum number of days per shard
+        :param max_workers: Maximum number of shards that are downloaded at the same time
+        :param manifest: Download manifest to resume from and to record the downloaded shards in
+        :return: Full path to generated file, or None if there is no new data
         """
 
         # Input validation
@@ -50,68 +137,580 @@ class Knmi:
             msg = f'Unknown data mode {data_mode}. Choose from: {known_data_modes}'
             raise AssertionError(msg)
 
-        # Determine query parameters
-        data = {'stns': 'ALL'}
-        if start:
-            data['start'] = start
-        if end:
-            data['end'] = end
-        # TODO: Remove this start date which is here for testing purposes only
-        data['start'] = '2021012801'
-
-        # Make the request
-        response = requests.get(url=Knmi.URLS[data_mode], params=data)
-        if response.status_code != 200:
-            msg = response.text
-            raise DownloadException(msg)
-
-        # Write the response to file
+        # Download the shards and merge them into a single file
+        shards = Knmi.plan_shards(data_mode, start, end, stations, shard_days, manifest)
         filename = f'{data_mode.name}_knmi.csv'
         full_path_to_file = os.path.join(data_dir, filename)
-        with open(full_path_to_file, 'w') as f:
-            f.write(response.text)
+        shard_dir = os.path.join(data_dir, 'shards', data_mode.name) if manifest else None
+        downloader = ShardedDownloader(Knmi.URLS[data_mode], max_workers=max_workers, manifest=manifest,
+                                       data_mode=data_mode.value)
+        with instrumentation.stage('download'):
+            downloaded = downloader.download(shards, full_path_to_file, shard_dir)
+        if not downloaded:
+            logger.info(f'No new weather information {data_mode.name} to download')
+            return None
+
         logger.info(f'Weather information {data_mode.name} has been downloaded to {full_path_to_file}')
         return full_path_to_file
 
     @staticmethod
-    def import_weather(data_mode: DataMode, full_path_to_file: str) -> List[Measurement]:
-        assert data_mode == DataMode.per_hour, 'Measurements per day not yet implemented'
+    def plan_shards(data_mode: DataMode, start: str = None, end: str = None, stations: str = 'ALL',
+                    shard_days: int = 31, manifest: Optional[DownloadManifest] = None,
+                    default_start: str = None) -> List[Shard]:
+        """
+        Split a download into shards per station and per shard_days days
+
+        Without a start time, every station starts at the last time that was imported for it according to the
+        manifest, or else at the last time that is in the database for it. A station that has neither needs a
+        default start time.
+
+        :param data_mode: Download per day or per hour
+        :param start: string YYYYMMDD(HH) for start time of every station
+        :param end: string YYYYMMDD(HH) for end time, defaults to now
+        :param stations: string with : separated station codes, or ALL for all stations at once
+        :param shard_days: Maximum number of days per shard
+        :param manifest: Download manifest with the last imported time per station
+        :param default_start: string YYYYMMDD(HH) for start time of stations that have never been imported
+        :return: List of shards, ordered by station and then by time
+        """
+
+        time_format = '%Y%m%d%H' if data_mode == DataMode.per_hour else '%Y%m%d'
+        end = end or timezone.now().strftime(time_format)
+        shards = []
+        for station in stations.split(':'):
+            station_start = start or (manifest and manifest.last_fetched(data_mode.value, station)) or \
+                Knmi._last_time(data_mode, station) or default_start
+            if station_start is None:
+                raise AssertionError(f'Station {station} has never been imported {data_mode.name}, '
+                                     f'choose a start time')
+            shards += ShardedDownloader.plan_shards(station_start, end, station, shard_days)
+        return shards
+
+    @staticmethod
+    def record_import(data_mode: DataMode, manifest: DownloadManifest):
+        """
+        Record in the manifest that all downloaded shards have been imported, and remove their files
+        """
+
+        shards = manifest.downloaded_shards(data_mode.value)
+        manifest.record_import(data_mode.value, Knmi.last_imported_times(data_mode, shards))
+        shutil.rmtree(os.path.join(data_dir, 'shards', data_mode.name), ignore_errors=True)
+
+    @staticmethod
+    def last_imported_times(data_mode: DataMode, shards: List[Shard]) -> Dict[str, str]:
+        """
+        Find the last time in the database within the time range of every shard, which is where the next download of
+        its stations starts
+
+        This is the last time that the KNMI had published, rather than the end of the shard, since the KNMI publishes
+        the latest hours with a delay. A shard of ALL stations ends at the time that every station in it has reached,
+        so that a station that lags behind does not skip hours either. Stations that lag behind by more than MAX_LAG
+        are left out, so that a station that stopped reporting does not hold the others back.
+
+        :return: string YYYYMMDD(HH) of the last time per station code, or ALL, of the shards with measurements
+        """
+
+        last_times = {}
+        for shard in shards:
+            last_time = Knmi._last_time(data_mode, shard.stations, shard.start, shard.end)
+            if last_time is not None:
+                last_times[shard.stations] = max(last_time, last_times.get(shard.stations, last_time))
+        return last_times
+
+    @staticmethod
+    def _last_time(data_mode: DataMode, station: str, start: str = None, end: str = None) -> Optional[str]:
+        """
+        :param station: Station code, or ALL for the time that every station with recent measurements has reached
+        :param start: string YYYYMMDD(HH) of the first time to consider, defaults to the first measurement
+        :param end: string YYYYMMDD(HH) of the last time to consider, defaults to the last measurement
+        :return: string YYYYMMDD(HH) of the last time in the database, or None if there are no measurements
+        """
+
+        time_field = Knmi.TIME_FIELDS[data_mode]
+        queryset = Knmi.MODELS[data_mode].objects.order_by()
+        if start is not None:
+            queryset = queryset.filter(**{f'{time_field}__gte': Knmi._parse_time(data_mode, start)})
+        if end is not None:
+            queryset = queryset.filter(**{f'{time_field}__lte': Knmi._parse_time(data_mode, end)})
+        if station != 'ALL':
+            queryset = queryset.filter(station_id=int(station))
+        station_times = list(queryset.values('station_id').annotate(last=models.Max(time_field))
+                             .values_list('last', flat=True))
+        if not station_times:
+            return None
+        earliest = max(station_times) - Knmi.MAX_LAG[data_mode]
+        return Knmi._format_time(data_mode, min(time for time in station_times if time >= earliest))
+
+    @staticmethod
+    def _parse_time(data_mode: DataMode, knmi_time: str) -> Union[date, datetime]:
+        """
+        Parse a Knmi YYYYMMDD day or YYYYMMDDHH hour, where hour 1 is the hour that starts at midnight
+
+        >>> Knmi._parse_time(DataMode.per_hour, '2021012824')
+        datetime.datetime(2021, 1, 28, 23, 0, tzinfo=<UTC>)
+        """
+
+        day = Knmi._parse_day(knmi_time[:8])
+        if data_mode == DataMode.per_day:
+            return day.date()
+        return day + Knmi.HOURS[int(knmi_time[8:]) - 1]
+
+    @staticmethod
+    def _format_time(data_mode: DataMode, time: Union[date, datetime]) -> str:
+        """
+        Format a day or an hour the way the Knmi does, the reverse of Knmi._parse_time
+
+        >>> Knmi._format_time(DataMode.per_hour, Knmi._parse_time(DataMode.per_hour, '2021012824'))
+        '2021012824'
+        """
+
+        if data_mode == DataMode.per_day:
+            return f'{time:%Y%m%d}'
+        time = time.astimezone(pytz.utc)
+        return f'{time:%Y%m%d}{time.hour + 1:02d}'
+
+    @staticmethod
+    def import_weather(data_mode: DataMode, full_path_to_file: str, fast_parsing: bool = True,
+                       drop_indexes: bool = False) -> int:
+        """
+        Import the measurements from a downloaded csv file into the database
+
+        The import is incremental: measurements that are not yet in the database are inserted, measurements that
+        already exist for the same station and time are only updated when one of their values changed. Each batch
+        is written in its own short transaction, so the table is never emptied or locked for the whole import.
+
+        The file is streamed: lines are parsed lazily and written in batches of BATCH_SIZE measurements, so memory
+        use does not depend on the size of the file. The daily and monthly aggregates of the hourly measurements are
+        refreshed for every batch that changed, and the anomaly scores of hourly measurements are set from the
+        normals of the climatology, if they have been computed. The database connection is tuned for bulk loading
+        during the import, see BulkLoad.
+
+        Lines that cannot be imported, like lines of unknown stations, are skipped and written to a rejects file in
+        data/rejects with the reason why, see Validator.
+
+        :param data_mode: Import per day or per hour
+        :param full_path_to_file: Full path to the csv file downloaded from the KNMI
+        :param fast_parsing: Decode the hourly file column by column with cached parsers instead of field by field.
+                             Daily files are always decoded column by column.
+        :param drop_indexes: Drop the secondary indexes of the measurements during the import and rebuild them
+                             afterwards, which is faster for large backfills
+        :return: Number of measurements that were read from the file
+        """
 
-        hourly_measurements = []
         stations = {station.code: station for station in Station.objects.all()}
+        climatology = Knmi._load_climatology(data_mode)
+        rejects_file = RejectsFile(Knmi.rejects_path(data_mode))
+        if data_mode == DataMode.per_day:
+            measurements = Knmi._read_daily_measurements(full_path_to_file, stations, rejects_file)
+        else:
+            measurements = Knmi._read_hourly_measurements(full_path_to_file, stations, fast_parsing, rejects_file)
+
+        imported, created, updated = 0, 0, 0
+        with rejects_file, BulkLoad([Knmi.MODELS[data_mode]], drop_indexes=drop_indexes):
+            batches = instrumentation.timed(batched(measurements, Knmi.BATCH_SIZE), 'parse')
+            for batch_number, batch in enumerate(batches, start=1):
+                batch_created, batch_updated = Knmi.write_batch(data_mode, batch, climatology)
+                imported += len(batch)
+                created += batch_created
+                updated += batch_updated
+                logger.info(f'Batch {batch_number}: {imported} measurements read, '
+                            f'{created} created and {updated} updated so far')
+
+        if created or updated:
+            touch_last_import()
+        logger.info(f'{created} measurements created and {updated} measurements updated from {full_path_to_file}')
+        return imported
+
+    @staticmethod
+    def import_files(data_mode: DataMode, full_paths_to_files: List[str], max_workers: int = None,
+                     drop_indexes: bool = False) -> int:
+        """
+        Import the measurements from many csv files, for example a backfill of one file per station and year
+
+        The files are decoded in parallel by a pool of worker processes, which send back columns of plain values
+        instead of measurements, since those are much cheaper to pickle. This process is the only one that writes to
+        the database, file by file in the given order, so at most twice max_workers files are decoded ahead of the
+        writes. Like import_weather, the import is an upsert, so importing the same files again changes nothing, and
+        lines that cannot be imported are written to a rejects file.
+
+        :param data_mode: Import per day or per hour
+        :param full_paths_to_files: Full paths to the csv files
+        :param max_workers: Number of processes that decode files, defaults to the number of cores
+        :param drop_indexes: Drop the secondary indexes of the measurements during the import and rebuild them
+                             afterwards, which is faster for large backfills
+        :return: Number of measurements that were read from the files
+        """
+
+        stations = {station.code: station for station in Station.objects.all()}
+        climatology = Knmi._load_climatology(data_mode)
+        max_workers = max_workers or os.cpu_count()
+
+        imported, created, updated = 0, 0, 0
+        # Worker processes must not share the database connection of this process
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            paths = iter(full_paths_to_files)
+            pending = deque(
+                (path, executor.submit(Knmi._read_columns_in_worker, data_mode, path, stations))
+                for path in islice(paths, 2 * max_workers)
+            )
+            with RejectsFile(Knmi.rejects_path(data_mode)) as rejects_file, \
+                    BulkLoad([Knmi.MODELS[data_mode]], drop_indexes=drop_indexes):
+                while pending:
+                    full_path_to_file, future = pending.popleft()
+                    with instrumentation.stage('wait_for_workers'):
+                        batches = future.result()
+                    next_path = next(paths, None)
+                    if next_path is not None:
+                        pending.append((next_path, executor.submit(Knmi._read_columns_in_worker, data_mode,
+                                                                   next_path, stations)))
+
+                    file_imported, file_created, file_updated = Knmi.write_columns(
+                        data_mode, batches, climatology, rejects_file
+                    )
+                    imported += file_imported
+                    created += file_created
+                    updated += file_updated
+                    instrumentation.count('files')
+                    logger.info(f'{file_created} measurements created and {file_updated} measurements updated from '
+                                f'{full_path_to_file}')
+
+        if created or updated:
+            touch_last_import()
+        logger.info(f'{created} measurements created and {updated} measurements updated from '
+                    f'{len(full_paths_to_files)} files')
+        return imported
+
+    @staticmethod
+    def _load_climatology(data_mode: DataMode) -> Optional['Climatology']:
+        """
+        :return: Normals to score the measurements of this data mode against, if they have been computed
+        """
+
+        if data_mode != DataMode.per_hour:
+            return None
+        # Imported here, like the validator, since numpy takes longer to import than a download without new data
+        from measurements.climatology import Climatology
+        return Climatology.load()
+
+    @staticmethod
+    def _derived_fields(data_mode: DataMode) -> List[str]:
+        """
+        :return: Fields that are computed from the measurement fields during the import, and updated along with them
+        """
+
+        if data_mode != DataMode.per_hour:
+            return []
+        from measurements.climatology import Climatology
+        return Climatology.ANOMALY_FIELDS
+
+    @staticmethod
+    def rejects_path(data_mode: DataMode) -> str:
+        """
+        :return: Full path to a new rejects file for an import
+        """
+
+        return os.path.join(data_dir, 'rejects', f'{data_mode.name}_{datetime.now():%Y%m%d%H%M%S}.csv')
+
+    @staticmethod
+    def write_columns(data_mode: DataMode, batches: Iterable[Tuple[Dict[str, List], List[Reject]]],
+                      climatology: Optional['Climatology'] = None,
+                      rejects_file: Optional[RejectsFile] = None) -> Tuple[int, int, int]:
+        """
+        Write batches of columns decoded by Knmi.read_columns to the database, and their rejected lines to the rejects
+        file
+
+        :return: Number of read, created and updated measurements
+        """
+
+        imported, created, updated = 0, 0, 0
+        for columns, rejects in batches:
+            log_rejects(rejects, rejects_file)
+            if not columns:
+                continue
+            batch = Knmi.build_measurements(data_mode, columns)
+            batch_created, batch_updated = Knmi.write_batch(data_mode, batch, climatology)
+            imported += len(batch)
+            created += batch_created
+            updated += batch_updated
+        return imported, created, updated
+
+    @staticmethod
+    def write_batch(data_mode: DataMode, batch: List[models.Model],
+                    climatology: Optional['Climatology'] = None) -> Tuple[int, int]:
+        """
+        Write a batch of parsed measurements to the database, with their anomaly scores, aggregates and the latest
+        observations
+
+        :param data_mode: Measurements per day or per hour
+        :param batch: Unsaved measurements
+        :param climatology: Normals to score hourly measurements against, if they have been computed
+        :return: Number of created and number of updated measurements
+        """
+
+        if climatology is not None:
+            with instrumentation.stage('anomaly_scores'):
+                climatology.score(batch)
+        created, updated = Knmi._upsert_measurements(data_mode, batch)
+        if data_mode == DataMode.per_hour and (created or updated):
+            with instrumentation.stage('aggregates'):
+                Aggregates.refresh((measurement.station_id, measurement.time) for measurement in batch)
+            with instrumentation.stage('latest_observations'):
+                LatestObservations.update(batch)
+        instrumentation.count('rows_read', len(batch))
+        instrumentation.count('rows_created', created)
+        instrumentation.count('rows_updated', updated)
+        return created, updated
+
+    @staticmethod
+    def read_columns(data_mode: DataMode, full_path_to_file: str,
+                     stations: Dict[int, Station]) -> Iterator[Tuple[Dict[str, List], List[Reject]]]:
+        """
+        Lazily decode a KNMI csv file into batches of columns, by the attribute names of the measurement fields
+
+        Unlike measurements, columns of plain values are cheap to pickle, so worker processes can decode files and
+        send the result back. Turn a batch into measurements with Knmi.build_measurements.
+
+        :param data_mode: Measurements per day or per hour
+        :param full_path_to_file: Full path to the csv file downloaded from the KNMI
+        :param stations: All known stations by their code
+        :return: Generator of the columns of the valid lines and the rejected lines, per batch of at most BATCH_SIZE
+                 lines. The columns are empty when every line of the batch was rejected.
+        """
+
+        decode = Knmi._decode_hourly_batch if data_mode == DataMode.per_hour else Knmi._decode_daily_batch
+        for lines, rejects in Knmi._read_lines(data_mode, full_path_to_file, stations):
+            columns = {attname: list(values) for attname, values in decode(lines, stations).items()} if lines else {}
+            yield columns, rejects
+
+    @staticmethod
+    def _read_lines(data_mode: DataMode, full_path_to_file: str,
+                    stations: Dict[int, Station]) -> Iterator[Tuple[List[List[str]], List[Reject]]]:
+        """
+        Lazily read the data lines of a KNMI csv file in validated batches, see Validator
+
+        :return: Generator of the valid lines and the rejected lines, per batch of at most BATCH_SIZE lines
+        """
+
+        # Imported here, since numpy takes longer to import than a download without new data
+        from data_sources.validation import Validator
+
+        if data_mode == DataMode.per_hour:
+            columns = {**Knmi.HOURLY_TENTHS_COLUMNS, **Knmi.HOURLY_INTEGER_COLUMNS, **Knmi.HOURLY_FLAG_COLUMNS}
+            validator = Validator(full_path_to_file, Knmi.HOURLY_NR_VALUES, stations, columns, Knmi.HOURLY_RANGES,
+                                  Knmi.HOURLY_SPECIAL_VALUES, hour_column=2)
+        else:
+            columns = {**Knmi.DAILY_TENTHS_COLUMNS, **Knmi.DAILY_INTEGER_COLUMNS}
+            validator = Validator(full_path_to_file, Knmi.DAILY_NR_VALUES, stations, columns, Knmi.DAILY_RANGES)
+
         with open(full_path_to_file, 'r') as f:
             csv_reader = csv.reader(f, delimiter=',', quotechar=None, skipinitialspace=True)
-            for line in csv_reader:
-                if line[0].startswith('#'):
-                    continue
+            lines = ((csv_reader.line_num, line) for line in csv_reader if line and not line[0].startswith('#'))
+            for batch in batched(lines, Knmi.BATCH_SIZE):
+                line_numbers, batch = zip(*batch)
+                with instrumentation.stage('validate'):
+                    validated = validator.validate(list(batch), line_numbers)
+                yield validated
+
+    @staticmethod
+    def _read_columns_in_worker(data_mode: DataMode, full_path_to_file: str,
+                                stations: Dict[int, Station]) -> List[Tuple[Dict[str, List], List[Reject]]]:
+        return list(Knmi.read_columns(data_mode, full_path_to_file, stations))
+
+    @staticmethod
+    def build_measurements(data_mode: DataMode, columns: Dict[str, Iterable]) -> List[models.Model]:
+        """
+        Build unsaved measurements from columns decoded by Knmi.read_columns
+        """
+
+        return Knmi._build_instances(Knmi.MODELS[data_mode], columns)
+
+    @staticmethod
+    def _read_hourly_measurements(full_path_to_file: str, stations: Dict[int, Station], fast_parsing: bool = True,
+                                  rejects_file: Optional[RejectsFile] = None) -> Iterator[Measurement]:
+        """
+        Lazily parse the valid lines of an hourly KNMI csv file into unsaved measurements
 
+        :param full_path_to_file: Full path to the csv file downloaded from the KNMI
+        :param stations: All known stations by their code
+        :param fast_parsing: Decode the file column by column with cached parsers instead of field by field
+        :param rejects_file: File to write the rejected lines to, they are logged without one
+        :return: Generator of unsaved measurements, one per valid data line
+        """
+
+        for lines, rejects in Knmi._read_lines(DataMode.per_hour, full_path_to_file, stations):
+            log_rejects(rejects, rejects_file)
+            if not lines:
+                continue
+            if fast_parsing:
+                yield from Knmi._parse_hourly_batch(lines, stations)
+                continue
+
+            # The same parsers as the columns, but uncached, so that every field is parsed separately
+            parse_integer = Knmi._parse_integer.__wrapped__
+            for line in lines:
                 line = [value or None for value in line]
                 station_code, day, hour, wind_direction, wind_speed, _, gust_of_wind, temperature, _, dew_temperature, \
                 sunshine, radiation, precipitation_duration, precipitation, air_pressure, visibility, cloud_cover, \
                 relative_humidity, _, _, mist, rain, snow, lightning, icing = line
-                station = stations[station_code]
+                station = stations[int(station_code)]
                 day = datetime.strptime(day, '%Y%m%d')
 
-                hourly_measurements.append(Measurement(
-                    station=station, day=day, hour=hour, time=datetime_from_day_and_hour(day, int(hour) - 1),
-                    wind_direction=Knmi._parse_number(wind_direction),
+                yield Measurement(
+                    station=station, time=datetime_from_day_and_hour(day, int(hour) - 1),
+                    wind_direction=parse_integer(wind_direction),
                     wind_speed=Knmi._parse_number(wind_speed), gust_of_wind=Knmi._parse_number(gust_of_wind),
                     temperature=Knmi._parse_number(temperature), dew_temperature=Knmi._parse_number(dew_temperature),
-                    sunshine=Knmi._parse_number(sunshine), radiation=radiation,
+                    sunshine=Knmi._parse_number(sunshine), radiation=parse_integer(radiation),
                     precipitation_duration=Knmi._parse_number(precipitation_duration),
                     precipitation=Knmi._parse_number(precipitation), air_pressure=Knmi._parse_number(air_pressure),
-                    visibility=visibility, cloud_cover=cloud_cover, relative_humidity=relative_humidity,
-                    mist=mist or False, rain=rain or False, snow=snow or False, lightning=lightning or False,
-                    icing=icing or False)
+                    visibility=parse_integer(visibility), cloud_cover=parse_integer(cloud_cover),
+                    relative_humidity=parse_integer(relative_humidity),
+                    mist=Knmi._parse_flag(mist), rain=Knmi._parse_flag(rain), snow=Knmi._parse_flag(snow),
+                    lightning=Knmi._parse_flag(lightning), icing=Knmi._parse_flag(icing)
                 )
 
-        if not hourly_measurements:
-            return []
+    @staticmethod
+    def _parse_hourly_batch(lines: List[List[str]], stations: Dict[int, Station]) -> List[Measurement]:
+        """
+        Parse a batch of hourly KNMI csv lines by decoding every column at once
+
+        The KNMI files only contain a small set of distinct values per column, so every value is parsed by a cached
+        parser and most values of a column are a dictionary lookup instead of a string conversion.
 
+        :param lines: Data lines of the csv file, already split into values
+        :param stations: All known stations by their code
+        :return: Unsaved measurements, one per line
+        """
+
+        return Knmi._build_instances(Measurement, Knmi._decode_hourly_batch(lines, stations))
+
+    @staticmethod
+    def _decode_hourly_batch(lines: List[List[str]], stations: Dict[int, Station]) -> Dict[str, Iterable]:
+        columns = list(zip(*lines))
+        values_by_attname = {
+            'station_id': [stations[code].code for code in map(int, columns[0])],
+            'time': [day + Knmi.HOURS[hour - 1] for day, hour in zip(map(Knmi._parse_day, columns[1]),
+                                                                      map(int, columns[2]))],
+        }
+        Knmi._decode_columns(columns, values_by_attname, Knmi.HOURLY_TENTHS_COLUMNS, Knmi.HOURLY_INTEGER_COLUMNS,
+                             Knmi.HOURLY_FLAG_COLUMNS)
+        return values_by_attname
+
+    @staticmethod
+    def _read_daily_measurements(full_path_to_file: str, stations: Dict[int, Station],
+                                 rejects_file: Optional[RejectsFile] = None) -> Iterator[DailyMeasurement]:
+        """
+        Lazily parse the valid lines of a daily KNMI csv file into unsaved daily measurements
+
+        :param full_path_to_file: Full path to the csv file downloaded from the KNMI
+        :param stations: All known stations by their code
+        :param rejects_file: File to write the rejected lines to, they are logged without one
+        :return: Generator of unsaved daily measurements, one per valid data line
+        """
+
+        for lines, rejects in Knmi._read_lines(DataMode.per_day, full_path_to_file, stations):
+            log_rejects(rejects, rejects_file)
+            if lines:
+                yield from Knmi._parse_daily_batch(lines, stations)
+
+    @staticmethod
+    def _parse_daily_batch(lines: List[List[str]], stations: Dict[int, Station]) -> List[DailyMeasurement]:
+        """
+        Parse a batch of daily KNMI csv lines by decoding every column at once
+
+        :param lines: Data lines of the csv file, already split into values
+        :param stations: All known stations by their code
+        :return: Unsaved daily measurements, one per line
+        """
+
+        return Knmi._build_instances(DailyMeasurement, Knmi._decode_daily_batch(lines, stations))
+
+    @staticmethod
+    def _decode_daily_batch(lines: List[List[str]], stations: Dict[int, Station]) -> Dict[str, Iterable]:
+        columns = list(zip(*lines))
+        values_by_attname = {
+            'station_id': [stations[code].code for code in map(int, columns[0])],
+            'day': [day.date() for day in map(Knmi._parse_day, columns[1])],
+        }
+        Knmi._decode_columns(columns, values_by_attname, Knmi.DAILY_TENTHS_COLUMNS, Knmi.DAILY_INTEGER_COLUMNS)
+        return values_by_attname
+
+    @staticmethod
+    def _decode_columns(columns: List[Tuple[str, ...]], values_by_attname: Dict[str, Iterable],
+                        tenths_columns: Dict[str, int], integer_columns: Dict[str, int],
+                        flag_columns: Dict[str, int] = None):
+        """
+        Add the lazily decoded measurement columns to values_by_attname, by the way they are encoded in the csv
+        """
+
+        for field_name, index in tenths_columns.items():
+            values_by_attname[field_name] = map(Knmi._parse_tenths, columns[index])
+        for field_name, index in integer_columns.items():
+            values_by_attname[field_name] = map(Knmi._parse_integer, columns[index])
+        for field_name, index in (flag_columns or {}).items():
+            values_by_attname[field_name] = map(Knmi._parse_flag, columns[index])
+
+    @staticmethod
+    def _build_instances(model: Type[models.Model], values_by_attname: Dict[str, Iterable]) -> List[models.Model]:
+        """
+        Build unsaved model instances from their columns, leaving out the primary key
+
+        Positional arguments in field order skip the much slower keyword handling of Model.__init__. Fields without a
+        column, like the primary key, get their default value.
+        """
+
+        field_columns = [
+            values_by_attname.get(field.attname, repeat(field.get_default())) for field in model._meta.concrete_fields
+        ]
+        with instrumentation.stage('build_instances'):
+            return [model(*values) for values in zip(*field_columns)]
+
+    @staticmethod
+    def _upsert_measurements(data_mode: DataMode, measurements: List[models.Model]) -> Tuple[int, int]:
+        """
+        Insert the new measurements and update the changed ones, identified by their station and time
+
+        :param data_mode: Measurements per day or per hour
+        :param measurements: Batch of unsaved measurements
+        :return: Number of created and number of updated measurements
+        """
+
+        model = Knmi.MODELS[data_mode]
+        time_field = Knmi.TIME_FIELDS[data_mode]
+        field_names = Knmi.FIELDS[data_mode]
+
+        # If a station and time occur more than once, the last occurrence wins
+        new_measurements: Dict[Tuple[int, Union[date, datetime]], models.Model] = {
+            (measurement.station_id, getattr(measurement, time_field)): measurement for measurement in measurements
+        }
+        if not new_measurements:
+            return 0, 0
+
+        station_ids = {station_id for station_id, _ in new_measurements}
+        times = [time for _, time in new_measurements]
+        with instrumentation.stage('lookup'):
+            existing_measurements = list(model.objects.filter(
+                station_id__in=station_ids, **{f'{time_field}__range': (min(times), max(times))}
+            ).values_list('id', 'station_id', time_field, *field_names))
+
+        fields = [model._meta.get_field(field_name) for field_name in field_names]
         with transaction.atomic():
-            Measurement.objects.all().delete()
-            Measurement.objects.bulk_create(hourly_measurements)
-        return hourly_measurements
+            changed_measurements = []
+            for pk, station_id, time, *values in existing_measurements:
+                measurement = new_measurements.pop((station_id, time), None)
+                if measurement is None:
+                    continue
+                new_values = [field.to_python(getattr(measurement, field.attname)) for field in fields]
+                if new_values != values:
+                    measurement.pk = pk
+                    changed_measurements.append(measurement)
+
+            with instrumentation.stage('bulk_create'):
+                bulk_insert(model, new_measurements.values())
+            with instrumentation.stage('bulk_update'):
+                model.objects.bulk_update(changed_measurements, field_names + Knmi._derived_fields(data_mode))
+        return len(new_measurements), len(changed_measurements)
 
     @staticmethod
     def _parse_number(n: Optional[str]) -> Optional[Decimal]:
@@ -130,3 +729,56 @@ class Knmi:
         if n is None:
             return None
         return Decimal(n) / 10
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _parse_tenths(n: str) -> Optional[Decimal]:
+        """
+        Cached version of _parse_number for the raw values in the Knmi csv file, where an empty string means no value
+
+        >>> Knmi._parse_tenths('24')
+        Decimal('2.4')
+        >>> Knmi._parse_tenths('')
+        None
+        """
+
+        if not n:
+            return None
+        return Decimal(int(n)).scaleb(-1)
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _parse_integer(n: str) -> Optional[int]:
+        """
+        Parse the Knmi numbers that are measured in whole units, where an empty string means no value
+
+        >>> Knmi._parse_integer('24')
+        24
+        """
+
+        if not n:
+            return None
+        return int(n)
+
+    @staticmethod
+    def _parse_flag(n: str) -> bool:
+        """
+        Parse the Knmi 0/1 indicators, where an empty string means that the phenomenon did not occur
+
+        >>> Knmi._parse_flag('1')
+        True
+        """
+
+        return n == '1'
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _parse_day(day: str) -> datetime:
+        """
+        Parse a Knmi YYYYMMDD day into the timezone-aware datetime at the start of that day
+
+        >>> Knmi._parse_day('20210128')
+        datetime.datetime(2021, 1, 28, 0, 0, tzinfo=<UTC>)
+        """
+
+        return datetime_from_day_and_hour(datetime.strptime(day, '%Y%m%d'), 0)
@@ -0,0 +1,36 @@
+import os.path
+import time
+
+from django.core.management import BaseCommand
+
+from common.utils import data_dir
+from data_sources.knmi import Knmi
+from stations.models import Station
+
+
+class Command(BaseCommand):
+    help = 'Compare the rows per second of the field by field and the fast KNMI hourly parser'
+
+    def handle(self, *args, **options):
+        full_path_to_file = options['file']
+        repeat = options['repeat']
+
+        # Unsaved stations are enough for parsing, so the benchmark does not depend on the database
+        stations = {code: Station(code=code) for code in range(1000)}
+
+        for label, fast_parsing in [('field by field', False), ('fast', True)]:
+            nr_rows, duration = 0, 0.0
+            for _ in range(repeat):
+                for cached_parser in [Knmi._parse_tenths, Knmi._parse_integer, Knmi._parse_day]:
+                    cached_parser.cache_clear()
+                start = time.perf_counter()
+                for _ in Knmi._read_hourly_measurements(full_path_to_file, stations, fast_parsing):
+                    nr_rows += 1
+                duration += time.perf_counter() - start
+            print(f'{label:>15}: {nr_rows / duration:10.0f} rows/s ({nr_rows} rows in {duration:.3f} s)')
+
+    def add_arguments(self, parser):
+        help_file = 'Hourly KNMI csv file to parse'
+        parser.add_argument('--file', type=str, default=os.path.join(data_dir, 'per_hour_knmi.csv'), help=help_file)
+        help_repeat = 'Number of times to parse the file'
+        parser.add_argument('--repeat', type=int, default=10, help=help_repeat)
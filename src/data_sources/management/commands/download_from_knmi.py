@@ -1,17 +1,44 @@
-from django.core.management import BaseCommand
-
+from common.instrumentation import InstrumentedCommand
 from data_sources.knmi import DataMode, Knmi
+from data_sources.manifest import DownloadManifest
 
 
-class Command(BaseCommand):
+class Command(InstrumentedCommand):
     help = 'Download the weather measurements from the KNMI'
 
     def handle(self, *args, **options):
-        full_path_to_file = Knmi.download_weather(DataMode.per_hour)
-        measurements = Knmi.import_weather(DataMode.per_hour, full_path_to_file)
+        data_mode = DataMode(options['data_mode'])
+        manifest = None if options['no_manifest'] else DownloadManifest()
+        full_path_to_file = Knmi.download_weather(
+            data_mode, start=options['start'], end=options['end'], stations=options['stations'],
+            shard_days=options['shard_days'], max_workers=options['workers'], manifest=manifest
+        )
+        if full_path_to_file is None:
+            print('No new measurements to import')
+            return
+
+        nr_measurements = Knmi.import_weather(data_mode, full_path_to_file, drop_indexes=options['drop_indexes'])
+        if manifest:
+            Knmi.record_import(data_mode, manifest)
         print(f'Successfully downloaded and imported {full_path_to_file}, '
-              f'resulting in {len(measurements)} measurements')
+              f'resulting in {nr_measurements} measurements')
 
     def add_arguments(self, parser):
         help_data_mode = 'Data mode: day or hour'
         parser.add_argument('data_mode', type=str, help=help_data_mode)
+        help_start = 'Start time YYYYMMDD for day or YYYYMMDDHH for hour, defaults to the last imported time per ' \
+                     'station. Required for stations that have never been imported.'
+        parser.add_argument('--start', type=str, help=help_start)
+        help_end = 'End time YYYYMMDD for day or YYYYMMDDHH for hour, defaults to now'
+        parser.add_argument('--end', type=str, help=help_end)
+        help_stations = 'Station codes separated by :, each station is downloaded separately. Defaults to ALL'
+        parser.add_argument('--stations', type=str, default='ALL', help=help_stations)
+        help_shard_days = 'Maximum number of days per download request'
+        parser.add_argument('--shard-days', type=int, default=31, help=help_shard_days)
+        help_workers = 'Maximum number of concurrent download requests'
+        parser.add_argument('--workers', type=int, default=4, help=help_workers)
+        help_no_manifest = 'Download the full time range again, without reading or updating the download manifest'
+        parser.add_argument('--no-manifest', action='store_true', help=help_no_manifest)
+        help_drop_indexes = 'Drop the secondary indexes of the measurements during the import and rebuild them ' \
+                            'afterwards, which is faster for large backfills'
+        parser.add_argument('--drop-indexes', action='store_true', help=help_drop_indexes)
@@ -0,0 +1,37 @@
+import glob
+import os.path
+
+from django.core.management import CommandError
+
+from common.instrumentation import InstrumentedCommand
+from data_sources.knmi import DataMode, Knmi
+
+
+class Command(InstrumentedCommand):
+    help = 'Import many KNMI csv files in parallel, for example a backfill of one file per station and year'
+
+    def handle(self, *args, **options):
+        data_mode = DataMode(options['data_mode'])
+        full_paths_to_files = []
+        for path in options['paths']:
+            if os.path.isdir(path):
+                full_paths_to_files += sorted(glob.glob(os.path.join(path, '*.csv')))
+            else:
+                full_paths_to_files += sorted(glob.glob(path))
+        if not full_paths_to_files:
+            raise CommandError(f'No csv files found in {", ".join(options["paths"])}')
+
+        nr_measurements = Knmi.import_files(data_mode, full_paths_to_files, max_workers=options['workers'],
+                                            drop_indexes=options['drop_indexes'])
+        print(f'Successfully imported {len(full_paths_to_files)} files, resulting in {nr_measurements} measurements')
+
+    def add_arguments(self, parser):
+        help_data_mode = 'Data mode: day or hour'
+        parser.add_argument('data_mode', type=str, help=help_data_mode)
+        help_paths = 'Directories with csv files, csv files or glob patterns like "backfill/*_2020.csv"'
+        parser.add_argument('paths', nargs='+', type=str, help=help_paths)
+        help_workers = 'Number of processes that parse files, defaults to the number of cores'
+        parser.add_argument('--workers', type=int, help=help_workers)
+        help_drop_indexes = 'Drop the secondary indexes of the measurements during the import and rebuild them ' \
+                            'afterwards, which is faster for large backfills'
+        parser.add_argument('--drop-indexes', action='store_true', help=help_drop_indexes)
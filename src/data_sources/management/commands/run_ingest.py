@@ -0,0 +1,62 @@
+import signal
+
+from django.core.management import CommandError
+
+from common.instrumentation import InstrumentedCommand
+from data_sources.data_mode import DataMode
+from data_sources.ingest import IngestService
+
+
+class Command(InstrumentedCommand):
+    help = 'Run a service that periodically downloads the new KNMI measurements and imports them'
+
+    def handle(self, *args, **options):
+        try:
+            data_modes = [DataMode(data_mode) for data_mode in options['data_modes'].split(':')]
+        except ValueError as e:
+            raise CommandError(e)
+        intervals = {DataMode.per_hour: options['hourly_interval'], DataMode.per_day: options['daily_interval']}
+        urls = {DataMode.per_hour: options['hour_url'], DataMode.per_day: options['day_url']}
+        start = {DataMode.per_hour: options['hour_start'], DataMode.per_day: options['day_start']}
+
+        service = IngestService(
+            intervals={data_mode: intervals[data_mode] for data_mode in data_modes}, stations=options['stations'],
+            shard_days=options['shard_days'], io_workers=options['io_workers'],
+            parse_workers=options['parse_workers'], queue_size=options['queue_size'],
+            urls={data_mode: url for data_mode, url in urls.items() if url},
+            start={data_mode: time for data_mode, time in start.items() if time}
+        )
+        for signal_number in [signal.SIGINT, signal.SIGTERM]:
+            signal.signal(signal_number, lambda *_: service.stop())
+        service.run(once=options['once'])
+        print('Successfully stopped the ingest service')
+
+    def add_arguments(self, parser):
+        help_data_modes = 'Data modes separated by :, defaults to hour:day'
+        parser.add_argument('--data-modes', type=str, default='hour:day', help=help_data_modes)
+        help_hourly_interval = 'Seconds between downloads of the hourly measurements'
+        parser.add_argument('--hourly-interval', type=float, default=IngestService.INTERVALS[DataMode.per_hour],
+                            help=help_hourly_interval)
+        help_daily_interval = 'Seconds between downloads of the daily measurements'
+        parser.add_argument('--daily-interval', type=float, default=IngestService.INTERVALS[DataMode.per_day],
+                            help=help_daily_interval)
+        help_stations = 'Station codes separated by :, each station is downloaded separately. Defaults to ALL'
+        parser.add_argument('--stations', type=str, default='ALL', help=help_stations)
+        help_shard_days = 'Maximum number of days per download request'
+        parser.add_argument('--shard-days', type=int, default=31, help=help_shard_days)
+        help_io_workers = 'Maximum number of concurrent download requests'
+        parser.add_argument('--io-workers', type=int, default=4, help=help_io_workers)
+        help_parse_workers = 'Number of processes that parse downloaded files, defaults to the number of cores'
+        parser.add_argument('--parse-workers', type=int, help=help_parse_workers)
+        help_queue_size = 'Maximum number of shards that are downloaded and parsed ahead of the database writes'
+        parser.add_argument('--queue-size', type=int, default=8, help=help_queue_size)
+        help_hour_start = 'Start time YYYYMMDDHH of the hourly measurements of stations that have never been imported'
+        parser.add_argument('--hour-start', type=str, help=help_hour_start)
+        help_day_start = 'Start time YYYYMMDD of the daily measurements of stations that have never been imported'
+        parser.add_argument('--day-start', type=str, help=help_day_start)
+        help_hour_url = 'URL to download the hourly measurements from, for example a local test server'
+        parser.add_argument('--hour-url', type=str, help=help_hour_url)
+        help_day_url = 'URL to download the daily measurements from, for example a local test server'
+        parser.add_argument('--day-url', type=str, help=help_day_url)
+        help_once = 'Download every data mode once and stop, instead of running until interrupted'
+        parser.add_argument('--once', action='store_true', help=help_once)
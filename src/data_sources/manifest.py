@@ -0,0 +1,127 @@
+import json
+import os.path
+import threading
+from typing import Dict, List, Optional
+
+from common.utils import data_dir
+from data_sources.downloader import Shard
+
+
+class DownloadManifest:
+    """
+    Local record of what has been downloaded from the KNMI, stored as a json file in the data directory
+
+    Per data mode, the manifest holds:
+    - the last time that is in the database for every station, after its latest import
+    - the checksum of the shard that was imported last for every station
+    - the checksum of every shard whose file is complete on disk, but whose measurements have not been imported yet
+
+    This allows to:
+    - only ask for the missing time window of a station. The window starts at the last imported time, so that hours
+      that the KNMI publishes late are picked up by the next run.
+    - skip shards whose contents did not change since the last import of their station
+    - resume an interrupted download or import from the shard files that are already complete
+
+    Shards are forgotten once they have been imported, so the manifest does not grow with the number of runs.
+    """
+
+    DOWNLOADED = 'downloaded'
+
+    def __init__(self, full_path_to_file: str = os.path.join(data_dir, 'knmi_manifest.json')):
+        self.full_path_to_file = full_path_to_file
+        self._lock = threading.Lock()
+        if os.path.exists(full_path_to_file):
+            with open(full_path_to_file, 'r') as f:
+                self._manifest = json.load(f)
+        else:
+            self._manifest = {}
+
+    def last_fetched(self, data_mode: str, station: str) -> Optional[str]:
+        """
+        :return: string YYYYMMDD(HH) of the last imported time for this station, or None if it was never imported
+        """
+
+        return self._entry(data_mode)['stations'].get(station)
+
+    def shard(self, data_mode: str, shard: Shard) -> Optional[Dict[str, str]]:
+        """
+        :return: Checksum and state of the shard, or None if it has not been downloaded since its last import
+        """
+
+        return self._entry(data_mode)['shards'].get(self._key(shard))
+
+    def record_download(self, data_mode: str, shard: Shard, checksum: str) -> bool:
+        """
+        Record that a shard has been downloaded completely
+
+        :return: Whether the shard differs from the shard that was imported last for its stations, and therefore
+                 needs to be imported
+        """
+
+        with self._lock:
+            entry = self._entry(data_mode)
+            if entry['imported'].get(shard.stations) == checksum:
+                return False
+
+            entry['shards'][self._key(shard)] = {'checksum': checksum, 'state': self.DOWNLOADED}
+            self._save()
+            return True
+
+    def downloaded_shards(self, data_mode: str) -> List[Shard]:
+        """
+        :return: Shards of this data mode that have been downloaded but not imported
+        """
+
+        return [Shard(*key.split(':')) for key, state in self._entry(data_mode)['shards'].items()
+                if state['state'] == self.DOWNLOADED]
+
+    def record_import(self, data_mode: str, last_times: Dict[str, str], shards: List[Shard] = None):
+        """
+        Record that downloaded shards of this data mode have been imported into the database, and forget them
+
+        :param data_mode: Data mode of the shards
+        :param last_times: string YYYYMMDD(HH) of the last time in the database per station code, or ALL, of the
+                           imported shards. A station keeps its previous time if that is later.
+        :param shards: Shards that have been imported, defaults to all downloaded shards
+        """
+
+        keys = None if shards is None else {self._key(shard) for shard in shards}
+        with self._lock:
+            entry = self._entry(data_mode)
+            for key, state in list(entry['shards'].items()):
+                # Manifests of earlier versions also kept the shards that were imported
+                if state['state'] == self.DOWNLOADED and keys is not None and key not in keys:
+                    continue
+                del entry['shards'][key]
+                if state['state'] == self.DOWNLOADED:
+                    entry['imported'][key.split(':')[0]] = state['checksum']
+            for station, last_time in last_times.items():
+                entry['stations'][station] = max(last_time, entry['stations'].get(station, last_time))
+            self._save()
+
+    def discard_downloads(self, data_mode: str):
+        """
+        Forget the shards of this data mode that have been downloaded but not imported, so they are downloaded again
+        """
+
+        with self._lock:
+            shards = self._entry(data_mode)['shards']
+            for key in [key for key, state in shards.items() if state['state'] == self.DOWNLOADED]:
+                del shards[key]
+            self._save()
+
+    def _entry(self, data_mode: str) -> Dict[str, Dict]:
+        entry = self._manifest.setdefault(data_mode, {'stations': {}, 'shards': {}})
+        entry.setdefault('imported', {})
+        return entry
+
+    def _save(self):
+        # Write to a temporary file first, so an interrupted run never leaves a corrupt manifest behind
+        partial_path_to_file = f'{self.full_path_to_file}.part'
+        with open(partial_path_to_file, 'w') as f:
+            json.dump(self._manifest, f, indent=2, sort_keys=True)
+        os.replace(partial_path_to_file, self.full_path_to_file)
+
+    @staticmethod
+    def _key(shard: Shard) -> str:
+        return f'{shard.stations}:{shard.start}:{shard.end}'
@@ -0,0 +1,71 @@
+import csv
+import logging
+import os.path
+from typing import List, NamedTuple, Optional
+
+from common import instrumentation
+
+logger = logging.getLogger(__name__)
+
+
+class Reject(NamedTuple):
+    """
+    A line of a KNMI csv file that was not imported, with the reason why
+    """
+
+    source: str
+    line_number: int
+    reason: str
+    line: List[str]
+
+
+class RejectsFile:
+    """
+    Csv file with the lines that were rejected during an import, and the reason why
+
+    Every row holds the file and line number of the rejected line, the reason, and the values of the line. The file
+    is only created when a line is rejected.
+    """
+
+    def __init__(self, full_path_to_file: str):
+        self.full_path_to_file = full_path_to_file
+        self.nr_rejects = 0
+        self._file = None
+        self._writer = None
+
+    def __enter__(self) -> 'RejectsFile':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write(self, rejects: List[Reject]):
+        if not rejects:
+            return
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.full_path_to_file), exist_ok=True)
+            self._file = open(self.full_path_to_file, 'a', newline='')
+            self._writer = csv.writer(self._file)
+        for reject in rejects:
+            self._writer.writerow([reject.source, reject.line_number, reject.reason, *reject.line])
+        self.nr_rejects += len(rejects)
+        instrumentation.count('rows_rejected', len(rejects))
+
+    def close(self):
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        logger.warning(f'{self.nr_rejects} lines have been rejected, see {self.full_path_to_file}')
+
+
+def log_rejects(rejects: List[Reject], rejects_file: Optional[RejectsFile]):
+    """
+    Write rejected lines to the rejects file, or log them if there is none
+    """
+
+    if rejects_file is not None:
+        rejects_file.write(rejects)
+        return
+    for reject in rejects:
+        logger.warning(f'Line {reject.line_number} of {reject.source} has been rejected: {reject.reason}')
@@ -0,0 +1,111 @@
+import threading
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+HEADER = [
+    '# BRON: KONINKLIJK NEDERLANDS METEOROLOGISCH INSTITUUT (KNMI)\n',
+    '# STN,YYYYMMDD,   HH,   DD,   FH,   FF,   FX,    T,  T10N,  TD,   SQ,    Q,   DR,   RH,    P,   VV,    N,    U,'
+    '   WW,   IX,    M,    R,    S,    O,    Y\n',
+    '#\n',
+]
+
+
+def hourly_lines(stations: List[int], first_day: date, days: int, temperature: int = 45) -> List[str]:
+    """
+    Lines of an hourly KNMI csv file, with the same plausible values for every station and hour
+
+    :param temperature: Raw temperature of every line, in tenths of a degree
+    """
+
+    lines = []
+    for station in stations:
+        for day in (first_day + timedelta(days=offset) for offset in range(days)):
+            for hour in range(1, 25):
+                lines.append(f'{station:>5},{day:%Y%m%d},{hour:>5},  250,   40,   50,   70,{temperature:>5},     ,'
+                             f'   20,    0,    0,    0,   -1,10150,   75,    8,   90,     ,    5,    0,    0,    0,'
+                             f'    0,    0\n')
+    return lines
+
+
+class FakeKnmi:
+    """
+    Local stand-in for the KNMI download endpoint, for tests
+
+    It serves the lines of a csv file like the KNMI does: filtered by the stations and the start and end time of the
+    request, after the comment header. Use it as a context manager, which serves on a free port of localhost.
+
+    Failures can be queued for the next requests:
+    - 'error': respond with 503 Service Unavailable
+    - 'drop': send the headers and half of the body, then close the connection
+    """
+
+    ERROR = 'error'
+    DROP = 'drop'
+
+    def __init__(self, lines: List[str]):
+        """
+        :param lines: Data lines of the csv file, without the header, see hourly_lines
+        """
+
+        self.lines = lines
+        self.failures: List[str] = []
+        self.requests: List[Dict[str, str]] = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self._server.server_port}/getdata.cgi'
+
+    def __enter__(self) -> 'FakeKnmi':
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def respond(self, params: Dict[str, str]) -> bytes:
+        body = list(HEADER)
+        for line in self.lines:
+            values = [value.strip() for value in line.split(',')]
+            time = values[1] + f'{int(values[2]):02d}' if len(params['start']) == len('YYYYMMDDHH') else values[1]
+            if params['stns'] in ('ALL', values[0]) and params['start'] <= time <= params['end']:
+                body.append(line)
+        return ''.join(body).encode()
+
+    def _next_failure(self, params: Dict[str, str]):
+        with self._lock:
+            self.requests.append(params)
+            return self.failures.pop(0) if self.failures else None
+
+    def _handler(self):
+        fake_knmi = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                params = {name: values[0] for name, values in parse_qs(urlparse(self.path).query).items()}
+                failure = fake_knmi._next_failure(params)
+                if failure == FakeKnmi.ERROR:
+                    self.send_error(503)
+                    return
+
+                body = fake_knmi.respond(params)
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if failure == FakeKnmi.DROP:
+                    self.wfile.write(body[:len(body) // 2])
+                    self.close_connection = True
+                    return
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
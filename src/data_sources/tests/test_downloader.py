@@ -0,0 +1,94 @@
+import os.path
+import tempfile
+from datetime import date
+
+from django.test import SimpleTestCase
+
+from data_sources.downloader import DownloadException, Shard, ShardedDownloader
+from data_sources.manifest import DownloadManifest
+from data_sources.tests.fake_knmi import HEADER, FakeKnmi, hourly_lines
+
+
+class ShardedDownloaderTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.full_path_to_file = os.path.join(self.directory.name, 'per_hour_knmi.csv')
+        self.lines = hourly_lines([260, 280], date(2021, 1, 1), days=3)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_plan_shards(self):
+        shards = ShardedDownloader.plan_shards('2021010105', '2021010310', '260:280', shard_days=2)
+
+        self.assertEqual(shards, [
+            Shard('260', '2021010105', '2021010224'), Shard('260', '2021010301', '2021010310'),
+            Shard('280', '2021010105', '2021010224'), Shard('280', '2021010301', '2021010310'),
+        ])
+
+    def test_plan_shards_per_day(self):
+        shards = ShardedDownloader.plan_shards('20210101', '20210131', shard_days=31)
+
+        self.assertEqual(shards, [Shard('ALL', '20210101', '20210131')])
+
+    def test_download_merges_shards_in_order(self):
+        shards = ShardedDownloader.plan_shards('2021010101', '2021010324', '260:280', shard_days=1)
+
+        with FakeKnmi(self.lines) as fake_knmi:
+            downloader = ShardedDownloader(fake_knmi.url, max_workers=3)
+            downloaded = downloader.download(shards, self.full_path_to_file)
+
+        self.assertEqual(downloaded, self.full_path_to_file)
+        self.assertEqual(len(fake_knmi.requests), 6)
+        self.assertEqual(self._read_lines(), HEADER + self.lines)
+
+    def test_download_retries_after_server_error(self):
+        shards = ShardedDownloader.plan_shards('2021010101', '2021010324', '260', shard_days=3)
+
+        with FakeKnmi(self.lines) as fake_knmi:
+            fake_knmi.failures = [FakeKnmi.ERROR, FakeKnmi.ERROR]
+            downloader = ShardedDownloader(fake_knmi.url, max_retries=2, backoff=0)
+            downloader.download(shards, self.full_path_to_file)
+
+        self.assertEqual(len(fake_knmi.requests), 3)
+        self.assertEqual(self._read_lines(), HEADER + self.lines[:72])
+
+    def test_download_retries_after_dropped_connection(self):
+        shards = ShardedDownloader.plan_shards('2021010101', '2021010324', '280', shard_days=3)
+
+        with FakeKnmi(self.lines) as fake_knmi:
+            fake_knmi.failures = [FakeKnmi.DROP]
+            downloader = ShardedDownloader(fake_knmi.url, max_retries=1, backoff=0)
+            downloader.download(shards, self.full_path_to_file)
+
+        self.assertEqual(len(fake_knmi.requests), 2)
+        self.assertEqual(self._read_lines(), HEADER + self.lines[72:])
+        self.assertEqual(os.listdir(self.directory.name), ['per_hour_knmi.csv'])
+
+    def test_download_fails_after_retries(self):
+        shards = ShardedDownloader.plan_shards('2021010101', '2021010324', '260', shard_days=3)
+
+        with FakeKnmi(self.lines) as fake_knmi:
+            fake_knmi.failures = [FakeKnmi.ERROR] * 3
+            downloader = ShardedDownloader(fake_knmi.url, max_retries=2, backoff=0)
+            with self.assertRaises(DownloadException):
+                downloader.download(shards, self.full_path_to_file)
+
+        self.assertEqual(len(fake_knmi.requests), 3)
+        self.assertFalse(os.path.exists(self.full_path_to_file))
+
+    def test_download_skips_shards_that_did_not_change(self):
+        shards = ShardedDownloader.plan_shards('2021010101', '2021010324', '260:280', shard_days=3)
+        manifest = DownloadManifest(os.path.join(self.directory.name, 'knmi_manifest.json'))
+
+        with FakeKnmi(self.lines) as fake_knmi:
+            downloader = ShardedDownloader(fake_knmi.url, manifest=manifest, data_mode='hour')
+            self.assertEqual(downloader.download(shards, self.full_path_to_file), self.full_path_to_file)
+            manifest.record_import('hour', {'260': '2021010324', '280': '2021010324'})
+            self.assertIsNone(downloader.download(shards, self.full_path_to_file))
+
+        self.assertEqual(len(fake_knmi.requests), 4)
+
+    def _read_lines(self):
+        with open(self.full_path_to_file, 'r') as f:
+            return f.readlines()
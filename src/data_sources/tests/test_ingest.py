@@ -0,0 +1,78 @@
+import os.path
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+from unittest import mock
+
+import pytz
+from django.test import TransactionTestCase
+
+from data_sources.data_mode import DataMode
+from data_sources.ingest import IngestService
+from data_sources.manifest import DownloadManifest
+from data_sources.tests.fake_knmi import FakeKnmi, hourly_lines
+from measurements.latest import LatestObservations
+from measurements.models import Measurement
+from stations.models import Station
+
+
+class IngestServiceTest(TransactionTestCase):
+    """
+    Run the ingest service end to end against a local stand-in for the KNMI, in a temporary data directory
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for patcher in [
+            mock.patch('data_sources.ingest.data_dir', directory.name),
+            mock.patch('common.utils.last_import_file', os.path.join(directory.name, 'last_import')),
+            mock.patch.object(LatestObservations, 'FILE', os.path.join(directory.name, 'latest.pickle')),
+            mock.patch.object(LatestObservations, '_instance', None),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.manifest = DownloadManifest(os.path.join(directory.name, 'knmi_manifest.json'))
+
+        for code in [260, 280]:
+            Station.objects.create(code=code, longitude=5, latitude=52, altitude=0, name=str(code))
+
+    def test_ingest(self):
+        with FakeKnmi(hourly_lines([260, 280], date(2021, 1, 1), days=2)) as fake_knmi:
+            self._run(fake_knmi)
+
+        self.assertEqual(Measurement.objects.count(), 96)
+        self.assertEqual(self.manifest.last_fetched('hour', '260'), '2021010224')
+        self.assertEqual(self.manifest.last_fetched('hour', '280'), '2021010224')
+        self.assertEqual(self.manifest.downloaded_shards('hour'), [])
+        self.assertEqual(LatestObservations.get().station(280).time, datetime(2021, 1, 2, 23, tzinfo=pytz.utc))
+
+    def test_ingest_picks_up_hours_that_are_published_late(self):
+        # Hour 11 of the second day has not been published for station 280 yet, and hour 10 is published again later
+        # with a correction
+        lines = hourly_lines([260, 280], date(2021, 1, 1), days=2)
+        with FakeKnmi(lines[:48 + 24 + 10]) as fake_knmi:
+            self._run(fake_knmi)
+            self.assertEqual(Measurement.objects.count(), 82)
+            self.assertEqual(self.manifest.last_fetched('hour', '260'), '2021010224')
+            self.assertEqual(self.manifest.last_fetched('hour', '280'), '2021010210')
+
+            fake_knmi.lines = hourly_lines([260, 280], date(2021, 1, 1), days=2, temperature=55)
+            self._run(fake_knmi)
+
+        self.assertEqual(Measurement.objects.count(), 96)
+        self.assertEqual(self.manifest.last_fetched('hour', '280'), '2021010224')
+        # The next run starts at the last imported hour, the hours before it are not downloaded again
+        temperatures = dict(Measurement.objects.filter(station_id=280, time__day=2).values_list('time__hour',
+                                                                                                  'temperature'))
+        self.assertEqual(temperatures[8], Decimal('4.5'))
+        self.assertEqual(temperatures[9], Decimal('5.5'))
+        self.assertEqual(temperatures[23], Decimal('5.5'))
+        self.assertEqual({request['stns']: request['start'] for request in fake_knmi.requests[2:]},
+                         {'260': '2021010224', '280': '2021010210'})
+
+    def _run(self, fake_knmi: FakeKnmi):
+        service = IngestService(intervals={DataMode.per_hour: 0}, stations='260:280', shard_days=10000,
+                                io_workers=2, parse_workers=1, urls={DataMode.per_hour: fake_knmi.url},
+                                manifest=self.manifest, start={DataMode.per_hour: '2021010101'})
+        service.run(once=True)
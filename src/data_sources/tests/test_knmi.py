@@ -0,0 +1,74 @@
+import os.path
+import tempfile
+from datetime import date, datetime, timedelta
+
+import pytz
+from django.test import TestCase
+
+from data_sources.downloader import Shard
+from data_sources.knmi import DataMode, Knmi
+from data_sources.tests.fake_knmi import HEADER, hourly_lines
+from measurements.models import DailyMeasurement, Measurement
+from stations.models import Station
+
+
+class KnmiLastTimeTest(TestCase):
+    def setUp(self):
+        # Station 280 lags a few hours behind, and station 310 stopped reporting three months earlier
+        last_times = {260: datetime(2021, 3, 1, 23, tzinfo=pytz.utc), 280: datetime(2021, 3, 1, 19, tzinfo=pytz.utc),
+                      310: datetime(2020, 12, 1, 0, tzinfo=pytz.utc)}
+        for code, last_time in last_times.items():
+            station = Station.objects.create(code=code, longitude=5, latitude=52, altitude=0, name=str(code))
+            Measurement.objects.bulk_create(
+                Measurement(station=station, time=last_time - timedelta(hours=hour)) for hour in range(48)
+            )
+            DailyMeasurement.objects.bulk_create(
+                DailyMeasurement(station=station, day=last_time.date() - timedelta(days=day)) for day in range(2)
+            )
+
+    def test_plan_shards_of_all_stations(self):
+        shards = Knmi.plan_shards(DataMode.per_hour, end='2021030224', shard_days=31)
+        self.assertEqual(shards, [Shard('ALL', '2021030120', '2021030224')])
+
+        shards = Knmi.plan_shards(DataMode.per_day, end='20210302', shard_days=31)
+        self.assertEqual(shards, [Shard('ALL', '20210301', '20210302')])
+
+    def test_plan_shards_per_station(self):
+        shards = Knmi.plan_shards(DataMode.per_hour, end='2021030224', stations='260:310', shard_days=100)
+        self.assertEqual(shards, [Shard('260', '2021030124', '2021030224'), Shard('310', '2020120101', '2021030224')])
+
+    def test_last_imported_times(self):
+        shards = [Shard('ALL', '2020110101', '2020123124'), Shard('310', '2020110101', '2021033124')]
+        self.assertEqual(Knmi.last_imported_times(DataMode.per_hour, shards),
+                         {'ALL': '2020120101', '310': '2020120101'})
+        # A station that stopped within the range of a shard does not hold it back
+        shards = [Shard('ALL', '2020110101', '2021033124')]
+        self.assertEqual(Knmi.last_imported_times(DataMode.per_hour, shards), {'ALL': '2021030120'})
+        shards = [Shard('ALL', '20201101', '20210331')]
+        self.assertEqual(Knmi.last_imported_times(DataMode.per_day, shards), {'ALL': '20210301'})
+
+
+class KnmiParsingTest(TestCase):
+    def test_field_by_field_parsing_matches_column_parsing(self):
+        stations = {code: Station.objects.create(code=code, longitude=5, latitude=52, altitude=0, name=str(code))
+                    for code in [260, 280]}
+        lines = hourly_lines([260, 280], date(2021, 1, 28), days=1)
+        # Mist, no visibility and no wind direction
+        lines[0] = lines[0].replace('   75,    8,   90,     ,    5,    0', '     ,    8,   90,     ,    5,    1')
+        lines[1] = lines[1].replace('  250,', '     ,')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        full_path_to_file = os.path.join(directory.name, 'per_hour_knmi.csv')
+        with open(full_path_to_file, 'w') as f:
+            f.writelines(HEADER + lines)
+
+        fast = list(Knmi._read_hourly_measurements(full_path_to_file, stations, fast_parsing=True))
+        slow = list(Knmi._read_hourly_measurements(full_path_to_file, stations, fast_parsing=False))
+
+        self.assertEqual(len(slow), 48)
+        self.assertEqual((slow[0].mist, slow[0].visibility, slow[1].wind_direction), (True, None, None))
+        for fast_measurement, slow_measurement in zip(fast, slow):
+            for field in Measurement._meta.concrete_fields:
+                fast_value = getattr(fast_measurement, field.attname)
+                slow_value = getattr(slow_measurement, field.attname)
+                self.assertEqual((type(slow_value), slow_value), (type(fast_value), fast_value), field.name)
@@ -0,0 +1,78 @@
+from datetime import date
+
+from django.test import SimpleTestCase
+
+from data_sources.knmi import Knmi
+from data_sources.tests.fake_knmi import hourly_lines
+from data_sources.validation import Validator
+
+
+class ValidatorTest(SimpleTestCase):
+    def setUp(self):
+        columns = {**Knmi.HOURLY_TENTHS_COLUMNS, **Knmi.HOURLY_INTEGER_COLUMNS, **Knmi.HOURLY_FLAG_COLUMNS}
+        self.hourly_validator = Validator('hourly.csv', Knmi.HOURLY_NR_VALUES, [260, 280], columns,
+                                          Knmi.HOURLY_RANGES, Knmi.HOURLY_SPECIAL_VALUES, hour_column=2)
+        columns = {**Knmi.DAILY_TENTHS_COLUMNS, **Knmi.DAILY_INTEGER_COLUMNS}
+        self.daily_validator = Validator('daily.csv', Knmi.DAILY_NR_VALUES, [260, 280], columns, Knmi.DAILY_RANGES)
+
+    def test_daily_lines_before_1970(self):
+        lines = [self._daily_line(260, '19010101'), self._daily_line(260, '19691231'),
+                 self._daily_line(280, '19010101'), self._daily_line(260, '19700101')]
+
+        valid, rejects = self.daily_validator.validate(lines, [1, 2, 3, 4])
+
+        self.assertEqual(valid, lines)
+        self.assertEqual(rejects, [])
+
+    def test_hourly_lines_before_1970(self):
+        lines = self._split(hourly_lines([260], date(1951, 1, 1), days=2))
+
+        valid, rejects = self.hourly_validator.validate(lines, list(range(1, len(lines) + 1)))
+
+        self.assertEqual(len(valid), 48)
+        self.assertEqual(rejects, [])
+
+    def test_invalid_days(self):
+        lines = [self._daily_line(260, '19510229'), self._daily_line(260, '19011301'), self._daily_line(260, '1951')]
+
+        valid, rejects = self.daily_validator.validate(lines, [1, 2, 3])
+
+        self.assertEqual(valid, [])
+        self.assertEqual([reject.reason for reject in rejects],
+                         ['invalid day 19510229', 'invalid day 19011301', 'invalid day 1951'])
+
+    def test_duplicates(self):
+        lines = self._split(hourly_lines([260], date(1951, 1, 1), days=1))
+
+        valid, rejects = self.hourly_validator.validate(lines + lines[:1], list(range(1, 26)))
+        self.assertEqual(len(valid), 24)
+        self.assertEqual([(reject.line_number, reject.reason) for reject in rejects],
+                         [(25, 'duplicate station and time')])
+
+        # Keys are kept across the batches of a file
+        valid, rejects = self.hourly_validator.validate(lines[23:], [26])
+        self.assertEqual(valid, [])
+        self.assertEqual([reject.reason for reject in rejects], ['duplicate station and time'])
+
+    def test_out_of_range(self):
+        lines = self._split(hourly_lines([260], date(1951, 1, 1), days=1))
+        lines[0][7] = '700'
+        lines[1][3] = '990'
+        lines[2][3] = '400'
+        lines[3][0] = '999'
+
+        valid, rejects = self.hourly_validator.validate(lines, list(range(1, 25)))
+
+        self.assertEqual(len(valid), 21)
+        self.assertIn(lines[1], valid)
+        self.assertEqual([(reject.line_number, reject.reason) for reject in rejects], [
+            (1, 'temperature out of range 700'), (3, 'wind_direction out of range 400'), (4, 'unknown station 999'),
+        ])
+
+    @staticmethod
+    def _daily_line(station: int, day: str):
+        return [str(station), day] + [''] * (Knmi.DAILY_NR_VALUES - 2)
+
+    @staticmethod
+    def _split(lines):
+        return [[value.strip() for value in line.split(',')] for line in lines]
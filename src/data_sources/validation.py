@@ -0,0 +1,205 @@
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from data_sources.rejects import Reject
+
+
+class KeySet:
+    """
+    Compact set of (station, time) keys, where times are whole hours or days since the epoch
+
+    Every station has a bitmap over the range of times that was seen for it, which grows as needed. A year of hourly
+    keys takes 9 kB per station, where a set of Python tuples would take about 1 MB.
+    """
+
+    def __init__(self):
+        self._bitmaps: Dict[int, Tuple[int, np.ndarray]] = {}
+
+    def add(self, stations: np.ndarray, times: np.ndarray) -> np.ndarray:
+        """
+        Add keys to the set
+
+        :param stations: Station code of every key
+        :param times: Time of every key, as a whole number of hours or days
+        :return: Whether every key was in the set already, which includes earlier occurrences in the same call
+        """
+
+        present = np.zeros(len(stations), dtype=bool)
+        for station in np.unique(stations):
+            rows = np.flatnonzero(stations == station)
+            start, bitmap = self._bitmap(int(station), int(times[rows].min()), int(times[rows].max()))
+            offsets = times[rows] - start
+            _, first_occurrences = np.unique(offsets, return_index=True)
+            repeated = np.ones(len(rows), dtype=bool)
+            repeated[first_occurrences] = False
+            present[rows] = bitmap[offsets] | repeated
+            bitmap[offsets] = True
+        return present
+
+    def _bitmap(self, station: int, first: int, last: int) -> Tuple[int, np.ndarray]:
+        start, bitmap = self._bitmaps.get(station, (first, np.zeros(0, dtype=bool)))
+        end = start + len(bitmap)
+        if first < start or last >= end:
+            # Grow by at least the current size, so that extending the range time after time stays cheap
+            new_start = min(start, first - len(bitmap)) if first < start else start
+            new_end = max(end, last + 1 + len(bitmap)) if last >= end else end
+            grown = np.zeros(new_end - new_start, dtype=bool)
+            grown[start - new_start:end - new_start] = bitmap
+            start, bitmap = new_start, grown
+            self._bitmaps[station] = start, bitmap
+        return start, bitmap
+
+
+class Validator:
+    """
+    Check the lines of a KNMI csv file column by column before they are decoded, and drop the ones that cannot be
+    imported
+
+    A line is rejected when:
+    - it does not have the expected number of values
+    - its station is not one of the known stations
+    - its day or hour does not exist
+    - a value is not a whole number, or outside the plausible range of its field. Ranges are in the units of the csv,
+      so they include the special codes of the KNMI, like -1 for less than 0.05 mm of precipitation. Other special
+      codes, like 990 for a variable wind direction, are listed separately.
+    - an earlier line of the same file had the same station and time
+
+    Every line gets only the first reason that applies. A validator keeps the keys of the lines it accepted, so
+    validate all batches of a file with the same validator. The keys are kept per file, since the files of an import
+    do not overlap: they are per station and time range.
+    """
+
+    # Range of values of fields without a range of their own, which is what a small integer column can hold
+    DEFAULT_RANGE = (-32768, 32767)
+    # Integers that stand for an empty and an invalid value while parsing a column
+    EMPTY = -2 ** 63
+    INVALID = -2 ** 63 + 1
+
+    def __init__(self, source: str, nr_values: int, stations: Iterable[int], columns: Dict[str, int],
+                 ranges: Dict[str, Tuple[int, int]], special_values: Dict[str, List[int]] = None,
+                 hour_column: int = None):
+        """
+        :param source: Name of the file, for the rejects
+        :param nr_values: Number of values per line
+        :param stations: Codes of the known stations
+        :param columns: Positions of the measurement fields in a line, by field name
+        :param ranges: Minimum and maximum value per field name
+        :param special_values: Values outside the range that are valid anyway, per field name
+        :param hour_column: Position of the hour of a line, if the file has hourly measurements
+        """
+
+        self.source = source
+        self.nr_values = nr_values
+        self.stations = np.array(sorted(stations), dtype=np.int64)
+        self.columns = columns
+        self.ranges = ranges
+        self.special_values = special_values or {}
+        self.hour_column = hour_column
+        self.keys = KeySet()
+
+    def validate(self, lines: List[List[str]], line_numbers: List[int]) -> Tuple[List[List[str]], List[Reject]]:
+        """
+        :param lines: Data lines of the file, already split into values
+        :param line_numbers: Line number of every line in the file
+        :return: The valid lines, and the rejected lines with their reasons
+        """
+
+        rejected = np.zeros(len(lines), dtype=bool)
+        reasons: List[Optional[str]] = [None] * len(lines)
+
+        def reject(rows: np.ndarray, reason: str, column: Tuple[str, ...] = None):
+            # Rows that were rejected already keep their first reason
+            rows = rows & ~rejected
+            for row in np.flatnonzero(rows):
+                reasons[row] = reason if column is None else f'{reason} {column[row]}'
+            rejected[rows] = True
+
+        reject(np.fromiter(map(len, lines), dtype=np.int64, count=len(lines)) != self.nr_values,
+               f'expected {self.nr_values} values')
+        # Malformed lines are replaced by empty ones, which keeps the columns aligned
+        well_formed = [line if len(line) == self.nr_values else [''] * self.nr_values for line in lines]
+        columns = list(zip(*well_formed)) if well_formed else [()] * self.nr_values
+
+        stations, empty, invalid = self._integers(columns[0])
+        reject(empty | invalid | ~np.isin(stations, self.stations), 'unknown station', columns[0])
+        days, empty, invalid = self._integers(columns[1])
+        times, valid_days = self._days_since_epoch(days)
+        reject(empty | invalid | ~valid_days, 'invalid day', columns[1])
+        if self.hour_column is not None:
+            hours, empty, invalid = self._integers(columns[self.hour_column])
+            reject(empty | invalid | (hours < 1) | (hours > 24), 'invalid hour', columns[self.hour_column])
+            times = times * 24 + hours - 1
+
+        for field_name, index in self.columns.items():
+            numbers, empty, invalid = self._integers(columns[index])
+            reject(invalid, f'invalid {field_name}', columns[index])
+            minimum, maximum = self.ranges.get(field_name, self.DEFAULT_RANGE)
+            out_of_range = ~empty & ((numbers < minimum) | (numbers > maximum))
+            out_of_range &= ~np.isin(numbers, self.special_values.get(field_name, []))
+            reject(out_of_range, f'{field_name} out of range', columns[index])
+
+        duplicates = np.zeros(len(lines), dtype=bool)
+        duplicates[~rejected] = self.keys.add(stations[~rejected], times[~rejected])
+        reject(duplicates, 'duplicate station and time')
+
+        if not rejected.any():
+            return lines, []
+        rejects = [Reject(self.source, line_numbers[row], reasons[row], lines[row]) for row in np.flatnonzero(rejected)]
+        return [line for line, is_rejected in zip(lines, rejected.tolist()) if not is_rejected], rejects
+
+    @staticmethod
+    def _integers(column: Tuple[str, ...]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Convert a column of raw values to integers, where an empty string means no value
+
+        :return: The integers, with 0 for empty and invalid values, whether every value is empty, and whether it is
+                 invalid
+        """
+
+        numbers = np.fromiter(map(Validator._parse_integer, column), dtype=np.int64, count=len(column))
+        empty = numbers == Validator.EMPTY
+        invalid = numbers == Validator.INVALID
+        numbers[empty | invalid] = 0
+        return numbers, empty, invalid
+
+    @staticmethod
+    @lru_cache(maxsize=2 ** 16)
+    def _parse_integer(value: str) -> int:
+        """
+        Parse a raw value, cached since the KNMI files only contain a small set of distinct values per column
+
+        Converting a whole column with numpy is much slower, since it parses every string again.
+
+        >>> Validator._parse_integer('-12'), Validator._parse_integer('') == Validator.EMPTY
+        (-12, True)
+        """
+
+        if not value:
+            return Validator.EMPTY
+        try:
+            number = int(value)
+        except ValueError:
+            return Validator.INVALID
+        # Numbers that do not fit are out of every range anyway
+        return number if abs(number) < 2 ** 62 else Validator.INVALID
+
+    @staticmethod
+    def _days_since_epoch(days: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Convert YYYYMMDD numbers to days since 1 January 1970, which are negative before 1970
+
+        >>> Validator._days_since_epoch(np.array([20210128, 19010101, 20210229, 20201340]))
+        (array([ 18655, -25202,      0,      0]), array([ True,  True, False, False]))
+
+        :return: The days, with 0 for days that do not exist, and whether every day exists
+        """
+
+        year, month, day = days // 10000, days // 100 % 100, days % 100
+        valid = (year >= 1) & (year <= 9999) & (month >= 1) & (month <= 12) & (day >= 1)
+        months = np.where(valid, (year - 1970) * 12 + month - 1, 0).astype('datetime64[M]')
+        first_days = months.astype('datetime64[D]')
+        days_in_month = ((months + 1).astype('datetime64[D]') - first_days).astype(np.int64)
+        valid &= day <= days_in_month
+        return np.where(valid, first_days.astype(np.int64) + day - 1, 0), valid
@@ -1,16 +1,151 @@
+import hashlib
+from datetime import datetime
+
+import pytz
 from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from common.utils import last_import
+from measurements.models import DailyMeasurement, Measurement
+
+# Query parameter with the key of the last row of the previous page
+AFTER_VAR = 'after'
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Paginator that caches the number of rows per query until the next import, instead of counting them on every page
+    """
+
+    CACHE_SECONDS = 60 * 60
+
+    @cached_property
+    def count(self):
+        sql, params = self.object_list.query.sql_with_params()
+        key = 'admin_count:' + hashlib.md5(f'{last_import()}:{sql}:{params}'.encode()).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = super().count
+            cache.set(key, count, self.CACHE_SECONDS)
+        return count
+
+
+class KeysetChangeList(ChangeList):
+    """
+    Change list that pages by station and time instead of by page number
+
+    Every page starts after the key of the last row of the previous page, which is a seek in the index of the unique
+    constraint on station and time, where a page number needs to skip all rows of the previous pages.
+    """
+
+    def __init__(self, request, *args, **kwargs):
+        self.after = request.GET.get(AFTER_VAR)
+        self.next_page_url, self.first_page_url = None, None
+        super().__init__(request, *args, **kwargs)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(AFTER_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Changing the filters starts at the first page again
+        if AFTER_VAR not in (new_params or {}):
+            remove = [*(remove or []), AFTER_VAR]
+        return super().get_query_string(new_params, remove)
+
+    def get_queryset(self, request):
+        # Only load the displayed columns
+        queryset = super().get_queryset(request)
+        return queryset.only(*{'station_id', *self.model_admin.list_display})
 
-from measurements.models import Measurement
+    def get_ordering(self, request, queryset):
+        # Station and time are unique together, so they already give a deterministic order
+        return ['station_id', self.model_admin.time_field]
+
+    def get_results(self, request):
+        time_field = self.model_admin.time_field
+        queryset = self.queryset
+        if self.after:
+            station_id, time = self._parse_key(self.after)
+            queryset = queryset.filter(
+                Q(station_id__gte=station_id) & (Q(station_id__gt=station_id) | Q(**{f'{time_field}__gt': time}))
+            )
+        rows = list(queryset[:self.list_per_page + 1])
+
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        self.result_count = paginator.count
+        self.show_full_result_count = self.model_admin.show_full_result_count
+        self.full_result_count = self.root_queryset.count() if self.show_full_result_count else None
+        # Admin actions are shown if there is at least one entry
+        # or if entries are not counted because show_full_result_count is disabled
+        self.show_admin_actions = not self.show_full_result_count or bool(self.full_result_count)
+        self.result_list = rows[:self.list_per_page]
+        self.can_show_all = False
+        self.multi_page = len(rows) > self.list_per_page or bool(self.after)
+        self.paginator = paginator
+
+        if self.after:
+            self.first_page_url = self.get_query_string(remove=[AFTER_VAR])
+        if len(rows) > self.list_per_page:
+            last_row = self.result_list[-1]
+            key = f'{last_row.station_id}:{getattr(last_row, time_field).strftime(self.model_admin.time_format)}'
+            self.next_page_url = self.get_query_string({AFTER_VAR: key})
+
+    def _parse_key(self, key: str):
+        try:
+            station_id, time = key.split(':')
+            time = datetime.strptime(time, self.model_admin.time_format)
+        except ValueError:
+            raise IncorrectLookupParameters(f'Invalid page key {key}')
+        if self.model_admin.time_field == 'day':
+            return int(station_id), time.date()
+        return int(station_id), time.replace(tzinfo=pytz.utc)
+
+
+class MeasurementChangeListMixin:
+    """
+    Change list for tables with many measurements: keyset paging, cached counts and a date hierarchy of time ranges
+
+    Only the displayed columns are loaded. The date hierarchy lists every year, month or day between the first and
+    last measurement, which are found in an index, instead of only those with measurements, which would need a scan.
+    """
+
+    time_field = None
+    time_format = None
+
+    change_list_template = 'admin/measurements/keyset_change_list.html'
+    paginator = CachedCountPaginator
+    show_full_result_count = False
+    sortable_by = []
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
 
 
 @admin.register(Measurement)
-class MeasurementAdmin(admin.ModelAdmin):
+class MeasurementAdmin(MeasurementChangeListMixin, admin.ModelAdmin):
     exclude = None
 
     list_display = ['station_id', 'time', 'temperature', 'precipitation', 'sunshine']
     list_filter = ['station']
+    date_hierarchy = 'time'
+    time_field = 'time'
+    time_format = '%Y%m%d%H'
 
-    def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        queryset = queryset.order_by('station_id', 'time')
-        return queryset
+
+@admin.register(DailyMeasurement)
+class DailyMeasurementAdmin(MeasurementChangeListMixin, admin.ModelAdmin):
+    exclude = None
+
+    list_display = ['station_id', 'day', 'temperature', 'min_temperature', 'max_temperature', 'precipitation',
+                    'sunshine']
+    list_filter = ['station']
+    date_hierarchy = 'day'
+    time_field = 'day'
+    time_format = '%Y%m%d'
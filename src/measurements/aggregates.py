@@ -0,0 +1,129 @@
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Tuple
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Max, Min, Sum, Value, When
+from django.db.models.functions import TruncDate, TruncMonth
+
+from common.utils import batched, datetime_from_day_and_hour, touch_last_import
+from measurements.models import Aggregate, DailyAggregate, Measurement, MonthlyAggregate
+
+logger = logging.getLogger(__name__)
+
+
+class Aggregates:
+    """
+    Maintain the daily and monthly aggregates per station of the hourly measurements
+
+    The aggregates are refreshed incrementally: only the days and months that were touched by an import are computed
+    again, daily aggregates from the hourly measurements and monthly aggregates from the daily aggregates.
+    """
+
+    BATCH_SIZE = 2000
+    # Fields in which the KNMI stores -0.1 for less than 0.05, which counts as 0 in the aggregates
+    LESS_THAN_FIELDS = ['precipitation', 'sunshine']
+
+    @staticmethod
+    def refresh(station_times: Iterable[Tuple[int, datetime]]):
+        """
+        Recompute the daily and monthly aggregates of the stations at the given times
+
+        :param station_times: Station codes and times of the measurements that were imported
+        """
+
+        days_per_station = defaultdict(set)
+        for station_id, time in station_times:
+            days_per_station[station_id].add(time.date())
+
+        with transaction.atomic():
+            for station_id, days in days_per_station.items():
+                first_day, last_day = min(days), max(days)
+                Aggregates._refresh_daily(station_id, first_day, last_day)
+                Aggregates._refresh_monthly(station_id, first_day.replace(day=1), last_day.replace(day=1))
+
+    @staticmethod
+    def rebuild() -> int:
+        """
+        Recompute all daily and monthly aggregates from scratch
+
+        :return: Number of daily aggregates
+        """
+
+        with transaction.atomic():
+            DailyAggregate.objects.all().delete()
+            MonthlyAggregate.objects.all().delete()
+
+            daily_aggregates = Aggregates._daily_aggregates(Measurement.objects.all())
+            nr_daily_aggregates = 0
+            for batch in batched(daily_aggregates, Aggregates.BATCH_SIZE):
+                DailyAggregate.objects.bulk_create(batch)
+                nr_daily_aggregates += len(batch)
+
+            monthly_aggregates = Aggregates._monthly_aggregates(DailyAggregate.objects.all())
+            for batch in batched(monthly_aggregates, Aggregates.BATCH_SIZE):
+                MonthlyAggregate.objects.bulk_create(batch)
+
+        touch_last_import()
+        logger.info(f'{nr_daily_aggregates} daily aggregates have been rebuilt')
+        return nr_daily_aggregates
+
+    @staticmethod
+    def _refresh_daily(station_id: int, first_day: date, last_day: date):
+        measurements = Measurement.objects.filter(
+            station_id=station_id,
+            time__gte=datetime_from_day_and_hour(first_day, 0),
+            time__lt=datetime_from_day_and_hour(last_day + timedelta(days=1), 0),
+        )
+        DailyAggregate.objects.filter(station_id=station_id, day__range=(first_day, last_day)).delete()
+        DailyAggregate.objects.bulk_create(Aggregates._daily_aggregates(measurements))
+
+    @staticmethod
+    def _refresh_monthly(station_id: int, first_month: date, last_month: date):
+        daily_aggregates = DailyAggregate.objects.filter(
+            station_id=station_id, day__gte=first_month, day__lt=Aggregates._next_month(last_month)
+        )
+        MonthlyAggregate.objects.filter(station_id=station_id, month__range=(first_month, last_month)).delete()
+        MonthlyAggregate.objects.bulk_create(Aggregates._monthly_aggregates(daily_aggregates))
+
+    @staticmethod
+    def _daily_aggregates(measurements) -> Iterable[DailyAggregate]:
+        aggregations = {}
+        for field in Aggregate.FIELDS:
+            value = F(field)
+            if field in Aggregates.LESS_THAN_FIELDS:
+                value = Case(When(**{f'{field}__lt': 0}, then=Value(0)), default=value,
+                             output_field=Measurement._meta.get_field(field))
+            aggregations.update({
+                f'_{field}_min': Min(value), f'_{field}_max': Max(value), f'_{field}_sum': Sum(value),
+                f'_{field}_count': Count(field),
+            })
+        rows = measurements.annotate(bucket=TruncDate('time')).values('station_id', 'bucket').annotate(
+            **aggregations
+        ).order_by('station_id', 'bucket')
+        for row in rows.iterator():
+            yield DailyAggregate(station_id=row['station_id'], day=row['bucket'], **Aggregates._values(row))
+
+    @staticmethod
+    def _monthly_aggregates(daily_aggregates) -> Iterable[MonthlyAggregate]:
+        aggregations = {}
+        for field in Aggregate.FIELDS:
+            aggregations.update({
+                f'_{field}_min': Min(f'{field}_min'), f'_{field}_max': Max(f'{field}_max'),
+                f'_{field}_sum': Sum(f'{field}_sum'), f'_{field}_count': Sum(f'{field}_count'),
+            })
+        rows = daily_aggregates.annotate(bucket=TruncMonth('day')).values('station_id', 'bucket').annotate(
+            **aggregations
+        ).order_by('station_id', 'bucket')
+        for row in rows.iterator():
+            yield MonthlyAggregate(station_id=row['station_id'], month=row['bucket'], **Aggregates._values(row))
+
+    @staticmethod
+    def _values(row: Dict) -> Dict:
+        # Annotations cannot have the names of model fields, so they are prefixed with an underscore
+        return {name[1:]: value for name, value in row.items() if name.startswith('_')}
+
+    @staticmethod
+    def _next_month(month: date) -> date:
+        return (month + timedelta(days=31)).replace(day=1)
@@ -0,0 +1,208 @@
+import logging
+import os.path
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+from django.db import connection, transaction
+
+from common.utils import batched, data_dir
+from measurements.models import Measurement
+from stations.models import Station
+
+logger = logging.getLogger(__name__)
+
+
+class Climatology:
+    """
+    Normals per station, day of year and hour of the hourly measurements, and anomaly scores against them
+
+    The normals of a station at a day and hour are computed from all its measurements at that hour within WINDOW_DAYS
+    days of that day, over all years. They are kept as a single float32 array of shape
+    (stations, fields, days of the year, hours, statistics) in data/climatology, which is memory-mapped when loaded,
+    so looking up a normal is an array index instead of a scan over the history.
+
+    Days of the year follow a leap year, so that the same date always has the same index: 29 February is 59 and
+    1 March is 60 in every year.
+    """
+
+    FIELDS = ['temperature', 'wind_speed', 'precipitation', 'air_pressure']
+    ANOMALY_FIELDS = [f'{field}_anomaly' for field in FIELDS]
+    STATISTICS = ['count', 'mean', 'std', 'p10', 'p50', 'p90']
+    PERCENTILES = [10, 50, 90]
+    DAYS = 366
+    HOURS = 24
+    WINDOW_DAYS = 7
+    # Minimum number of measurements for a normal to be used for anomaly scores
+    MIN_COUNT = 30
+    # Anomaly scores are stored as tenths in a small integer
+    MAX_SCORE = 999.9
+    BATCH_SIZE = 2000
+
+    def __init__(self, stations: np.ndarray, normals: np.ndarray):
+        """
+        :param stations: Station codes, in the order of the first axis of the normals
+        :param normals: Statistics per station, field, day of the year and hour
+        """
+
+        self.stations = stations
+        self.normals = normals
+        self._station_indices = {int(code): i for i, code in enumerate(stations)}
+
+    @staticmethod
+    def compute(window_days: int = WINDOW_DAYS) -> 'Climatology':
+        """
+        Compute the normals of all stations from the history of hourly measurements
+        """
+
+        stations = np.array(list(Station.objects.values_list('code', flat=True)), dtype=np.int16)
+        normals = np.full(
+            (len(stations), len(Climatology.FIELDS), Climatology.DAYS, Climatology.HOURS, len(Climatology.STATISTICS)),
+            np.nan, dtype=np.float32
+        )
+        for i, station in enumerate(stations):
+            rows = list(Measurement.objects.filter(station_id=station).values_list('time', *Climatology.FIELDS))
+            if not rows:
+                continue
+            times = np.array([row[0].replace(tzinfo=None) for row in rows], dtype='datetime64[h]')
+            values = np.array([[np.nan if value is None else value for value in row[1:]] for row in rows],
+                              dtype=np.float64)
+            normals[i] = Climatology._station_normals(times, values, window_days)
+            logger.info(f'Normals of station {station} computed from {len(rows)} measurements')
+        return Climatology(stations, normals)
+
+    @staticmethod
+    def _station_normals(times: np.ndarray, values: np.ndarray, window_days: int) -> np.ndarray:
+        _, years = np.unique(times.astype('datetime64[Y]'), return_inverse=True)
+        days = Climatology.day_of_year(times)
+        hours = (times - times.astype('datetime64[D]')).astype(np.int64)
+
+        normals = np.empty((values.shape[1], Climatology.DAYS, Climatology.HOURS, len(Climatology.STATISTICS)))
+        for field_index in range(values.shape[1]):
+            # Values per hour, year and day of the year, with the days of the window stacked onto the years
+            by_day = np.full((Climatology.HOURS, years.max() + 1, Climatology.DAYS), np.nan)
+            by_day[hours, years, days] = values[:, field_index]
+            window = np.concatenate(
+                [np.roll(by_day, shift, axis=2) for shift in range(-window_days, window_days + 1)], axis=1
+            )
+
+            # Sorting puts the missing values last, so the percentiles can be read from the first count values. This
+            # is much faster than np.nanpercentile, which handles every hour and day separately.
+            window.sort(axis=1)
+            count = np.sum(~np.isnan(window), axis=1)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = np.nansum(window, axis=1) / count
+                std = np.sqrt(np.nansum((window - mean[:, np.newaxis, :]) ** 2, axis=1) / count)
+            percentiles = [Climatology._percentile(window, count, percentile) for percentile in Climatology.PERCENTILES]
+            normals[field_index] = np.stack([count, mean, std, *percentiles], axis=-1).transpose(1, 0, 2)
+        return normals
+
+    @staticmethod
+    def _percentile(sorted_values: np.ndarray, count: np.ndarray, percentile: float) -> np.ndarray:
+        # Linear interpolation between the closest ranks, like np.percentile
+        position = percentile / 100 * np.maximum(count - 1, 0)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(lower + 1, np.maximum(count - 1, 0))
+        lower_values = np.take_along_axis(sorted_values, lower[:, np.newaxis, :], axis=1)[:, 0, :]
+        upper_values = np.take_along_axis(sorted_values, upper[:, np.newaxis, :], axis=1)[:, 0, :]
+        return np.where(count > 0, lower_values + (upper_values - lower_values) * (position - lower), np.nan)
+
+    @staticmethod
+    def day_of_year(times: np.ndarray) -> np.ndarray:
+        """
+        Zero-based day of the year of datetime64 times, counted as if every year were a leap year
+
+        >>> times = np.array(['2021-02-28', '2021-03-01', '2020-02-29', '2020-12-31'], dtype='datetime64[h]')
+        >>> Climatology.day_of_year(times)
+        array([ 58,  60,  59, 365])
+        """
+
+        days = times.astype('datetime64[D]')
+        years = days.astype('datetime64[Y]')
+        day_of_year = (days - years).astype(np.int64)
+        year = years.astype(np.int64) + 1970
+        leap_year = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+        return day_of_year + ((day_of_year >= 59) & ~leap_year)
+
+    def save(self, directory: str = os.path.join(data_dir, 'climatology')):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, 'stations.npy'), self.stations)
+        np.save(os.path.join(directory, 'normals.npy'), self.normals)
+
+    @staticmethod
+    def load(directory: str = os.path.join(data_dir, 'climatology')) -> Optional['Climatology']:
+        """
+        :return: The memory-mapped normals, or None if they have not been computed yet
+        """
+
+        if not os.path.exists(os.path.join(directory, 'normals.npy')):
+            return None
+        stations = np.load(os.path.join(directory, 'stations.npy'))
+        normals = np.load(os.path.join(directory, 'normals.npy'), mmap_mode='r')
+        return Climatology(stations, normals)
+
+    def normal(self, station: int, field: str, time: datetime) -> Optional[Dict[str, float]]:
+        """
+        :return: Statistics of the field for the station at the day of the year and hour of the time, or None if
+                 they are unknown
+        """
+
+        station_index = self._station_indices.get(station)
+        if station_index is None:
+            return None
+        day = Climatology.day_of_year(np.array([time.replace(tzinfo=None)], dtype='datetime64[h]'))[0]
+        statistics = self.normals[station_index, self.FIELDS.index(field), day, time.hour]
+        return dict(zip(self.STATISTICS, statistics.tolist()))
+
+    def score(self, measurements: List[Measurement]):
+        """
+        Set the anomaly scores of the measurements: their distance to the mean of their normals, in standard deviations
+
+        A score is left empty when the measurement is missing or when its normal is based on fewer than MIN_COUNT
+        measurements.
+        """
+
+        station_indices = np.array([self._station_indices.get(m.station_id, -1) for m in measurements])
+        times = np.array([m.time.replace(tzinfo=None) for m in measurements], dtype='datetime64[h]')
+        days = Climatology.day_of_year(times)
+        hours = (times - times.astype('datetime64[D]')).astype(np.int64)
+        known = station_indices >= 0
+
+        for field_index, (field, anomaly_field) in enumerate(zip(self.FIELDS, self.ANOMALY_FIELDS)):
+            values = [getattr(measurement, field) for measurement in measurements]
+            values = np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+            count, mean, std = np.full((3, len(measurements)), np.nan)
+            count[known], mean[known], std[known] = self.normals[
+                station_indices[known], field_index, days[known], hours[known], :3
+            ].T
+            with np.errstate(invalid='ignore', divide='ignore'):
+                scores = np.clip((values - mean) / std, -self.MAX_SCORE, self.MAX_SCORE)
+            scores[~(count >= self.MIN_COUNT) | ~(std > 0)] = np.nan
+            for measurement, score in zip(measurements, np.round(scores, 1).tolist()):
+                setattr(measurement, anomaly_field, None if np.isnan(score) else score)
+
+    def rescore(self) -> int:
+        """
+        Recompute the anomaly scores of all measurements in the database against these normals
+
+        :return: Number of measurements
+        """
+
+        # bulk_update builds a CASE expression per field and is much slower than one prepared UPDATE per row
+        fields = [Measurement._meta.get_field(field_name) for field_name in self.ANOMALY_FIELDS]
+        sql = f'UPDATE {Measurement._meta.db_table} SET {", ".join(f"{field.column} = %s" for field in fields)} ' \
+              f'WHERE {Measurement._meta.pk.column} = %s'
+
+        measurements = Measurement.objects.only('station_id', 'time', *self.FIELDS).order_by('station_id', 'time')
+        nr_measurements = 0
+        for batch in batched(measurements.iterator(chunk_size=self.BATCH_SIZE), self.BATCH_SIZE):
+            self.score(batch)
+            params = [
+                [field.get_db_prep_value(getattr(measurement, field.attname), connection) for field in fields] +
+                [measurement.pk] for measurement in batch
+            ]
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, params)
+            nr_measurements += len(batch)
+        logger.info(f'Anomaly scores of {nr_measurements} measurements have been recomputed')
+        return nr_measurements
@@ -0,0 +1,201 @@
+import logging
+import os.path
+import shutil
+from datetime import date
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+from django.db import models
+
+from common import instrumentation
+from common.utils import data_dir
+from data_sources.data_mode import DataMode
+from measurements.csv_exporter import CsvExporter
+
+logger = logging.getLogger(__name__)
+
+
+class ColumnarExporter:
+    """
+    Export measurements as one typed NumPy array per field, partitioned by station and year
+
+    Every partition is a directory <station>/<year> with one .npy file per field. Unlike a .npz archive, a .npy file
+    can be memory-mapped, so ColumnarArchive reads a column back without parsing or copying it.
+
+    An export replaces the partitions of the stations and years it covers, so it can only be restricted to whole
+    years. Partitions that it covers but that no longer have measurements are removed, while partitions of other
+    stations and years are kept.
+
+    Column types:
+    - time: datetime64[s] in UTC for hourly measurements, datetime64[D] for daily measurements
+    - numbers: float32 in whole units, NaN if the measurement is missing
+    - flags: bool
+    """
+
+    CHUNK_SIZE = 5000
+
+    @staticmethod
+    def export(data_mode: DataMode = DataMode.per_hour, start: date = None, end: date = None,
+               stations: List[int] = None, directory: str = data_dir) -> str:
+        """
+        Export the given range of measurements to a columnar archive
+
+        :param data_mode: Export the daily or the hourly measurements
+        :param start: First day to export, which must be 1 January, defaults to the first measurement
+        :param end: Last day to export, which must be 31 December, defaults to the last measurement
+        :param stations: Codes of the stations to export, defaults to all stations
+        :param directory: Directory in which the archive is written
+        :return: Full path to the directory of the archive
+        """
+
+        # Input validation
+        if (start is not None and (start.month, start.day) != (1, 1)) or \
+                (end is not None and (end.month, end.day) != (12, 31)):
+            raise AssertionError('Columnar archives are partitioned by year, so an export must start on 1 January '
+                                 'and end on 31 December')
+
+        archive_dir = os.path.join(directory, f'{data_mode.name}_columns')
+        fields = CsvExporter.MEASUREMENT_FIELDS[data_mode]
+        dtypes = ColumnarExporter._dtypes(data_mode, fields)
+        queryset = CsvExporter._filter(data_mode, start, end, stations)
+        rows = queryset.values_list('station_id', *fields).iterator(chunk_size=ColumnarExporter.CHUNK_SIZE)
+
+        # Rows are ordered by station and time, so a partition is complete as soon as the next one starts
+        partition, columns = None, None
+        written = set()
+        for station_id, time, *values in rows:
+            if partition != (station_id, time.year):
+                if partition is not None:
+                    with instrumentation.stage('write'):
+                        ColumnarExporter._write(archive_dir, partition, fields, dtypes, columns)
+                    instrumentation.count('rows_exported', len(columns[0]))
+                    written.add(partition)
+                partition, columns = (station_id, time.year), [[] for _ in fields]
+            columns[0].append(time)
+            for column, value in zip(columns[1:], values):
+                column.append(value)
+        if partition is not None:
+            with instrumentation.stage('write'):
+                ColumnarExporter._write(archive_dir, partition, fields, dtypes, columns)
+            instrumentation.count('rows_exported', len(columns[0]))
+            written.add(partition)
+
+        with instrumentation.stage('remove_stale_partitions'):
+            nr_removed = ColumnarExporter._remove_stale_partitions(archive_dir, written, start, end, stations)
+        logger.info(f'{len(written)} partitions have been exported to {archive_dir}, {nr_removed} stale partitions '
+                    f'have been removed')
+        return archive_dir
+
+    @staticmethod
+    def _remove_stale_partitions(archive_dir: str, written: Set[Tuple[int, int]], start: Optional[date],
+                                 end: Optional[date], stations: Optional[List[int]]) -> int:
+        """
+        Remove the partitions that an export covered but did not write, since their measurements no longer exist
+
+        :return: Number of removed partitions
+        """
+
+        nr_removed = 0
+        for station, year in ColumnarArchive(archive_dir=archive_dir).partitions(stations):
+            if (station, year) in written or (start is not None and year < start.year) or \
+                    (end is not None and year > end.year):
+                continue
+            shutil.rmtree(os.path.join(archive_dir, str(station), str(year)))
+            nr_removed += 1
+            station_dir = os.path.join(archive_dir, str(station))
+            if not os.listdir(station_dir):
+                os.rmdir(station_dir)
+        return nr_removed
+
+    @staticmethod
+    def _dtypes(data_mode: DataMode, fields: List[str]) -> List[np.dtype]:
+        model = CsvExporter.MODELS[data_mode]
+        dtypes = []
+        for field_name in fields:
+            field = model._meta.get_field(field_name)
+            if isinstance(field, models.DateTimeField):
+                dtypes.append(np.dtype('datetime64[s]'))
+            elif isinstance(field, models.DateField):
+                dtypes.append(np.dtype('datetime64[D]'))
+            elif isinstance(field, models.BooleanField):
+                dtypes.append(np.dtype(bool))
+            else:
+                dtypes.append(np.dtype(np.float32))
+        return dtypes
+
+    @staticmethod
+    def _write(archive_dir: str, partition: Tuple[int, int], fields: List[str], dtypes: List[np.dtype],
+               columns: List[List]):
+        partition_dir = os.path.join(archive_dir, *map(str, partition))
+        os.makedirs(partition_dir, exist_ok=True)
+        for field, dtype, column in zip(fields, dtypes, columns):
+            if dtype == np.dtype('datetime64[s]'):
+                # NumPy has no time zones, and Django gives the times in UTC
+                column = [time.replace(tzinfo=None) for time in column]
+            elif dtype == np.float32:
+                column = [np.nan if value is None else float(value) for value in column]
+            np.save(os.path.join(partition_dir, f'{field}.npy'), np.array(column, dtype=dtype))
+
+
+class ColumnarArchive:
+    """
+    Read a columnar archive written by ColumnarExporter
+
+    Columns are memory-mapped read-only, so loading them does not copy data and only the parts that are used are read
+    from disk.
+    """
+
+    def __init__(self, data_mode: DataMode = DataMode.per_hour, archive_dir: str = None):
+        self.archive_dir = archive_dir or os.path.join(data_dir, f'{data_mode.name}_columns')
+
+    def partitions(self, stations: List[int] = None, years: List[int] = None) -> List[Tuple[int, int]]:
+        """
+        :return: Station codes and years in the archive, optionally restricted to the given stations and years
+        """
+
+        partitions = []
+        if not os.path.isdir(self.archive_dir):
+            return partitions
+        for station in sorted(map(int, os.listdir(self.archive_dir))):
+            if stations is not None and station not in stations:
+                continue
+            for year in sorted(map(int, os.listdir(os.path.join(self.archive_dir, str(station))))):
+                if years is None or year in years:
+                    partitions.append((station, year))
+        return partitions
+
+    def load(self, station: int, year: int, fields: List[str] = None) -> Dict[str, np.ndarray]:
+        """
+        Memory-map the columns of a single station and year
+
+        :param station: Station code
+        :param year: Year
+        :param fields: Names of the columns to load, defaults to all columns
+        :return: Read-only array per field name
+        """
+
+        partition_dir = os.path.join(self.archive_dir, str(station), str(year))
+        if fields is None:
+            fields = sorted(os.path.splitext(file_name)[0] for file_name in os.listdir(partition_dir))
+        return {field: np.load(os.path.join(partition_dir, f'{field}.npy'), mmap_mode='r') for field in fields}
+
+    def iterate(self, stations: List[int] = None, years: List[int] = None,
+                fields: List[str] = None) -> Iterator[Tuple[int, int, Dict[str, np.ndarray]]]:
+        """
+        Memory-map the columns of every partition in turn
+
+        :return: Station code, year and the columns of each partition
+        """
+
+        for station, year in self.partitions(stations, years):
+            yield station, year, self.load(station, year, fields)
+
+    def concatenate(self, field: str, stations: List[int] = None, years: List[int] = None) -> Optional[np.ndarray]:
+        """
+        Copy a single column of several partitions into one array
+
+        :return: Array of the column in partition order, or None if there are no partitions
+        """
+
+        columns = [columns[field] for _, _, columns in self.iterate(stations, years, [field])]
+        return np.concatenate(columns) if columns else None
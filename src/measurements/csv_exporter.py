@@ -1,32 +1,165 @@
 import csv
+import gzip
+import logging
 import os.path
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
 
-from common.utils import data_dir
-from measurements.models import Measurement
+from django.db import connections
+from django.db.models import QuerySet
+
+from common import instrumentation
+from common.utils import data_dir, datetime_from_day_and_hour
+from data_sources.data_mode import DataMode
+from measurements.models import DailyMeasurement, Measurement
+from stations.models import Station
+
+logger = logging.getLogger(__name__)
 
 
 class CsvExporter:
+    STATION_FIELDS = ['code', 'name', 'longitude', 'latitude', 'altitude']
+    MEASUREMENT_FIELDS = {
+        DataMode.per_day: [
+            'day', 'wind_direction', 'vector_wind_speed', 'wind_speed', 'max_wind_speed', 'max_wind_speed_hour',
+            'min_wind_speed', 'min_wind_speed_hour', 'gust_of_wind', 'gust_of_wind_hour', 'temperature',
+            'min_temperature', 'min_temperature_hour', 'max_temperature', 'max_temperature_hour',
+            'min_ground_temperature', 'min_ground_temperature_hour', 'sunshine', 'sunshine_percentage', 'radiation',
+            'precipitation_duration', 'precipitation', 'max_precipitation', 'max_precipitation_hour',
+            'evapotranspiration', 'air_pressure', 'max_air_pressure', 'max_air_pressure_hour', 'min_air_pressure',
+            'min_air_pressure_hour', 'min_visibility', 'min_visibility_hour', 'max_visibility', 'max_visibility_hour',
+            'cloud_cover', 'relative_humidity', 'max_relative_humidity', 'max_relative_humidity_hour',
+            'min_relative_humidity', 'min_relative_humidity_hour',
+        ],
+        DataMode.per_hour: [
+            'time', 'wind_direction', 'wind_speed', 'gust_of_wind', 'temperature', 'dew_temperature', 'sunshine',
+            'radiation', 'precipitation_duration', 'precipitation', 'air_pressure', 'visibility', 'cloud_cover',
+            'relative_humidity', 'mist', 'rain', 'snow', 'lightning', 'icing',
+        ],
+    }
+    MODELS = {DataMode.per_day: DailyMeasurement, DataMode.per_hour: Measurement}
+    TIME_FIELDS = {DataMode.per_day: 'day', DataMode.per_hour: 'time'}
+    PARTITIONS = ['station', 'month']
+    CHUNK_SIZE = 5000
+
     @staticmethod
-    def export():
+    def export(data_mode: DataMode = DataMode.per_hour, start: date = None, end: date = None,
+               stations: List[int] = None, compress: bool = False, partition: str = None,
+               max_workers: int = 4, directory: str = data_dir) -> List[str]:
         """
         Export the given range of measurements to a csv file, usable by Google Data Studio
+
+        The measurements are streamed from the database in chunks, so memory use does not depend on the number of
+        measurements. When partitioned, every station or month is written to its own file by a pool of worker
+        processes.
+
+        :param data_mode: Export the daily or the hourly measurements
+        :param start: First day to export, defaults to the first measurement
+        :param end: Last day to export, defaults to the last measurement
+        :param stations: Codes of the stations to export, defaults to all stations
+        :param compress: Gzip the csv files
+        :param partition: Write one file per 'station' or per 'month' instead of a single file
+        :param max_workers: Maximum number of partitions that are written at the same time
+        :param directory: Directory in which the files are written
+        :return: Full paths to the generated files
         """
 
         # TODO: Google Data Studio has a Latitude,Longitude field. Check out what it expects and export it as such
 
-        station_fields = ['code', 'name', 'longitude', 'latitude', 'altitude']
-        measurement_fields = ['time', 'wind_direction', 'wind_speed', 'gust_of_wind', 'temperature',
-                              'dew_temperature', 'sunshine', 'radiation', 'precipitation_duration', 'precipitation',
-                              'air_pressure', 'visibility', 'cloud_cover', 'relative_humidity', 'mist', 'rain', 'snow',
-                              'lightning', 'icing']
-        q = Measurement.objects.all().prefetch_related('station').values_list(
-            *[f'station__{field}' for field in station_fields], *measurement_fields
-        )
-
-        filename = 'per_hour_weather.csv'
-        full_path_to_file = os.path.join(data_dir, filename)
-        with open(full_path_to_file, 'w') as f:
+        if partition is not None and partition not in CsvExporter.PARTITIONS:
+            msg = f'Unknown partition {partition}. Choose from: {", ".join(CsvExporter.PARTITIONS)}'
+            raise AssertionError(msg)
+
+        queryset = CsvExporter._filter(data_mode, start, end, stations)
+        filename = f'{data_mode.name}_weather'
+        extension = '.csv.gz' if compress else '.csv'
+        if partition is None:
+            full_path_to_file = os.path.join(directory, f'{filename}{extension}')
+            with instrumentation.stage('write'):
+                nr_rows = CsvExporter._write(data_mode, queryset, full_path_to_file, compress)
+            instrumentation.count('rows_exported', nr_rows)
+            return [full_path_to_file]
+
+        export_dir = os.path.join(directory, filename)
+        os.makedirs(export_dir, exist_ok=True)
+        time_field = CsvExporter.TIME_FIELDS[data_mode]
+        # The workers receive the filters of their partition instead of a queryset, since pickling a queryset would
+        # evaluate it in this process. Filtering on a range instead of on the year and month allows to use the index.
+        partitions = {}
+        with instrumentation.stage('plan_partitions'):
+            if partition == 'station':
+                for station_id in queryset.order_by().values_list('station_id', flat=True).distinct():
+                    partitions[str(station_id)] = (start, end, [station_id])
+            else:
+                for month in queryset.dates(time_field, 'month'):
+                    last_day = (month + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+                    partitions[month.strftime('%Y-%m')] = (max(month, start or month),
+                                                           min(last_day, end or last_day), stations)
+
+        full_paths_to_files = [
+            os.path.join(export_dir, f'{filename}_{partition_name}{extension}') for partition_name in partitions
+        ]
+        # Worker processes must not share the database connection of this process
+        connections.close_all()
+        with instrumentation.stage('write'), ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(CsvExporter._write_in_worker, data_mode, filters, full_path_to_file, compress)
+                for filters, full_path_to_file in zip(partitions.values(), full_paths_to_files)
+            ]
+            for future in futures:
+                instrumentation.count('rows_exported', future.result())
+        return full_paths_to_files
+
+    @staticmethod
+    def _filter(data_mode: DataMode, start: Optional[date], end: Optional[date],
+                stations: Optional[List[int]]) -> QuerySet:
+        time_field = CsvExporter.TIME_FIELDS[data_mode]
+        queryset = CsvExporter.MODELS[data_mode].objects.all()
+        if data_mode == DataMode.per_hour:
+            start = start and datetime_from_day_and_hour(start, 0)
+            end = end and datetime_from_day_and_hour(end + timedelta(days=1), 0)
+            if start:
+                queryset = queryset.filter(time__gte=start)
+            if end:
+                queryset = queryset.filter(time__lt=end)
+        else:
+            if start:
+                queryset = queryset.filter(day__gte=start)
+            if end:
+                queryset = queryset.filter(day__lte=end)
+        if stations:
+            queryset = queryset.filter(station_id__in=stations)
+        return queryset.order_by('station_id', time_field)
+
+    @staticmethod
+    def _write(data_mode: DataMode, queryset: QuerySet, full_path_to_file: str, compress: bool) -> int:
+        """
+        Stream the measurements of the queryset to a csv file
+
+        :return: Number of exported measurements
+        """
+
+        # Look up the station columns in memory instead of joining them on every measurement
+        station_fields = CsvExporter.STATION_FIELDS
+        stations = {station[0]: station for station in Station.objects.values_list(*station_fields)}
+        measurement_fields = CsvExporter.MEASUREMENT_FIELDS[data_mode]
+        rows = queryset.values_list('station_id', *measurement_fields).iterator(chunk_size=CsvExporter.CHUNK_SIZE)
+
+        with (gzip.open(full_path_to_file, 'wt', newline='') if compress else open(full_path_to_file, 'w')) as f:
             writer = csv.writer(f)
             writer.writerow(station_fields + measurement_fields)
-            for measurement in q:
-                writer.writerow(measurement)
+            nr_rows = 0
+            for station_id, *measurement in rows:
+                writer.writerow((*stations[station_id], *measurement))
+                nr_rows += 1
+        logger.info(f'Measurements have been exported to {full_path_to_file}')
+        return nr_rows
+
+    @staticmethod
+    def _write_in_worker(data_mode: DataMode, filters: Tuple[Optional[date], Optional[date], Optional[List[int]]],
+                         full_path_to_file: str, compress: bool) -> int:
+        try:
+            return CsvExporter._write(data_mode, CsvExporter._filter(data_mode, *filters), full_path_to_file, compress)
+        finally:
+            connections.close_all()
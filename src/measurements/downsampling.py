@@ -0,0 +1,119 @@
+from datetime import date, timedelta
+from typing import Tuple
+
+import numpy as np
+
+from common.utils import datetime_from_day_and_hour
+from measurements.models import Measurement
+
+
+class Downsampler:
+    """
+    Reduce a series of hourly measurements to a bounded number of points for charts
+
+    Two methods are available:
+    - lttb: Largest-Triangle-Three-Buckets, which keeps the points that contribute most to the visual shape
+    - minmax: the minimum and the maximum of every bucket, which keeps all peaks
+
+    Times are returned as seconds since the epoch, and missing measurements are left out before downsampling.
+    """
+
+    METHODS = ['lttb', 'minmax']
+
+    @staticmethod
+    def series(station: int, field: str, start: date = None, end: date = None, points: int = 1000,
+               method: str = 'lttb') -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Query the series of one field of a station and downsample it
+
+        :param station: Station code
+        :param field: Name of the measurement field
+        :param start: First day of the series, defaults to the first measurement
+        :param end: Last day of the series, defaults to the last measurement
+        :param points: Maximum number of points to return
+        :param method: lttb or minmax
+        :return: Times in seconds since the epoch and the values at those times
+        """
+
+        if method not in Downsampler.METHODS:
+            raise AssertionError(f'Unknown method {method}. Choose from: {", ".join(Downsampler.METHODS)}')
+
+        queryset = Measurement.objects.filter(station_id=station, **{f'{field}__isnull': False})
+        if start:
+            queryset = queryset.filter(time__gte=datetime_from_day_and_hour(start, 0))
+        if end:
+            queryset = queryset.filter(time__lt=datetime_from_day_and_hour(end + timedelta(days=1), 0))
+        rows = queryset.order_by('time').values_list('time', field)
+        x = np.fromiter((time.timestamp() for time, _ in rows), dtype=np.float64)
+        y = np.fromiter((value for _, value in rows), dtype=np.float64, count=len(x))
+
+        indices = Downsampler.lttb(x, y, points) if method == 'lttb' else Downsampler.min_max(y, points)
+        return x[indices].astype(np.int64), y[indices]
+
+    @staticmethod
+    def lttb(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+        """
+        Select points with the Largest-Triangle-Three-Buckets algorithm
+
+        The first and last point are always kept. The points in between are divided into points - 2 buckets, and of
+        every bucket the point is kept that forms the largest triangle with the point kept in the previous bucket and
+        the average of the next bucket. The areas within a bucket are computed at once.
+
+        :return: Sorted indices of the selected points
+
+        >>> x = np.arange(10, dtype=float)
+        >>> Downsampler.lttb(x, np.array([0, 1, 0, 5, 0, 1, 0, -5, 0, 1], dtype=float), 4)
+        array([0, 3, 7, 9])
+        """
+
+        if points < 3:
+            raise AssertionError('LTTB needs at least 3 points')
+        n = len(x)
+        if points >= n:
+            return np.arange(n)
+
+        edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+        indices = np.empty(points, dtype=np.int64)
+        indices[0], indices[-1] = 0, n - 1
+        previous = 0
+        for bucket in range(points - 2):
+            first, last = edges[bucket], edges[bucket + 1]
+            next_first, next_last = last, edges[bucket + 2] if bucket + 2 < len(edges) else n
+            average_x = x[next_first:next_last].mean()
+            average_y = y[next_first:next_last].mean()
+            # Twice the area of the triangles, which does not change which one is the largest
+            areas = np.abs(
+                (x[previous] - average_x) * (y[first:last] - y[previous]) -
+                (x[previous] - x[first:last]) * (average_y - y[previous])
+            )
+            previous = first + int(np.argmax(areas))
+            indices[bucket + 1] = previous
+        return indices
+
+    @staticmethod
+    def min_max(y: np.ndarray, points: int) -> np.ndarray:
+        """
+        Select the minimum and the maximum of points // 2 buckets of equal size
+
+        All buckets are reduced at once, by sorting the points on their bucket and then on their value.
+
+        :return: Sorted indices of the selected points
+
+        >>> Downsampler.min_max(np.array([3, 1, 2, 5, 4, 0], dtype=float), 4)
+        array([0, 1, 3, 5])
+        """
+
+        if points < 2:
+            raise AssertionError('Min/max downsampling needs at least 2 points')
+        n = len(y)
+        if points >= n:
+            return np.arange(n)
+
+        nr_buckets = points // 2
+
+        edges = np.linspace(0, n, nr_buckets + 1).astype(np.int64)
+        buckets = np.repeat(np.arange(nr_buckets), np.diff(edges))
+        order = np.lexsort((y, buckets))
+        minima = order[edges[:-1]]
+        maxima = order[edges[1:] - 1]
+        return np.unique(np.concatenate([minima, maxima]))
@@ -0,0 +1,121 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import List, Tuple
+
+import numpy as np
+
+from measurements.models import Measurement
+from stations.models import Station
+from stations.spatial import EARTH_RADIUS_KM
+
+logger = logging.getLogger(__name__)
+
+
+class IdwInterpolator:
+    """
+    Interpolate measurements of the stations onto a regular latitude/longitude grid by inverse distance weighting
+
+    The distances between all grid cells and all stations are computed once, as a matrix of weights
+    1 / distance ** power. Interpolating any number of timestamps is then one matrix product of the measurements with
+    the weights, in which stations without a measurement at a timestamp get no weight.
+    """
+
+    # Bounding box of the Netherlands in degrees: south, north, west, east
+    NETHERLANDS = (50.7, 53.6, 3.3, 7.3)
+    # Distance in km below which a grid cell takes the value of the station
+    MIN_DISTANCE = 1e-3
+
+    def __init__(self, stations: List[Station], latitudes: np.ndarray, longitudes: np.ndarray, power: float = 2.0):
+        """
+        :param stations: Stations to interpolate between
+        :param latitudes: Latitudes of the rows of the grid in degrees
+        :param longitudes: Longitudes of the columns of the grid in degrees
+        :param power: Power of the distance in the weights, higher powers give more weight to the nearest stations
+        """
+
+        self.stations = stations
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+
+        grid_latitudes, grid_longitudes = np.meshgrid(latitudes, longitudes, indexing='ij')
+        cells = self._to_points(grid_latitudes.ravel(), grid_longitudes.ravel())
+        station_points = self._to_points(
+            np.array([float(station.latitude) for station in stations]),
+            np.array([float(station.longitude) for station in stations]),
+        )
+        chords = np.linalg.norm(cells[:, np.newaxis, :] - station_points[np.newaxis, :, :], axis=2)
+        distances = 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(chords / 2, 1.0))
+        # Weights per station and cell
+        self.weights = np.maximum(distances, self.MIN_DISTANCE).T ** -power
+
+    @classmethod
+    def for_grid(cls, bounds: Tuple[float, float, float, float] = NETHERLANDS, resolution: float = 0.05,
+                 power: float = 2.0) -> 'IdwInterpolator':
+        """
+        Interpolator between all stations for a grid with the given bounds and resolution in degrees
+        """
+
+        south, north, west, east = bounds
+        latitudes = np.arange(south, north + resolution / 2, resolution)
+        longitudes = np.arange(west, east + resolution / 2, resolution)
+        return cls(list(Station.objects.all()), latitudes, longitudes, power)
+
+    def measurements(self, field: str, start: datetime, end: datetime) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Query the measurements of all stations of the interpolator
+
+        :param field: Name of the measurement field
+        :param start: First time
+        :param end: Last time
+        :return: Times, and the values per time and station with NaN for missing measurements
+        """
+
+        rows = Measurement.objects.filter(
+            time__range=(start, end), station_id__in=[station.code for station in self.stations],
+            **{f'{field}__isnull': False}
+        ).order_by('time').values_list('time', 'station_id', field)
+
+        times = sorted({time for time, _, _ in rows})
+        time_indices = {time: i for i, time in enumerate(times)}
+        station_indices = {station.code: i for i, station in enumerate(self.stations)}
+        values = np.full((len(times), len(self.stations)), np.nan)
+        for time, station_id, value in rows:
+            values[time_indices[time], station_indices[station_id]] = value
+        return np.array([time.replace(tzinfo=None) for time in times], dtype='datetime64[s]'), values
+
+    def interpolate(self, values: np.ndarray, max_workers: int = 1) -> np.ndarray:
+        """
+        Interpolate the values of the stations onto the grid
+
+        :param values: Values per time and station, or per station for a single time, with NaN for missing values
+        :param max_workers: Number of processes that interpolate slices of the times in parallel
+        :return: Grid per time of shape (times, latitudes, longitudes), or a single grid for a single time.
+                 Cells are NaN for times without any measurement.
+        """
+
+        single = values.ndim == 1
+        values = np.atleast_2d(values)
+        if max_workers > 1 and len(values) > 1:
+            slices = np.array_split(values, min(max_workers, len(values)))
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                grids = np.concatenate(list(executor.map(self._interpolate, [self.weights] * len(slices), slices)))
+        else:
+            grids = self._interpolate(self.weights, values)
+
+        grids = grids.reshape(len(values), len(self.latitudes), len(self.longitudes))
+        return grids[0] if single else grids
+
+    @staticmethod
+    def _interpolate(weights: np.ndarray, values: np.ndarray) -> np.ndarray:
+        present = ~np.isnan(values)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return (np.where(present, values, 0.0) @ weights) / (present @ weights)
+
+    @staticmethod
+    def _to_points(latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+        # Points on the unit sphere, as in StationIndex
+        latitudes, longitudes = np.radians(latitudes), np.radians(longitudes)
+        return np.stack([
+            np.cos(latitudes) * np.cos(longitudes), np.cos(latitudes) * np.sin(longitudes), np.sin(latitudes)
+        ], axis=-1)
@@ -0,0 +1,173 @@
+import logging
+import os.path
+import pickle
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from common.utils import data_dir
+from measurements.models import Measurement
+from stations.models import Station
+
+logger = logging.getLogger(__name__)
+
+
+class Observation:
+    """
+    The latest hourly measurement of a station, as a compact record of plain values
+    """
+
+    FIELDS = [
+        'wind_direction', 'wind_speed', 'gust_of_wind', 'temperature', 'dew_temperature', 'sunshine', 'radiation',
+        'precipitation_duration', 'precipitation', 'air_pressure', 'visibility', 'cloud_cover', 'relative_humidity',
+        'mist', 'rain', 'snow', 'lightning', 'icing',
+    ]
+
+    __slots__ = ['station_id', 'time', *FIELDS]
+
+    def __init__(self, station_id: int, time: datetime, *values):
+        self.station_id = station_id
+        self.time = time
+        for field, value in zip(self.FIELDS, values):
+            setattr(self, field, value)
+
+    @staticmethod
+    def from_measurement(measurement: Measurement) -> 'Observation':
+        return Observation(measurement.station_id, measurement.time,
+                           *[getattr(measurement, field) for field in Observation.FIELDS])
+
+    def values(self) -> tuple:
+        return (self.station_id, self.time, *[getattr(self, field) for field in self.FIELDS])
+
+    def as_dict(self) -> Dict:
+        return dict(zip(['station', 'time', *self.FIELDS], self.values()))
+
+
+class LatestObservations:
+    """
+    In-process snapshot of the latest hourly measurement of every station, for the current conditions
+
+    Finding the latest measurements in the database is a group by over the whole table. The snapshot is kept up to
+    date instead: every import batch merges its measurements into it and writes it to data/latest_observations.pickle,
+    so reading it never touches the database.
+
+    Use LatestObservations.get() for the shared snapshot. A process loads the file on first use, and loads it again
+    when an import in any process has replaced it, which costs a stat of the file per call. Without a file, the
+    snapshot is built from the database once, with one index lookup per station.
+    """
+
+    FILE = os.path.join(data_dir, 'latest_observations.pickle')
+
+    _instance = None
+    _version = None
+    _lock = threading.Lock()
+
+    def __init__(self, observations: Dict[int, Observation]):
+        """
+        :param observations: Latest observation by station code
+        """
+
+        self.observations = observations
+
+    @classmethod
+    def get(cls) -> 'LatestObservations':
+        with cls._lock:
+            version = cls._file_version()
+            if version is None:
+                cls._instance = cls.build()
+                cls._instance.save()
+                version = cls._file_version()
+            elif cls._instance is None or version != cls._version:
+                cls._instance = cls.load()
+            cls._version = version
+            return cls._instance
+
+    @classmethod
+    def update(cls, measurements: Iterable[Measurement]):
+        """
+        Merge imported hourly measurements into the shared snapshot and its file
+
+        A measurement replaces the observation of its station if it is at least as recent, so that corrections of the
+        latest hour are picked up as well.
+        """
+
+        latest = {}
+        for measurement in measurements:
+            current = latest.get(measurement.station_id)
+            if current is None or measurement.time >= current.time:
+                latest[measurement.station_id] = measurement
+
+        snapshot = cls.get()
+        # Readers in other threads keep the previous snapshot, which is never changed in place
+        observations = dict(snapshot.observations)
+        changed = False
+        for station_id, measurement in latest.items():
+            current = observations.get(station_id)
+            if current is None or measurement.time >= current.time:
+                observations[station_id] = Observation.from_measurement(measurement)
+                changed = True
+        if not changed:
+            return
+
+        snapshot = cls(observations)
+        with cls._lock:
+            snapshot.save()
+            cls._instance = snapshot
+            cls._version = cls._file_version()
+
+    @classmethod
+    def invalidate(cls):
+        """
+        Rebuild the snapshot from the database on its next use, in every process
+        """
+
+        with cls._lock:
+            try:
+                os.remove(cls.FILE)
+            except FileNotFoundError:
+                pass
+            cls._instance = None
+
+    @staticmethod
+    def build() -> 'LatestObservations':
+        observations = {}
+        for code in Station.objects.values_list('code', flat=True):
+            # The unique constraint on station and time makes this an index lookup
+            values = Measurement.objects.filter(station_id=code).order_by('-time') \
+                .values_list('station_id', 'time', *Observation.FIELDS).first()
+            if values is not None:
+                observations[code] = Observation(*values)
+        logger.info(f'Latest observations of {len(observations)} stations have been built from the database')
+        return LatestObservations(observations)
+
+    @staticmethod
+    def load() -> 'LatestObservations':
+        with open(LatestObservations.FILE, 'rb') as f:
+            rows = pickle.load(f)
+        return LatestObservations({row[0]: Observation(*row) for row in rows})
+
+    def save(self):
+        # Replace the file at once, so other processes never read a partially written snapshot
+        temporary_file = f'{self.FILE}.{os.getpid()}.tmp'
+        with open(temporary_file, 'wb') as f:
+            pickle.dump([observation.values() for observation in self.observations.values()], f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_file, self.FILE)
+
+    @classmethod
+    def _file_version(cls) -> Optional[tuple]:
+        try:
+            stat = os.stat(cls.FILE)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def station(self, code: int) -> Optional[Observation]:
+        return self.observations.get(code)
+
+    def all(self) -> List[Observation]:
+        """
+        :return: Latest observation of every station with measurements, ordered by station code
+        """
+
+        return [self.observations[code] for code in sorted(self.observations)]
@@ -0,0 +1,25 @@
+import logging
+
+from common.instrumentation import InstrumentedCommand
+from measurements.climatology import Climatology
+
+logger = logging.getLogger(__name__)
+
+
+class Command(InstrumentedCommand):
+    help = 'Compute the normals per station, day of the year and hour from the history of hourly measurements'
+
+    def handle(self, *args, **options):
+        climatology = Climatology.compute(window_days=options['window_days'])
+        climatology.save()
+        print(f'Successfully computed the normals of {len(climatology.stations)} stations')
+
+        if options['rescore']:
+            nr_measurements = climatology.rescore()
+            print(f'Successfully recomputed the anomaly scores of {nr_measurements} measurements')
+
+    def add_arguments(self, parser):
+        help_window_days = 'Number of days before and after a day whose measurements count towards its normals'
+        parser.add_argument('--window-days', type=int, default=Climatology.WINDOW_DAYS, help=help_window_days)
+        help_rescore = 'Recompute the anomaly scores of all measurements that are already in the database'
+        parser.add_argument('--rescore', action='store_true', help=help_rescore)
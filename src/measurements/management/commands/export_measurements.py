@@ -1,23 +1,60 @@
 import logging
+from datetime import date, datetime
 
-from django.core.management import BaseCommand
+from django.core.management import CommandError
 
-from data_sources.knmi import DataMode
+from common.instrumentation import InstrumentedCommand
+from data_sources.data_mode import DataMode
 from measurements.csv_exporter import CsvExporter
 
 logger = logging.getLogger(__name__)
 
 
-class Command(BaseCommand):
-    help = 'Export the list of hourly measurements'
+class Command(InstrumentedCommand):
+    help = 'Export the list of daily or hourly measurements'
 
     def handle(self, *args, **options):
         data_mode = DataMode(options['data_mode'])
-        if data_mode == DataMode.per_day:
-            raise NotImplementedError('No model yet for Per Day measurements')
-
-        CsvExporter.export()
+        stations = [int(code) for code in options['stations'].split(':')] if options['stations'] else None
+        if options['format'] == 'npy':
+            if options['gzip'] or options['partition']:
+                raise CommandError('The npy format is always partitioned by station and year and cannot be gzipped')
+            # Imported here, so that csv exports do not import numpy
+            from measurements.columnar_exporter import ColumnarExporter
+
+            try:
+                archive_dir = ColumnarExporter.export(data_mode, start=options['start'], end=options['end'],
+                                                      stations=stations)
+            except AssertionError as e:
+                raise CommandError(e)
+            print(f'Successfully exported to {archive_dir}')
+            return
+
+        full_paths_to_files = CsvExporter.export(
+            data_mode, start=options['start'], end=options['end'], stations=stations, compress=options['gzip'],
+            partition=options['partition'], max_workers=options['workers']
+        )
+        print(f'Successfully exported {len(full_paths_to_files)} files')
 
     def add_arguments(self, parser):
         help_data_mode = 'Data mode: day or hour'
         parser.add_argument('data_mode', type=str, help=help_data_mode)
+        help_start = 'First day YYYYMMDD to export'
+        parser.add_argument('--start', type=self._parse_day, help=help_start)
+        help_end = 'Last day YYYYMMDD to export'
+        parser.add_argument('--end', type=self._parse_day, help=help_end)
+        help_stations = 'Station codes separated by :, defaults to all stations'
+        parser.add_argument('--stations', type=str, help=help_stations)
+        help_format = 'csv, or npy for one NumPy array per field, partitioned by station and year. An npy export ' \
+                      'replaces the partitions it covers, so it must start on 1 January and end on 31 December'
+        parser.add_argument('--format', choices=['csv', 'npy'], default='csv', help=help_format)
+        help_gzip = 'Gzip the exported files'
+        parser.add_argument('--gzip', action='store_true', help=help_gzip)
+        help_partition = 'Write one file per station or per month'
+        parser.add_argument('--partition', choices=CsvExporter.PARTITIONS, help=help_partition)
+        help_workers = 'Maximum number of files that are written at the same time'
+        parser.add_argument('--workers', type=int, default=4, help=help_workers)
+
+    @staticmethod
+    def _parse_day(day: str) -> date:
+        return datetime.strptime(day, '%Y%m%d').date()
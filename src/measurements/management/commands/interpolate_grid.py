@@ -0,0 +1,48 @@
+import logging
+import os.path
+from datetime import datetime
+
+import numpy as np
+import pytz
+
+from common.instrumentation import InstrumentedCommand
+from common.utils import data_dir
+from measurements.interpolation import IdwInterpolator
+
+logger = logging.getLogger(__name__)
+
+
+class Command(InstrumentedCommand):
+    help = 'Interpolate hourly measurements of all stations onto a latitude/longitude grid of the Netherlands'
+
+    def handle(self, *args, **options):
+        field = options['field']
+        start = options['start']
+        end = options['end'] or start
+
+        interpolator = IdwInterpolator.for_grid(resolution=options['resolution'], power=options['power'])
+        times, values = interpolator.measurements(field, start, end)
+        grids = interpolator.interpolate(values, max_workers=options['workers'])
+
+        full_path_to_file = os.path.join(data_dir, f'{field}_grid_{start:%Y%m%d%H}_{end:%Y%m%d%H}.npz')
+        np.savez(full_path_to_file, times=times, latitudes=interpolator.latitudes,
+                 longitudes=interpolator.longitudes, grids=grids)
+        print(f'Successfully interpolated {len(times)} times to {full_path_to_file}')
+
+    def add_arguments(self, parser):
+        help_field = 'Measurement field, like temperature or precipitation'
+        parser.add_argument('field', type=str, help=help_field)
+        help_start = 'First time YYYYMMDDHH in UTC'
+        parser.add_argument('start', type=self._parse_time, help=help_start)
+        help_end = 'Last time YYYYMMDDHH in UTC, defaults to the first time'
+        parser.add_argument('--end', type=self._parse_time, help=help_end)
+        help_resolution = 'Distance between grid points in degrees'
+        parser.add_argument('--resolution', type=float, default=0.05, help=help_resolution)
+        help_power = 'Power of the inverse distance weights'
+        parser.add_argument('--power', type=float, default=2.0, help=help_power)
+        help_workers = 'Number of processes that interpolate the times in parallel'
+        parser.add_argument('--workers', type=int, default=1, help=help_workers)
+
+    @staticmethod
+    def _parse_time(time: str) -> datetime:
+        return pytz.utc.localize(datetime.strptime(time, '%Y%m%d%H'))
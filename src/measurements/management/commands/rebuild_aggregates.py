@@ -0,0 +1,14 @@
+import logging
+
+from common.instrumentation import InstrumentedCommand
+from measurements.aggregates import Aggregates
+
+logger = logging.getLogger(__name__)
+
+
+class Command(InstrumentedCommand):
+    help = 'Rebuild the daily and monthly aggregates per station from the hourly measurements'
+
+    def handle(self, *args, **options):
+        nr_daily_aggregates = Aggregates.rebuild()
+        print(f'Successfully rebuilt {nr_daily_aggregates} daily aggregates')
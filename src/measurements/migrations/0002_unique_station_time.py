@@ -0,0 +1,34 @@
+# Generated by Django 2.2.20 on 2026-10-18 14:49
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def remove_duplicate_measurements(apps, schema_editor):
+    """
+    Earlier imports did not enforce uniqueness, so keep only the most recent row per station and time
+    """
+
+    Measurement = apps.get_model('measurements', 'Measurement')
+    duplicates = Measurement.objects.values('station', 'time').annotate(
+        last_id=Max('id'), count=Count('id')
+    ).filter(count__gt=1)
+    for duplicate in duplicates:
+        Measurement.objects.filter(station=duplicate['station'], time=duplicate['time']).exclude(
+            id=duplicate['last_id']
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('measurements', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_measurements, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='measurement',
+            constraint=models.UniqueConstraint(fields=('station', 'time'), name='unique_station_time'),
+        ),
+    ]
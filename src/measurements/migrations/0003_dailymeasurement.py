@@ -0,0 +1,66 @@
+# Generated by Django 2.2.20 on 2026-10-18 14:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stations', '0001_initial'),
+        ('measurements', '0002_unique_station_time'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyMeasurement',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('wind_direction', models.PositiveSmallIntegerField(blank=True, default=None, help_text='Vector mean wind direction in degrees (360=north, 90=east, 180=south, 270=west, 0=calm/variable)', null=True)),
+                ('vector_wind_speed', models.DecimalField(blank=True, decimal_places=1, default=None, help_text='Vector mean windspeed (in m/s)', max_digits=8, null=True)),
+                ('wind_speed', models.DecimalField(blank=True, decimal_places=1, default=None, help_text='Daily mean windspeed (in m/s)', max_digits=8, null=True)),
+                ('max_wind_speed', models.DecimalField(blank=True, decimal_places=1, default=None, help_text='Maximum hourly mean windspeed (in m/s)', max_digits=8, null=True)),
+                ('max_wind_speed_hour', models.PositiveSmallIntegerField(blank=True, default=None, help_text='Hourly division in which the maximum hourly mean windspeed was measured', null=True)),
+                ('min_wind_speed', models.DecimalField(blank=True, decimal_places=1, default=None, help_text='Minimum hourly mean windspeed (in m/s)', max_digits=8, null=True)),
+                ('min_wind_speed_hour', models.PositiveSmallIntegerField(blank=True, default=None, help_text='Hourly division in which the minimum hourly mean windspeed was measured', null=True)),
+                ('gust_of_wind', models.DecimalField(blank=True, decimal_places=1, default=None, help_text='Maximum wind gust (in m/s)', max_digits=8, null=True)),
+                ('gust_of_wind_hour', models.PositiveSmallIntegerField(blank=True, default=None, help_text='Hourly division in which the maximum wind gust was measured', null=True)),
+                ('temperature', models.DecimalField(blank=True, decimal_places=1, default=None, help_text='Daily mean temperature in (degrees Celsius)', max_digits=8, null=True)),
+                ('min_temperature', models.DecimalField(blank=True, decimal_places=1, default=None, help_text='Minimum temperature (in degrees Celsius)', max_digits=8, null=True)),
+                ('min_temperature_hour', models.PositiveSmallIntegerField(blank=True, default=None, help_text='Hourly division in which the minimum temperature was measured', null=True)),
+                ('max_temperature', models.DecimalField(blank=True, decimal_places=1, default=None, help_text='Maximum temperature (in degrees Celsius)', max_digits=8, null=True)),
+                ('max_temperature_hour', models.PositiveSmallIntegerField(blank=True, default=None, help_text='Hourly division in which the maximum temperature was measured', null=True)),
+                ('min_ground_temperature', models.DecimalField(blank=True, decimal_places=1, default=None, help_text='Minimum temperature at 10 cm above surface (in degrees Celsius)', max_digits=8, null=True)),
+                ('min_ground_temperature_hour', models.PositiveSmallIntegerField(blank=True, default=None, help_text='6-hourly division in which the minimum temperature at 10 cm above surface was measured; 6=0-6 UT, 12=6-12 UT, 18=12-18 UT, 24=18-24 UT', null=True)),
+                ('sunshine', models.DecimalField(blank=True, decimal_places=1, default=None, help_text='Sunshine duration (in hours) calculated from global radiation (-0.1 for <0.05 hour)', max_digits=8, null=True)),
+                ('sunshine_percentage', models.PositiveSmallIntegerField(blank=True, default=None, help_text='Percentage of maximum potential sunshine duration', null=True)),
+                ('radiation', models.PositiveSmallIntegerField(blank=True, default=None, help_text='Global radiation (in J/cm2)', null=True)),
+                ('precipitation_duration', models.DecimalField(blank=True, decimal_places=1, default=None, help_text='Precipitation duration (in hours)', max_digits=8, null=True)),
+                ('precipitation', models.DecimalField(blank=True, decimal_places=1, default=None, help_text='Daily precipitation amount (in mm) (-0.1 for <0.05 mm)', max_digits=8, null=True)),
+                ('max_precipitation', models.DecimalField(blank=True, decimal_places=1, default=None, help_text='Maximum hourly precipitation amount (in mm) (-0.1 for <0.05 mm)', max_digits=8, null=True)),
+                ('max_precipitation_hour', models.PositiveSmallIntegerField(blank=True, default=None, help_text='Hourly division in which the maximum hourly precipitation amount was measured', null=True)),
+                ('evapotranspiration', models.DecimalField(blank=True, decimal_places=1, default=None, help_text='Potential evapotranspiration (Makkink) (in mm)', max_digits=8, null=True)),
+                ('air_pressure', models.DecimalField(blank=True, decimal_places=1, default=None, help_text='Daily mean sea level pressure (in hPa) calculated from 24 hourly values', max_digits=8, null=True)),
+                ('max_air_pressure', models.DecimalField(blank=True, decimal_places=1, default=None, help_text='Maximum hourly sea level pressure (in hPa)', max_digits=8, null=True)),
+                ('max_air_pressure_hour', models.PositiveSmallIntegerField(blank=True, default=None, help_text='Hourly division in which the maximum hourly sea level pressure was measured', null=True)),
+                ('min_air_pressure', models.DecimalField(blank=True, decimal_places=1, default=None, help_text='Minimum hourly sea level pressure (in hPa)', max_digits=8, null=True)),
+                ('min_air_pressure_hour', models.PositiveSmallIntegerField(blank=True, default=None, help_text='Hourly division in which the minimum hourly sea level pressure was measured', null=True)),
+                ('min_visibility', models.PositiveSmallIntegerField(blank=True, default=None, help_text='Minimum visibility; 0: <100 m, 1:100-200 m, 2:200-300 m,..., 49:4900-5000 m, 50:5-6 km, 56:6-7 km, 57:7-8 km,..., 79:29-30 km, 80:30-35 km, 81:35-40 km,..., 89: >70 km)', null=True)),
+                ('min_visibility_hour', models.PositiveSmallIntegerField(blank=True, default=None, help_text='Hourly division in which the minimum visibility was measured', null=True)),
+                ('max_visibility', models.PositiveSmallIntegerField(blank=True, default=None, help_text='Maximum visibility; 0: <100 m, 1:100-200 m, 2:200-300 m,..., 49:4900-5000 m, 50:5-6 km, 56:6-7 km, 57:7-8 km,..., 79:29-30 km, 80:30-35 km, 81:35-40 km,..., 89: >70 km)', null=True)),
+                ('max_visibility_hour', models.PositiveSmallIntegerField(blank=True, default=None, help_text='Hourly division in which the maximum visibility was measured', null=True)),
+                ('cloud_cover', models.PositiveSmallIntegerField(blank=True, default=None, help_text='Mean daily cloud cover (in octants, 9=sky invisible)', null=True)),
+                ('relative_humidity', models.PositiveSmallIntegerField(blank=True, default=None, help_text='Daily mean relative atmospheric humidity (in percents)', null=True)),
+                ('max_relative_humidity', models.PositiveSmallIntegerField(blank=True, default=None, help_text='Maximum relative atmospheric humidity (in percents)', null=True)),
+                ('max_relative_humidity_hour', models.PositiveSmallIntegerField(blank=True, default=None, help_text='Hourly division in which the maximum relative atmospheric humidity was measured', null=True)),
+                ('min_relative_humidity', models.PositiveSmallIntegerField(blank=True, default=None, help_text='Minimum relative atmospheric humidity (in percents)', null=True)),
+                ('min_relative_humidity_hour', models.PositiveSmallIntegerField(blank=True, default=None, help_text='Hourly division in which the minimum relative atmospheric humidity was measured', null=True)),
+                ('station', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_measurements', to='stations.Station')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='dailymeasurement',
+            constraint=models.UniqueConstraint(fields=('station', 'day'), name='unique_station_day'),
+        ),
+    ]
@@ -0,0 +1,236 @@
+# Generated by Django 2.2.20 on 2026-10-18 14:57
+
+import common.fields
+import pytz
+from django.db import migrations, models
+from django.db.models import ExpressionWrapper, F, Value
+from django.db.models.functions import ExtractHour, TruncDate
+from django.utils import timezone
+import django.db.models.deletion
+
+# Fields that are now stored in tenths of a unit. The hourly wind direction was wrongly divided by 10 on import,
+# so scaling it by 10 turns it into whole degrees.
+TENTHS_FIELDS = {
+    'measurement': [
+        'wind_direction', 'wind_speed', 'gust_of_wind', 'temperature', 'dew_temperature', 'sunshine',
+        'precipitation_duration', 'precipitation', 'air_pressure',
+    ],
+    'dailymeasurement': [
+        'vector_wind_speed', 'wind_speed', 'max_wind_speed', 'min_wind_speed', 'gust_of_wind', 'temperature',
+        'min_temperature', 'max_temperature', 'min_ground_temperature', 'sunshine', 'precipitation_duration',
+        'precipitation', 'max_precipitation', 'evapotranspiration', 'air_pressure', 'max_air_pressure',
+        'min_air_pressure',
+    ],
+}
+
+
+def scale_to_tenths(apps, schema_editor):
+    for model_name, fields in TENTHS_FIELDS.items():
+        model = apps.get_model('measurements', model_name)
+        model.objects.update(**{field: F(field) * 10 for field in fields})
+
+
+def scale_to_units(apps, schema_editor):
+    for model_name, fields in TENTHS_FIELDS.items():
+        model = apps.get_model('measurements', model_name)
+        model.objects.update(**{
+            field: ExpressionWrapper(F(field) * Value(0.1), output_field=models.FloatField()) for field in fields
+        })
+
+
+def restore_day_and_hour(apps, schema_editor):
+    # The day and hour were those of the KNMI in UTC, where hour 1 is the hour that starts at midnight
+    measurement = apps.get_model('measurements', 'measurement')
+    with timezone.override(pytz.utc):
+        measurement.objects.update(day=TruncDate('time'), hour=ExtractHour('time') + 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('measurements', '0003_dailymeasurement'),
+    ]
+
+    operations = [
+        # The day becomes nullable before it is removed, so that migrating back adds it as nullable, fills it from the
+        # time and only then makes it required again
+        migrations.AlterField(
+            model_name='measurement',
+            name='day',
+            field=models.DateField(null=True),
+        ),
+        migrations.RunPython(migrations.RunPython.noop, restore_day_and_hour),
+        migrations.RemoveField(
+            model_name='measurement',
+            name='day',
+        ),
+        migrations.RemoveField(
+            model_name='measurement',
+            name='hour',
+        ),
+        migrations.RunPython(scale_to_tenths, scale_to_units),
+        migrations.AlterField(
+            model_name='dailymeasurement',
+            name='air_pressure',
+            field=common.fields.TenthsField(blank=True, default=None, help_text='Daily mean sea level pressure (in hPa) calculated from 24 hourly values', null=True),
+        ),
+        migrations.AlterField(
+            model_name='dailymeasurement',
+            name='evapotranspiration',
+            field=common.fields.TenthsField(blank=True, default=None, help_text='Potential evapotranspiration (Makkink) (in mm)', null=True),
+        ),
+        migrations.AlterField(
+            model_name='dailymeasurement',
+            name='gust_of_wind',
+            field=common.fields.TenthsField(blank=True, default=None, help_text='Maximum wind gust (in m/s)', null=True),
+        ),
+        migrations.AlterField(
+            model_name='dailymeasurement',
+            name='max_air_pressure',
+            field=common.fields.TenthsField(blank=True, default=None, help_text='Maximum hourly sea level pressure (in hPa)', null=True),
+        ),
+        migrations.AlterField(
+            model_name='dailymeasurement',
+            name='max_precipitation',
+            field=common.fields.TenthsField(blank=True, default=None, help_text='Maximum hourly precipitation amount (in mm) (-0.1 for <0.05 mm)', null=True),
+        ),
+        migrations.AlterField(
+            model_name='dailymeasurement',
+            name='max_temperature',
+            field=common.fields.TenthsField(blank=True, default=None, help_text='Maximum temperature (in degrees Celsius)', null=True),
+        ),
+        migrations.AlterField(
+            model_name='dailymeasurement',
+            name='max_wind_speed',
+            field=common.fields.TenthsField(blank=True, default=None, help_text='Maximum hourly mean windspeed (in m/s)', null=True),
+        ),
+        migrations.AlterField(
+            model_name='dailymeasurement',
+            name='min_air_pressure',
+            field=common.fields.TenthsField(blank=True, default=None, help_text='Minimum hourly sea level pressure (in hPa)', null=True),
+        ),
+        migrations.AlterField(
+            model_name='dailymeasurement',
+            name='min_ground_temperature',
+            field=common.fields.TenthsField(blank=True, default=None, help_text='Minimum temperature at 10 cm above surface (in degrees Celsius)', null=True),
+        ),
+        migrations.AlterField(
+            model_name='dailymeasurement',
+            name='min_temperature',
+            field=common.fields.TenthsField(blank=True, default=None, help_text='Minimum temperature (in degrees Celsius)', null=True),
+        ),
+        migrations.AlterField(
+            model_name='dailymeasurement',
+            name='min_wind_speed',
+            field=common.fields.TenthsField(blank=True, default=None, help_text='Minimum hourly mean windspeed (in m/s)', null=True),
+        ),
+        migrations.AlterField(
+            model_name='dailymeasurement',
+            name='precipitation',
+            field=common.fields.TenthsField(blank=True, default=None, help_text='Daily precipitation amount (in mm) (-0.1 for <0.05 mm)', null=True),
+        ),
+        migrations.AlterField(
+            model_name='dailymeasurement',
+            name='precipitation_duration',
+            field=common.fields.TenthsField(blank=True, default=None, help_text='Precipitation duration (in hours)', null=True),
+        ),
+        migrations.AlterField(
+            model_name='dailymeasurement',
+            name='station',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='daily_measurements', to='stations.Station'),
+        ),
+        migrations.AlterField(
+            model_name='dailymeasurement',
+            name='sunshine',
+            field=common.fields.TenthsField(blank=True, default=None, help_text='Sunshine duration (in hours) calculated from global radiation (-0.1 for <0.05 hour)', null=True),
+        ),
+        migrations.AlterField(
+            model_name='dailymeasurement',
+            name='temperature',
+            field=common.fields.TenthsField(blank=True, default=None, help_text='Daily mean temperature in (degrees Celsius)', null=True),
+        ),
+        migrations.AlterField(
+            model_name='dailymeasurement',
+            name='vector_wind_speed',
+            field=common.fields.TenthsField(blank=True, default=None, help_text='Vector mean windspeed (in m/s)', null=True),
+        ),
+        migrations.AlterField(
+            model_name='dailymeasurement',
+            name='wind_speed',
+            field=common.fields.TenthsField(blank=True, default=None, help_text='Daily mean windspeed (in m/s)', null=True),
+        ),
+        migrations.AlterField(
+            model_name='measurement',
+            name='air_pressure',
+            field=common.fields.TenthsField(blank=True, default=None, help_text='Luchtdruk (in hPa) herleid naar zeeniveau, tijdens de waarneming', null=True),
+        ),
+        migrations.AlterField(
+            model_name='measurement',
+            name='cloud_cover',
+            field=models.PositiveSmallIntegerField(blank=True, default=None, help_text='Bewolking (bedekkingsgraad van de bovenlucht in achtsten), tijdens de waarneming (9=bovenlucht onzichtbaar)', null=True),
+        ),
+        migrations.AlterField(
+            model_name='measurement',
+            name='dew_temperature',
+            field=common.fields.TenthsField(blank=True, default=None, help_text='Dauwpuntstemperatuur (in graden Celsius) op 1.50 m hoogte tijdens de waarneming', null=True),
+        ),
+        migrations.AlterField(
+            model_name='measurement',
+            name='gust_of_wind',
+            field=common.fields.TenthsField(blank=True, default=None, help_text='Hoogste windstoot (in m/s) over het afgelopen uurvak', null=True),
+        ),
+        migrations.AlterField(
+            model_name='measurement',
+            name='precipitation',
+            field=common.fields.TenthsField(blank=True, default=None, help_text='Uursom van de neerslag (in mm) (-1 voor <0.05 mm)', null=True),
+        ),
+        migrations.AlterField(
+            model_name='measurement',
+            name='precipitation_duration',
+            field=common.fields.TenthsField(blank=True, default=None, help_text='Duur van de neerslag (in uren) per uurvak', null=True),
+        ),
+        migrations.AlterField(
+            model_name='measurement',
+            name='radiation',
+            field=models.PositiveSmallIntegerField(blank=True, default=None, help_text='Globale straling (in J/cm2) per uurvak', null=True),
+        ),
+        migrations.AlterField(
+            model_name='measurement',
+            name='relative_humidity',
+            field=models.PositiveSmallIntegerField(blank=True, default=None, help_text='Relatieve vochtigheid (in procenten) op 1.50 m hoogte tijdens de waarneming', null=True),
+        ),
+        migrations.AlterField(
+            model_name='measurement',
+            name='station',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='measurements', to='stations.Station'),
+        ),
+        migrations.AlterField(
+            model_name='measurement',
+            name='sunshine',
+            field=common.fields.TenthsField(blank=True, default=None, help_text='Duur van de zonneschijn (in uren) per uurvak, berekend uit globale straling  (-1 for <0.05 uur)', null=True),
+        ),
+        migrations.AlterField(
+            model_name='measurement',
+            name='temperature',
+            field=common.fields.TenthsField(blank=True, default=None, help_text='Temperatuur (in graden Celsius) op 1.50 m hoogte tijdens de waarneming', null=True),
+        ),
+        migrations.AlterField(
+            model_name='measurement',
+            name='visibility',
+            field=models.PositiveSmallIntegerField(blank=True, default=None, help_text='Horizontaal zicht tijdens de waarneming (0=minder dan 100m, 1=100-200m, 2=200-300m,..., 49=4900-5000m, 50=5-6km, 56=6-7km, 57=7-8km, ..., 79=29-30km, 80=30-35km, 81=35-40km,..., 89=meer dan 70km)', null=True),
+        ),
+        migrations.AlterField(
+            model_name='measurement',
+            name='wind_direction',
+            field=models.PositiveSmallIntegerField(blank=True, default=None, help_text='Windrichting (in graden) gemiddeld over de laatste 10 minuten van het afgelopen uur (360=noord, 90=oost, 180=zuid, 270=west, 0=windstil 990=veranderlijk', null=True),
+        ),
+        migrations.AlterField(
+            model_name='measurement',
+            name='wind_speed',
+            field=common.fields.TenthsField(blank=True, default=None, help_text='Uurgemiddelde windsnelheid (in m/s)', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='measurement',
+            index=models.Index(fields=['time'], name='measurement_time'),
+        ),
+    ]
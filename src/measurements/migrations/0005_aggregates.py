@@ -0,0 +1,64 @@
+# Generated by Django 2.2.20 on 2026-10-18 14:59
+
+import common.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stations', '0001_initial'),
+        ('measurements', '0004_compact_integer_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyAggregate',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('temperature_min', common.fields.TenthsField(blank=True, default=None, null=True)),
+                ('temperature_max', common.fields.TenthsField(blank=True, default=None, null=True)),
+                ('temperature_sum', common.fields.LargeTenthsField(blank=True, default=None, null=True)),
+                ('temperature_count', models.PositiveIntegerField(default=0)),
+                ('precipitation_min', common.fields.TenthsField(blank=True, default=None, null=True)),
+                ('precipitation_max', common.fields.TenthsField(blank=True, default=None, null=True)),
+                ('precipitation_sum', common.fields.LargeTenthsField(blank=True, default=None, null=True)),
+                ('precipitation_count', models.PositiveIntegerField(default=0)),
+                ('sunshine_min', common.fields.TenthsField(blank=True, default=None, null=True)),
+                ('sunshine_max', common.fields.TenthsField(blank=True, default=None, null=True)),
+                ('sunshine_sum', common.fields.LargeTenthsField(blank=True, default=None, null=True)),
+                ('sunshine_count', models.PositiveIntegerField(default=0)),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('station', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='monthly_aggregates', to='stations.Station')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyAggregate',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('temperature_min', common.fields.TenthsField(blank=True, default=None, null=True)),
+                ('temperature_max', common.fields.TenthsField(blank=True, default=None, null=True)),
+                ('temperature_sum', common.fields.LargeTenthsField(blank=True, default=None, null=True)),
+                ('temperature_count', models.PositiveIntegerField(default=0)),
+                ('precipitation_min', common.fields.TenthsField(blank=True, default=None, null=True)),
+                ('precipitation_max', common.fields.TenthsField(blank=True, default=None, null=True)),
+                ('precipitation_sum', common.fields.LargeTenthsField(blank=True, default=None, null=True)),
+                ('precipitation_count', models.PositiveIntegerField(default=0)),
+                ('sunshine_min', common.fields.TenthsField(blank=True, default=None, null=True)),
+                ('sunshine_max', common.fields.TenthsField(blank=True, default=None, null=True)),
+                ('sunshine_sum', common.fields.LargeTenthsField(blank=True, default=None, null=True)),
+                ('sunshine_count', models.PositiveIntegerField(default=0)),
+                ('day', models.DateField()),
+                ('station', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='daily_aggregates', to='stations.Station')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='monthlyaggregate',
+            constraint=models.UniqueConstraint(fields=('station', 'month'), name='unique_monthly_aggregate'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyaggregate',
+            constraint=models.UniqueConstraint(fields=('station', 'day'), name='unique_daily_aggregate'),
+        ),
+    ]
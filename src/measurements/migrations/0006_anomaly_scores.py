@@ -0,0 +1,34 @@
+# Generated by Django 2.2.20 on 2026-10-18 15:12
+
+import common.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('measurements', '0005_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='measurement',
+            name='air_pressure_anomaly',
+            field=common.fields.TenthsField(blank=True, default=None, help_text='Distance to the normal air pressure of the station at this day of the year and hour, in standard deviations', null=True),
+        ),
+        migrations.AddField(
+            model_name='measurement',
+            name='precipitation_anomaly',
+            field=common.fields.TenthsField(blank=True, default=None, help_text='Distance to the normal precipitation of the station at this day of the year and hour, in standard deviations', null=True),
+        ),
+        migrations.AddField(
+            model_name='measurement',
+            name='temperature_anomaly',
+            field=common.fields.TenthsField(blank=True, default=None, help_text='Distance to the normal temperature of the station at this day of the year and hour, in standard deviations', null=True),
+        ),
+        migrations.AddField(
+            model_name='measurement',
+            name='wind_speed_anomaly',
+            field=common.fields.TenthsField(blank=True, default=None, help_text='Distance to the normal wind speed of the station at this day of the year and hour, in standard deviations', null=True),
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+from django.db.models import Max, Min, Q
+
+
+def refresh_less_than_aggregates(apps, schema_editor):
+    """
+    Recompute the aggregates of the days on which the KNMI reported less than 0.05 precipitation or sunshine
+
+    They were computed with -0.1 for these hours instead of 0. Only the measurements are read through the historical
+    models: the aggregates are refreshed by Aggregates, like an import does, which uses the current models. If the
+    aggregate tables change in a later migration, run the rebuild_aggregates command after migrating instead.
+    """
+
+    from common.utils import touch_last_import
+    from measurements.aggregates import Aggregates
+
+    measurement = apps.get_model('measurements', 'measurement')
+    less_than = measurement.objects.filter(Q(precipitation__lt=0) | Q(sunshine__lt=0)).order_by()
+    station_times = []
+    for row in less_than.values('station_id').annotate(first=Min('time'), last=Max('time')):
+        station_times += [(row['station_id'], row['first']), (row['station_id'], row['last'])]
+    if station_times:
+        Aggregates.refresh(station_times)
+        touch_last_import()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('measurements', '0006_anomaly_scores'),
+    ]
+
+    operations = [
+        migrations.RunPython(refresh_less_than_aggregates, migrations.RunPython.noop),
+    ]
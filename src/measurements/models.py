@@ -1,7 +1,10 @@
+from decimal import Decimal
+from typing import Optional
+
 from django.db import models
 
-from common.utils import datetime_from_day_and_hour
-from stations.models import Station, Station
+from common.fields import LargeTenthsField, TenthsField
+from stations.models import Station
 
 
 class Measurement(models.Model):
@@ -28,27 +31,27 @@ class Measurement(models.Model):
     help_snow = 'Sneeuw wel/niet voorgekomen in het voorgaande uur en/of tijdens de waarneming'
     help_lightning = 'Onweer wel/niet voorgekomen in het voorgaande uur en/of tijdens de waarneming'
     help_icing = 'IJsvorming wel/niet voorgekomen in het voorgaande uur en/of tijdens de waarneming'
+    help_anomaly = 'Distance to the normal {} of the station at this day of the year and hour, in standard deviations'
 
-    decimal_settings = {'decimal_places': 1, 'max_digits': 8, 'null': True, 'blank': True, 'default': None}
+    integer_settings = {'null': True, 'blank': True, 'default': None}
 
-    station = models.ForeignKey(Station, related_name='measurements', on_delete=models.CASCADE)
-    day = models.DateField()
-    hour = models.PositiveSmallIntegerField(blank=True, null=True, default=False)
+    # The unique constraint on station and time also serves as the index for station and time range queries
+    station = models.ForeignKey(Station, related_name='measurements', on_delete=models.CASCADE, db_index=False)
     time = models.DateTimeField()
 
-    wind_direction = models.DecimalField(help_text=help_wind_direction, **decimal_settings)
-    wind_speed = models.DecimalField(help_text=help_wind_speed, **decimal_settings)
-    gust_of_wind = models.DecimalField(help_text=help_gust_of_wind, **decimal_settings)
-    temperature = models.DecimalField(help_text=help_temperature, **decimal_settings)
-    dew_temperature = models.DecimalField(help_text=help_dew_temperature, **decimal_settings)
-    sunshine = models.DecimalField(help_text=help_sunshine, **decimal_settings)
-    radiation = models.DecimalField(help_text=help_radiation, **decimal_settings)
-    precipitation_duration = models.DecimalField(help_text=help_precipitation_duration, **decimal_settings)
-    precipitation = models.DecimalField(help_text=help_precipitation, **decimal_settings)
-    air_pressure = models.DecimalField(help_text=help_air_pressue, **decimal_settings)
-    visibility = models.DecimalField(help_text=help_visibility, **decimal_settings)
-    cloud_cover = models.DecimalField(help_text=help_cloud_cover, **decimal_settings)
-    relative_humidity = models.DecimalField(help_text=help_relative_humidity, **decimal_settings)
+    wind_direction = models.PositiveSmallIntegerField(help_text=help_wind_direction, **integer_settings)
+    wind_speed = TenthsField(help_text=help_wind_speed, **integer_settings)
+    gust_of_wind = TenthsField(help_text=help_gust_of_wind, **integer_settings)
+    temperature = TenthsField(help_text=help_temperature, **integer_settings)
+    dew_temperature = TenthsField(help_text=help_dew_temperature, **integer_settings)
+    sunshine = TenthsField(help_text=help_sunshine, **integer_settings)
+    radiation = models.PositiveSmallIntegerField(help_text=help_radiation, **integer_settings)
+    precipitation_duration = TenthsField(help_text=help_precipitation_duration, **integer_settings)
+    precipitation = TenthsField(help_text=help_precipitation, **integer_settings)
+    air_pressure = TenthsField(help_text=help_air_pressue, **integer_settings)
+    visibility = models.PositiveSmallIntegerField(help_text=help_visibility, **integer_settings)
+    cloud_cover = models.PositiveSmallIntegerField(help_text=help_cloud_cover, **integer_settings)
+    relative_humidity = models.PositiveSmallIntegerField(help_text=help_relative_humidity, **integer_settings)
 
     mist = models.BooleanField(default=False, help_text=help_mist)
     rain = models.BooleanField(default=False, help_text=help_rain)
@@ -56,7 +59,176 @@ class Measurement(models.Model):
     lightning = models.BooleanField(default=False, help_text=help_lightning)
     icing = models.BooleanField(default=False, help_text=help_icing)
 
-    def save(self, **kwargs):
-        if not self.time:
-            self.time = datetime_from_day_and_hour(self.day, self.hour)
-        return super().save(**kwargs)
+    # Anomaly scores, set during the import from the normals of the Climatology
+    temperature_anomaly = TenthsField(help_text=help_anomaly.format('temperature'), **integer_settings)
+    wind_speed_anomaly = TenthsField(help_text=help_anomaly.format('wind speed'), **integer_settings)
+    precipitation_anomaly = TenthsField(help_text=help_anomaly.format('precipitation'), **integer_settings)
+    air_pressure_anomaly = TenthsField(help_text=help_anomaly.format('air pressure'), **integer_settings)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['station', 'time'], name='unique_station_time'),
+        ]
+        indexes = [
+            models.Index(fields=['time'], name='measurement_time'),
+        ]
+
+
+class DailyMeasurement(models.Model):
+    help_wind_direction = 'Vector mean wind direction in degrees (360=north, 90=east, 180=south, 270=west, ' \
+                          '0=calm/variable)'
+    help_vector_wind_speed = 'Vector mean windspeed (in m/s)'
+    help_wind_speed = 'Daily mean windspeed (in m/s)'
+    help_max_wind_speed = 'Maximum hourly mean windspeed (in m/s)'
+    help_max_wind_speed_hour = 'Hourly division in which the maximum hourly mean windspeed was measured'
+    help_min_wind_speed = 'Minimum hourly mean windspeed (in m/s)'
+    help_min_wind_speed_hour = 'Hourly division in which the minimum hourly mean windspeed was measured'
+    help_gust_of_wind = 'Maximum wind gust (in m/s)'
+    help_gust_of_wind_hour = 'Hourly division in which the maximum wind gust was measured'
+    help_temperature = 'Daily mean temperature in (degrees Celsius)'
+    help_min_temperature = 'Minimum temperature (in degrees Celsius)'
+    help_min_temperature_hour = 'Hourly division in which the minimum temperature was measured'
+    help_max_temperature = 'Maximum temperature (in degrees Celsius)'
+    help_max_temperature_hour = 'Hourly division in which the maximum temperature was measured'
+    help_min_ground_temperature = 'Minimum temperature at 10 cm above surface (in degrees Celsius)'
+    help_min_ground_temperature_hour = '6-hourly division in which the minimum temperature at 10 cm above surface ' \
+                                       'was measured; 6=0-6 UT, 12=6-12 UT, 18=12-18 UT, 24=18-24 UT'
+    help_sunshine = 'Sunshine duration (in hours) calculated from global radiation (-0.1 for <0.05 hour)'
+    help_sunshine_percentage = 'Percentage of maximum potential sunshine duration'
+    help_radiation = 'Global radiation (in J/cm2)'
+    help_precipitation_duration = 'Precipitation duration (in hours)'
+    help_precipitation = 'Daily precipitation amount (in mm) (-0.1 for <0.05 mm)'
+    help_max_precipitation = 'Maximum hourly precipitation amount (in mm) (-0.1 for <0.05 mm)'
+    help_max_precipitation_hour = 'Hourly division in which the maximum hourly precipitation amount was measured'
+    help_evapotranspiration = 'Potential evapotranspiration (Makkink) (in mm)'
+    help_air_pressure = 'Daily mean sea level pressure (in hPa) calculated from 24 hourly values'
+    help_max_air_pressure = 'Maximum hourly sea level pressure (in hPa)'
+    help_max_air_pressure_hour = 'Hourly division in which the maximum hourly sea level pressure was measured'
+    help_min_air_pressure = 'Minimum hourly sea level pressure (in hPa)'
+    help_min_air_pressure_hour = 'Hourly division in which the minimum hourly sea level pressure was measured'
+    help_min_visibility = 'Minimum visibility; 0: <100 m, 1:100-200 m, 2:200-300 m,..., 49:4900-5000 m, ' \
+                          '50:5-6 km, 56:6-7 km, 57:7-8 km,..., 79:29-30 km, 80:30-35 km, 81:35-40 km,..., 89: >70 km)'
+    help_min_visibility_hour = 'Hourly division in which the minimum visibility was measured'
+    help_max_visibility = 'Maximum visibility; 0: <100 m, 1:100-200 m, 2:200-300 m,..., 49:4900-5000 m, ' \
+                          '50:5-6 km, 56:6-7 km, 57:7-8 km,..., 79:29-30 km, 80:30-35 km, 81:35-40 km,..., 89: >70 km)'
+    help_max_visibility_hour = 'Hourly division in which the maximum visibility was measured'
+    help_cloud_cover = 'Mean daily cloud cover (in octants, 9=sky invisible)'
+    help_relative_humidity = 'Daily mean relative atmospheric humidity (in percents)'
+    help_max_relative_humidity = 'Maximum relative atmospheric humidity (in percents)'
+    help_max_relative_humidity_hour = 'Hourly division in which the maximum relative atmospheric humidity ' \
+                                      'was measured'
+    help_min_relative_humidity = 'Minimum relative atmospheric humidity (in percents)'
+    help_min_relative_humidity_hour = 'Hourly division in which the minimum relative atmospheric humidity ' \
+                                      'was measured'
+
+    integer_settings = {'null': True, 'blank': True, 'default': None}
+
+    station = models.ForeignKey(Station, related_name='daily_measurements', on_delete=models.CASCADE, db_index=False)
+    day = models.DateField()
+
+    wind_direction = models.PositiveSmallIntegerField(help_text=help_wind_direction, **integer_settings)
+    vector_wind_speed = TenthsField(help_text=help_vector_wind_speed, **integer_settings)
+    wind_speed = TenthsField(help_text=help_wind_speed, **integer_settings)
+    max_wind_speed = TenthsField(help_text=help_max_wind_speed, **integer_settings)
+    max_wind_speed_hour = models.PositiveSmallIntegerField(help_text=help_max_wind_speed_hour, **integer_settings)
+    min_wind_speed = TenthsField(help_text=help_min_wind_speed, **integer_settings)
+    min_wind_speed_hour = models.PositiveSmallIntegerField(help_text=help_min_wind_speed_hour, **integer_settings)
+    gust_of_wind = TenthsField(help_text=help_gust_of_wind, **integer_settings)
+    gust_of_wind_hour = models.PositiveSmallIntegerField(help_text=help_gust_of_wind_hour, **integer_settings)
+    temperature = TenthsField(help_text=help_temperature, **integer_settings)
+    min_temperature = TenthsField(help_text=help_min_temperature, **integer_settings)
+    min_temperature_hour = models.PositiveSmallIntegerField(help_text=help_min_temperature_hour, **integer_settings)
+    max_temperature = TenthsField(help_text=help_max_temperature, **integer_settings)
+    max_temperature_hour = models.PositiveSmallIntegerField(help_text=help_max_temperature_hour, **integer_settings)
+    min_ground_temperature = TenthsField(help_text=help_min_ground_temperature, **integer_settings)
+    min_ground_temperature_hour = models.PositiveSmallIntegerField(help_text=help_min_ground_temperature_hour,
+                                                                   **integer_settings)
+    sunshine = TenthsField(help_text=help_sunshine, **integer_settings)
+    sunshine_percentage = models.PositiveSmallIntegerField(help_text=help_sunshine_percentage, **integer_settings)
+    radiation = models.PositiveSmallIntegerField(help_text=help_radiation, **integer_settings)
+    precipitation_duration = TenthsField(help_text=help_precipitation_duration, **integer_settings)
+    precipitation = TenthsField(help_text=help_precipitation, **integer_settings)
+    max_precipitation = TenthsField(help_text=help_max_precipitation, **integer_settings)
+    max_precipitation_hour = models.PositiveSmallIntegerField(help_text=help_max_precipitation_hour,
+                                                              **integer_settings)
+    evapotranspiration = TenthsField(help_text=help_evapotranspiration, **integer_settings)
+    air_pressure = TenthsField(help_text=help_air_pressure, **integer_settings)
+    max_air_pressure = TenthsField(help_text=help_max_air_pressure, **integer_settings)
+    max_air_pressure_hour = models.PositiveSmallIntegerField(help_text=help_max_air_pressure_hour, **integer_settings)
+    min_air_pressure = TenthsField(help_text=help_min_air_pressure, **integer_settings)
+    min_air_pressure_hour = models.PositiveSmallIntegerField(help_text=help_min_air_pressure_hour, **integer_settings)
+    min_visibility = models.PositiveSmallIntegerField(help_text=help_min_visibility, **integer_settings)
+    min_visibility_hour = models.PositiveSmallIntegerField(help_text=help_min_visibility_hour, **integer_settings)
+    max_visibility = models.PositiveSmallIntegerField(help_text=help_max_visibility, **integer_settings)
+    max_visibility_hour = models.PositiveSmallIntegerField(help_text=help_max_visibility_hour, **integer_settings)
+    cloud_cover = models.PositiveSmallIntegerField(help_text=help_cloud_cover, **integer_settings)
+    relative_humidity = models.PositiveSmallIntegerField(help_text=help_relative_humidity, **integer_settings)
+    max_relative_humidity = models.PositiveSmallIntegerField(help_text=help_max_relative_humidity,
+                                                             **integer_settings)
+    max_relative_humidity_hour = models.PositiveSmallIntegerField(help_text=help_max_relative_humidity_hour,
+                                                                  **integer_settings)
+    min_relative_humidity = models.PositiveSmallIntegerField(help_text=help_min_relative_humidity,
+                                                             **integer_settings)
+    min_relative_humidity_hour = models.PositiveSmallIntegerField(help_text=help_min_relative_humidity_hour,
+                                                                  **integer_settings)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['station', 'day'], name='unique_station_day'),
+        ]
+
+
+class Aggregate(models.Model):
+    """
+    Minimum, maximum, sum and number of the hourly temperature, precipitation and sunshine measurements in a period
+
+    The mean is derived from the sum and the number of measurements, so that aggregates of longer periods can be
+    computed from the aggregates of shorter periods.
+    """
+
+    FIELDS = ['temperature', 'precipitation', 'sunshine']
+
+    integer_settings = {'null': True, 'blank': True, 'default': None}
+
+    temperature_min = TenthsField(**integer_settings)
+    temperature_max = TenthsField(**integer_settings)
+    temperature_sum = LargeTenthsField(**integer_settings)
+    temperature_count = models.PositiveIntegerField(default=0)
+    precipitation_min = TenthsField(**integer_settings)
+    precipitation_max = TenthsField(**integer_settings)
+    precipitation_sum = LargeTenthsField(**integer_settings)
+    precipitation_count = models.PositiveIntegerField(default=0)
+    sunshine_min = TenthsField(**integer_settings)
+    sunshine_max = TenthsField(**integer_settings)
+    sunshine_sum = LargeTenthsField(**integer_settings)
+    sunshine_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+    def mean(self, field: str) -> Optional[Decimal]:
+        count = getattr(self, f'{field}_count')
+        if not count:
+            return None
+        return getattr(self, f'{field}_sum') / count
+
+
+class DailyAggregate(Aggregate):
+    station = models.ForeignKey(Station, related_name='daily_aggregates', on_delete=models.CASCADE, db_index=False)
+    day = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['station', 'day'], name='unique_daily_aggregate'),
+        ]
+
+
+class MonthlyAggregate(Aggregate):
+    station = models.ForeignKey(Station, related_name='monthly_aggregates', on_delete=models.CASCADE,
+                                db_index=False)
+    month = models.DateField(help_text='First day of the month')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['station', 'month'], name='unique_monthly_aggregate'),
+        ]
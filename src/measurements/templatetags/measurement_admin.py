@@ -0,0 +1,84 @@
+from datetime import date
+
+from django import template
+from django.contrib.admin.templatetags.base import InclusionAdminNode
+from django.db.models import Max, Min
+from django.utils import formats
+from django.utils.text import capfirst
+from django.utils.translation import gettext as _
+
+register = template.Library()
+
+
+def range_date_hierarchy(cl):
+    """
+    Date hierarchy like the one of the admin, but with every year, month or day between the first and the last
+    measurement as a choice
+
+    The admin only lists the dates that have measurements, which needs a scan of all measurements in the selected
+    range. The first and the last measurement are a single index lookup each.
+    """
+
+    field_name = cl.date_hierarchy
+    year_field = f'{field_name}__year'
+    month_field = f'{field_name}__month'
+    day_field = f'{field_name}__day'
+    year_lookup = cl.params.get(year_field)
+    month_lookup = cl.params.get(month_field)
+    day_lookup = cl.params.get(day_field)
+
+    def link(filters):
+        return cl.get_query_string(filters, [f'{field_name}__'])
+
+    date_range = cl.queryset.aggregate(first=Min(field_name), last=Max(field_name))
+    first, last = date_range['first'], date_range['last']
+    if first is None:
+        return {'show': True, 'back': None, 'choices': []}
+    if not (year_lookup or month_lookup or day_lookup) and first.year == last.year:
+        year_lookup = first.year
+        if first.month == last.month:
+            month_lookup = first.month
+
+    if year_lookup and month_lookup and day_lookup:
+        day = date(int(year_lookup), int(month_lookup), int(day_lookup))
+        return {
+            'show': True,
+            'back': {
+                'link': link({year_field: year_lookup, month_field: month_lookup}),
+                'title': capfirst(formats.date_format(day, 'YEAR_MONTH_FORMAT'))
+            },
+            'choices': [{'title': capfirst(formats.date_format(day, 'MONTH_DAY_FORMAT'))}]
+        }
+    elif year_lookup and month_lookup:
+        days = [date(int(year_lookup), int(month_lookup), day) for day in range(first.day, last.day + 1)]
+        return {
+            'show': True,
+            'back': {'link': link({year_field: year_lookup}), 'title': str(year_lookup)},
+            'choices': [{
+                'link': link({year_field: year_lookup, month_field: month_lookup, day_field: day.day}),
+                'title': capfirst(formats.date_format(day, 'MONTH_DAY_FORMAT'))
+            } for day in days]
+        }
+    elif year_lookup:
+        months = [date(int(year_lookup), month, 1) for month in range(first.month, last.month + 1)]
+        return {
+            'show': True,
+            'back': {'link': link({}), 'title': _('All dates')},
+            'choices': [{
+                'link': link({year_field: year_lookup, month_field: month.month}),
+                'title': capfirst(formats.date_format(month, 'YEAR_MONTH_FORMAT'))
+            } for month in months]
+        }
+    else:
+        return {
+            'show': True,
+            'back': None,
+            'choices': [{'link': link({year_field: str(year)}), 'title': str(year)}
+                        for year in range(first.year, last.year + 1)]
+        }
+
+
+@register.tag(name='range_date_hierarchy')
+def range_date_hierarchy_tag(parser, token):
+    return InclusionAdminNode(parser, token, func=range_date_hierarchy, template_name='date_hierarchy.html',
+                              takes_context=False)
@@ -0,0 +1,60 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import List, Optional
+from unittest import mock
+
+import pytz
+from django.test import TestCase
+
+from measurements.aggregates import Aggregates
+from measurements.models import DailyAggregate, Measurement, MonthlyAggregate
+from stations.models import Station
+
+
+def create_measurements(station: Station, day: date, precipitation: List[Optional[str]],
+                        sunshine: List[Optional[str]] = None):
+    """
+    Create the first hours of a day, where -0.1 is the KNMI code for less than 0.05
+    """
+
+    start = datetime(day.year, day.month, day.day, tzinfo=pytz.utc)
+    sunshine = sunshine or [None] * len(precipitation)
+    Measurement.objects.bulk_create(
+        Measurement(station=station, time=start + timedelta(hours=hour), precipitation=value, sunshine=sunshine[hour])
+        for hour, value in enumerate(precipitation)
+    )
+
+
+@mock.patch('measurements.aggregates.touch_last_import', mock.Mock())
+class AggregatesTest(TestCase):
+    def setUp(self):
+        self.station = Station.objects.create(code=260, longitude=5.18, latitude=52.1, altitude=1.9, name='DE BILT')
+        create_measurements(self.station, date(2021, 1, 28), ['-0.1', '-0.1', '0.0', '1.2', '3.4', '5.6', '-0.1', None],
+                            ['-0.1', '0.5', None, None, None, None, None, None])
+        create_measurements(self.station, date(2021, 1, 29), ['-0.1', '-0.1'])
+
+    def test_less_than_counts_as_zero(self):
+        Aggregates.refresh([(260, datetime(2021, 1, 28, tzinfo=pytz.utc)),
+                            (260, datetime(2021, 1, 29, tzinfo=pytz.utc))])
+        self._assert_aggregates()
+
+    def test_rebuild(self):
+        Aggregates.rebuild()
+        self._assert_aggregates()
+
+    def _assert_aggregates(self):
+        daily = DailyAggregate.objects.get(station=self.station, day=date(2021, 1, 28))
+        self.assertEqual((daily.precipitation_min, daily.precipitation_max, daily.precipitation_sum),
+                         (Decimal('0.0'), Decimal('5.6'), Decimal('10.2')))
+        # The hours with less than 0.05 mm still count as measured
+        self.assertEqual(daily.precipitation_count, 7)
+        self.assertEqual((daily.sunshine_min, daily.sunshine_sum, daily.sunshine_count),
+                         (Decimal('0.0'), Decimal('0.5'), 2))
+
+        daily = DailyAggregate.objects.get(station=self.station, day=date(2021, 1, 29))
+        self.assertEqual((daily.precipitation_min, daily.precipitation_max, daily.precipitation_sum),
+                         (Decimal('0.0'), Decimal('0.0'), Decimal('0.0')))
+
+        monthly = MonthlyAggregate.objects.get(station=self.station, month=date(2021, 1, 1))
+        self.assertEqual((monthly.precipitation_min, monthly.precipitation_sum, monthly.precipitation_count),
+                         (Decimal('0.0'), Decimal('10.2'), 9))
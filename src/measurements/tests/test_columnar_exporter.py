@@ -0,0 +1,74 @@
+import os.path
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+
+import numpy as np
+import pytz
+from django.test import TestCase
+
+from data_sources.data_mode import DataMode
+from measurements.columnar_exporter import ColumnarArchive, ColumnarExporter
+from measurements.models import Measurement
+from stations.models import Station
+
+
+class ColumnarExporterTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+        for code in [260, 280]:
+            Station.objects.create(code=code, longitude=5, latitude=52, altitude=0, name=str(code))
+        Measurement.objects.bulk_create([
+            Measurement(station_id=260, time=datetime(2020, 12, 31, 23, tzinfo=pytz.utc), temperature=Decimal('-1.5')),
+            Measurement(station_id=260, time=datetime(2021, 1, 1, 0, tzinfo=pytz.utc), temperature=Decimal('-2.0'),
+                        mist=True, relative_humidity=97),
+            Measurement(station_id=260, time=datetime(2021, 1, 1, 1, tzinfo=pytz.utc)),
+            Measurement(station_id=280, time=datetime(2021, 6, 1, 12, tzinfo=pytz.utc), temperature=Decimal('21.3')),
+        ])
+
+    def test_round_trip(self):
+        archive_dir = ColumnarExporter.export(DataMode.per_hour, directory=self.directory)
+
+        archive = ColumnarArchive(archive_dir=archive_dir)
+        self.assertEqual(archive.partitions(), [(260, 2020), (260, 2021), (280, 2021)])
+        columns = archive.load(260, 2021)
+        self.assertEqual(columns['time'].tolist(), [datetime(2021, 1, 1, 0), datetime(2021, 1, 1, 1)])
+        self.assertEqual(columns['temperature'].dtype, np.float32)
+        np.testing.assert_array_equal(columns['temperature'], np.array([-2.0, np.nan], dtype=np.float32))
+        np.testing.assert_array_equal(columns['relative_humidity'], np.array([97, np.nan], dtype=np.float32))
+        self.assertEqual(columns['mist'].tolist(), [True, False])
+        # Columns are memory-mapped, not copied
+        self.assertIsInstance(columns['temperature'], np.memmap)
+        self.assertFalse(columns['temperature'].flags.writeable)
+
+        np.testing.assert_array_equal(archive.concatenate('temperature', years=[2021]),
+                                      np.array([-2.0, np.nan, 21.3], dtype=np.float32))
+        self.assertEqual([(station, year, len(columns['time'])) for station, year, columns in
+                          archive.iterate(stations=[260], fields=['time'])], [(260, 2020, 1), (260, 2021, 2)])
+
+    def test_remove_stale_partitions(self):
+        archive_dir = ColumnarExporter.export(DataMode.per_hour, directory=self.directory)
+        Measurement.objects.filter(time__year=2020).delete()
+        Measurement.objects.filter(station_id=280).delete()
+        archive = ColumnarArchive(archive_dir=archive_dir)
+
+        # Partitions outside the exported stations and years are kept
+        ColumnarExporter.export(DataMode.per_hour, start=date(2021, 1, 1), end=date(2021, 12, 31), stations=[260],
+                                directory=self.directory)
+        self.assertEqual(archive.partitions(), [(260, 2020), (260, 2021), (280, 2021)])
+
+        ColumnarExporter.export(DataMode.per_hour, start=date(2021, 1, 1), end=date(2021, 12, 31),
+                                directory=self.directory)
+        self.assertEqual(archive.partitions(), [(260, 2020), (260, 2021)])
+        self.assertFalse(os.path.exists(os.path.join(archive_dir, '280')))
+
+        ColumnarExporter.export(DataMode.per_hour, directory=self.directory)
+        self.assertEqual(archive.partitions(), [(260, 2021)])
+
+    def test_export_whole_years(self):
+        for start, end in [(date(2021, 1, 2), None), (None, date(2021, 12, 30))]:
+            with self.assertRaises(AssertionError):
+                ColumnarExporter.export(DataMode.per_hour, start=start, end=end, directory=self.directory)
@@ -0,0 +1,84 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+import pytz
+from django.test import SimpleTestCase, TestCase
+
+from measurements.downsampling import Downsampler
+from measurements.models import Measurement
+from stations.models import Station
+
+
+class DownsamplerTest(SimpleTestCase):
+    def setUp(self):
+        # A random walk with a single peak and dip, like a year of hourly temperatures
+        random = np.random.default_rng(1)
+        self.y = np.cumsum(random.normal(size=8760))
+        self.peak, self.dip = 3000, 6000
+        self.y[self.peak] = self.y.max() + 50
+        self.y[self.dip] = self.y.min() - 50
+        self.x = np.arange(len(self.y), dtype=float) * 3600
+
+    def test_lttb(self):
+        for points in [3, 4, 100, 1000, 8759]:
+            with self.subTest(points=points):
+                indices = Downsampler.lttb(self.x, self.y, points)
+                self.assertEqual(len(indices), points)
+                self.assertTrue((np.diff(indices) > 0).all())
+                self.assertEqual((indices[0], indices[-1]), (0, len(self.y) - 1))
+
+        indices = Downsampler.lttb(self.x, self.y, 100)
+        self.assertIn(self.peak, indices)
+        self.assertIn(self.dip, indices)
+
+    def test_min_max(self):
+        for points in [2, 3, 100, 1000]:
+            with self.subTest(points=points):
+                indices = Downsampler.min_max(self.y, points)
+                # Every bucket keeps two points, and a random walk never has the same minimum and maximum in one
+                self.assertEqual(len(indices), points // 2 * 2)
+                self.assertTrue((np.diff(indices) > 0).all())
+                self.assertIn(self.peak, indices)
+                self.assertIn(self.dip, indices)
+
+        # Every bucket keeps its own extremes
+        indices = Downsampler.min_max(self.y, 100)
+        edges = np.linspace(0, len(self.y), 51).astype(np.int64)
+        for first, last in zip(edges[:-1], edges[1:]):
+            self.assertIn(first + np.argmin(self.y[first:last]), indices)
+            self.assertIn(first + np.argmax(self.y[first:last]), indices)
+
+    def test_short_series(self):
+        self.assertEqual(Downsampler.lttb(self.x[:5], self.y[:5], 5).tolist(), [0, 1, 2, 3, 4])
+        self.assertEqual(Downsampler.min_max(self.y[:5], 10).tolist(), [0, 1, 2, 3, 4])
+        self.assertEqual(Downsampler.lttb(self.x[:0], self.y[:0], 10).tolist(), [])
+
+    def test_too_few_points(self):
+        with self.assertRaises(AssertionError):
+            Downsampler.lttb(self.x, self.y, 2)
+        with self.assertRaises(AssertionError):
+            Downsampler.min_max(self.y, 1)
+
+
+class DownsamplerSeriesTest(TestCase):
+    def test_series(self):
+        station = Station.objects.create(code=260, longitude=5.18, latitude=52.1, altitude=1.9, name='DE BILT')
+        start = datetime(2021, 1, 28, tzinfo=pytz.utc)
+        Measurement.objects.bulk_create(
+            Measurement(station=station, time=start + timedelta(hours=hour),
+                        temperature=None if hour == 5 else Decimal(hour % 7))
+            for hour in range(48)
+        )
+
+        times, values = Downsampler.series(260, 'temperature', start=date(2021, 1, 29), points=10)
+
+        self.assertEqual(len(times), 10)
+        self.assertEqual((times[0], times[-1]), (int((start + timedelta(hours=24)).timestamp()),
+                                                 int((start + timedelta(hours=47)).timestamp())))
+        self.assertEqual(values.max(), 6)
+
+        # Missing measurements are left out
+        times, values = Downsampler.series(260, 'temperature', end=date(2021, 1, 28), points=100, method='minmax')
+        self.assertEqual(len(times), 23)
+        self.assertNotIn(int((start + timedelta(hours=5)).timestamp()), times.tolist())
@@ -0,0 +1,103 @@
+import os.path
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+from unittest import mock
+
+import pytz
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+from measurements.models import DailyAggregate, MonthlyAggregate
+
+
+class CompactIntegerStorageMigrationTest(TransactionTestCase):
+    """
+    Migrate hourly measurements to the compact storage of 0004 and back again
+    """
+
+    BEFORE = [('measurements', '0003_dailymeasurement')]
+    AFTER = [('measurements', '0004_compact_integer_storage')]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_round_trip(self):
+        # The KNMI numbers hours 1 to 24, where hour 1 is the hour that starts at midnight
+        rows = [
+            (date(2021, 1, 28), 1, datetime(2021, 1, 28, 0, tzinfo=pytz.utc), Decimal('-3.5')),
+            (date(2021, 1, 28), 13, datetime(2021, 1, 28, 12, tzinfo=pytz.utc), Decimal('2.0')),
+            (date(2021, 1, 28), 24, datetime(2021, 1, 28, 23, tzinfo=pytz.utc), Decimal('0.1')),
+        ]
+        apps = self._migrate(self.BEFORE)
+        station = apps.get_model('stations', 'Station').objects.create(
+            code=260, longitude=5.18, latitude=52.1, altitude=1.9, name='De Bilt'
+        )
+        measurement_model = apps.get_model('measurements', 'Measurement')
+        for day, hour, time, temperature in rows:
+            measurement_model.objects.create(station=station, day=day, hour=hour, time=time, temperature=temperature)
+
+        apps = self._migrate(self.AFTER)
+        self.assertEqual(
+            list(apps.get_model('measurements', 'Measurement').objects.order_by('time').values_list('temperature')),
+            [(temperature,) for _, _, _, temperature in rows]
+        )
+
+        apps = self._migrate(self.BEFORE)
+        self.assertEqual(
+            list(apps.get_model('measurements', 'Measurement').objects.order_by('time')
+                 .values_list('day', 'hour', 'time', 'temperature')),
+            rows
+        )
+
+    @staticmethod
+    def _migrate(targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        executor.loader.build_graph()
+        return executor.loader.project_state(targets).apps
+
+
+class LessThanAggregatesMigrationTest(TransactionTestCase):
+    """
+    Recompute the aggregates that were computed with -0.1 for less than 0.05 precipitation
+    """
+
+    BEFORE = [('measurements', '0006_anomaly_scores')]
+    AFTER = [('measurements', '0007_clamp_less_than_aggregates')]
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch('common.utils.last_import_file', os.path.join(directory.name, 'last_import'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_refresh(self):
+        apps = CompactIntegerStorageMigrationTest._migrate(self.BEFORE)
+        station = apps.get_model('stations', 'Station').objects.create(
+            code=260, longitude=5.18, latitude=52.1, altitude=1.9, name='De Bilt'
+        )
+        measurement_model = apps.get_model('measurements', 'Measurement')
+        for hour, precipitation in enumerate(['-0.1', '-0.1', '1.2', '3.4', '5.6']):
+            measurement_model.objects.create(station=station, time=datetime(2021, 1, 28, hour, tzinfo=pytz.utc),
+                                             precipitation=Decimal(precipitation))
+        # As computed before the KNMI code for less than 0.05 counted as 0
+        apps.get_model('measurements', 'DailyAggregate').objects.create(
+            station=station, day=date(2021, 1, 28), precipitation_min=Decimal('-0.1'),
+            precipitation_max=Decimal('5.6'), precipitation_sum=Decimal('10.0'), precipitation_count=5
+        )
+
+        CompactIntegerStorageMigrationTest._migrate(self.AFTER)
+
+        daily = DailyAggregate.objects.get(station_id=260, day=date(2021, 1, 28))
+        self.assertEqual((daily.precipitation_min, daily.precipitation_sum, daily.precipitation_count),
+                         (Decimal('0.0'), Decimal('10.2'), 5))
+        monthly = MonthlyAggregate.objects.get(station_id=260, month=date(2021, 1, 1))
+        self.assertEqual((monthly.precipitation_min, monthly.precipitation_sum), (Decimal('0.0'), Decimal('10.2')))
@@ -2,16 +2,19 @@ import csv
 import logging
 import os.path
 
-from django.core.management import BaseCommand
 from django.db import transaction
 
-from common.utils import data_dir
+from common import instrumentation
+from common.instrumentation import InstrumentedCommand
+from common.utils import data_dir, touch_last_import
+from measurements.latest import LatestObservations
 from stations.models import Station
+from stations.spatial import StationIndex
 
 logger = logging.getLogger(__name__)
 
 
-class Command(BaseCommand):
+class Command(InstrumentedCommand):
     help = 'Reset the list of stations based on the input csv file'
 
     def handle(self, *args, **options):
@@ -29,7 +32,13 @@ class Command(BaseCommand):
             return
 
         with transaction.atomic():
-            Station.objects.all().delete()
-            Station.objects.bulk_create(stations)
+            with instrumentation.stage('delete'):
+                Station.objects.all().delete()
+            with instrumentation.stage('bulk_create'):
+                Station.objects.bulk_create(stations)
+        instrumentation.count('stations', len(stations))
+        touch_last_import()
+        StationIndex.invalidate()
+        LatestObservations.invalidate()
 
         logger.info(f'{len(stations)} stations processed')
@@ -0,0 +1,157 @@
+import heapq
+import math
+import threading
+from typing import List, Optional, Sequence, Tuple
+
+from common.utils import last_import
+from stations.models import Station
+
+EARTH_RADIUS_KM = 6371.0
+
+Point = Tuple[float, float, float]
+
+
+class KdTree:
+    """
+    Three-dimensional KD-tree for k-nearest and within-radius queries on squared Euclidean distances
+
+    Every node is a tuple (index of its point, split axis, left subtree, right subtree), split on the median of the
+    axis with the largest spread.
+    """
+
+    def __init__(self, points: Sequence[Point]):
+        self.points = list(points)
+        self._root = self._build(list(range(len(self.points))))
+
+    def _build(self, indices: List[int]) -> Optional[tuple]:
+        if not indices:
+            return None
+        axis = max(range(3), key=lambda a: max(self.points[i][a] for i in indices) -
+                                           min(self.points[i][a] for i in indices))
+        indices.sort(key=lambda i: self.points[i][axis])
+        median = len(indices) // 2
+        return indices[median], axis, self._build(indices[:median]), self._build(indices[median + 1:])
+
+    def nearest(self, point: Point, k: int = 1) -> List[Tuple[float, int]]:
+        """
+        :return: Squared distances and indices of the k points nearest to the given point, nearest first
+        """
+
+        heap = []  # Max-heap of the best k candidates, by negating their distances
+
+        def search(node):
+            if node is None:
+                return
+            index, axis, left, right = node
+            self._push(heap, k, self._distance(point, self.points[index]), index)
+            offset = point[axis] - self.points[index][axis]
+            near, far = (left, right) if offset < 0 else (right, left)
+            search(near)
+            if len(heap) < k or offset * offset < -heap[0][0]:
+                search(far)
+
+        if k > 0:
+            search(self._root)
+        return sorted((-distance, index) for distance, index in heap)
+
+    def within(self, point: Point, radius: float) -> List[Tuple[float, int]]:
+        """
+        :return: Squared distances and indices of all points within the radius of the given point, nearest first
+        """
+
+        found = []
+        squared_radius = radius * radius
+
+        def search(node):
+            if node is None:
+                return
+            index, axis, left, right = node
+            distance = self._distance(point, self.points[index])
+            if distance <= squared_radius:
+                found.append((distance, index))
+            offset = point[axis] - self.points[index][axis]
+            if offset <= radius:
+                search(left)
+            if offset >= -radius:
+                search(right)
+
+        search(self._root)
+        return sorted(found)
+
+    @staticmethod
+    def _push(heap: List[Tuple[float, int]], k: int, distance: float, index: int):
+        if len(heap) < k:
+            heapq.heappush(heap, (-distance, index))
+        elif distance < -heap[0][0]:
+            heapq.heapreplace(heap, (-distance, index))
+
+    @staticmethod
+    def _distance(a: Point, b: Point) -> float:
+        return (a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2 + (a[2] - b[2]) ** 2
+
+
+class StationIndex:
+    """
+    In-process spatial index of all stations
+
+    Stations are placed on the unit sphere, where the straight-line distance between two points only grows with
+    their distance over the surface of the earth, so a KD-tree gives the same nearest stations as the great-circle
+    distance. Distances are returned in kilometers over the surface.
+
+    Use StationIndex.get() for the shared index. It is built on first use and rebuilt when the stations may have
+    changed, which is after reset_stations or an import in any process.
+    """
+
+    _instance = None
+    _version = None
+    _lock = threading.Lock()
+
+    def __init__(self, stations: List[Station]):
+        self.stations = stations
+        self._tree = KdTree([self._to_point(station.latitude, station.longitude) for station in stations])
+
+    @classmethod
+    def get(cls) -> 'StationIndex':
+        version = last_import()
+        with cls._lock:
+            if cls._instance is None or version != cls._version:
+                cls._instance = cls(list(Station.objects.all()))
+                cls._version = version
+            return cls._instance
+
+    @classmethod
+    def invalidate(cls):
+        """
+        Rebuild the shared index on its next use
+        """
+
+        with cls._lock:
+            cls._instance = None
+
+    def nearest(self, latitude: float, longitude: float, k: int = 1) -> List[Tuple[Station, float]]:
+        """
+        :return: The k stations nearest to the location with their distances in km, nearest first
+        """
+
+        point = self._to_point(latitude, longitude)
+        return [(self.stations[index], self._to_km(distance)) for distance, index in self._tree.nearest(point, k)]
+
+    def within(self, latitude: float, longitude: float, radius_km: float) -> List[Tuple[Station, float]]:
+        """
+        :return: All stations within the radius around the location with their distances in km, nearest first
+        """
+
+        # A radius of more than half the circumference of the earth covers every station
+        chord = 2 * math.sin(min(radius_km / EARTH_RADIUS_KM, math.pi) / 2)
+        point = self._to_point(latitude, longitude)
+        return [(self.stations[index], self._to_km(distance)) for distance, index in self._tree.within(point, chord)]
+
+    @staticmethod
+    def _to_point(latitude: float, longitude: float) -> Point:
+        latitude, longitude = math.radians(latitude), math.radians(longitude)
+        return (math.cos(latitude) * math.cos(longitude), math.cos(latitude) * math.sin(longitude),
+                math.sin(latitude))
+
+    @staticmethod
+    def _to_km(squared_chord: float) -> float:
+        return 2 * EARTH_RADIUS_KM * math.asin(min(math.sqrt(squared_chord) / 2, 1.0))
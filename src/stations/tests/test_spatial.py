@@ -0,0 +1,109 @@
+import math
+import os.path
+import random
+import tempfile
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from measurements.latest import LatestObservations
+from stations.models import Station
+from stations.spatial import EARTH_RADIUS_KM, KdTree, StationIndex
+
+
+def great_circle_km(latitude1: float, longitude1: float, latitude2: float, longitude2: float) -> float:
+    latitude1, longitude1, latitude2, longitude2 = map(math.radians, [latitude1, longitude1, latitude2, longitude2])
+    a = math.sin((latitude2 - latitude1) / 2) ** 2 + \
+        math.cos(latitude1) * math.cos(latitude2) * math.sin((longitude2 - longitude1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class KdTreeTest(SimpleTestCase):
+    def test_against_brute_force(self):
+        generator = random.Random(1)
+        points = [tuple(generator.uniform(-1, 1) for _ in range(3)) for _ in range(500)]
+        # Duplicates end up on both sides of a split
+        points += points[:20]
+        tree = KdTree(points)
+
+        for _ in range(50):
+            query = tuple(generator.uniform(-1.2, 1.2) for _ in range(3))
+            distances = sorted((KdTree._distance(query, point), index) for index, point in enumerate(points))
+            for k in [1, 7, len(points), len(points) + 5]:
+                self.assertEqual([distance for distance, _ in tree.nearest(query, k)],
+                                 [distance for distance, _ in distances[:k]])
+            for radius in [0.0, 0.1, 0.5, 4.0]:
+                self.assertEqual(tree.within(query, radius),
+                                 [(distance, index) for distance, index in distances if distance <= radius ** 2])
+
+    def test_empty(self):
+        tree = KdTree([])
+        self.assertEqual(tree.nearest((0, 0, 1), 3), [])
+        self.assertEqual(tree.within((0, 0, 1), 1), [])
+        self.assertEqual(KdTree([(0, 0, 1)]).nearest((0, 0, 1), 0), [])
+
+
+class StationIndexTest(TestCase):
+    """
+    Compare the nearest stations and the stations within a radius with the great-circle distances to every station
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for patcher in [
+            mock.patch('common.utils.last_import_file', os.path.join(directory.name, 'last_import')),
+            mock.patch.object(LatestObservations, 'FILE', os.path.join(directory.name, 'latest.pickle')),
+            mock.patch.object(StationIndex, '_instance', None),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        call_command('reset_stations')
+        self.stations = list(Station.objects.all())
+        self.index = StationIndex.get()
+
+    def test_nearest(self):
+        for latitude, longitude in self._locations():
+            distances = self._distances(latitude, longitude)
+            for k in [1, 3, len(self.stations), len(self.stations) + 1]:
+                nearest = self.index.nearest(latitude, longitude, k)
+                self.assertEqual(len(nearest), min(k, len(self.stations)))
+                for (station, distance), expected in zip(nearest, distances):
+                    self.assertAlmostEqual(distance, expected[0], places=6)
+                    self.assertAlmostEqual(distance, self._distance(station, latitude, longitude), places=6)
+
+    def test_within(self):
+        for latitude, longitude in self._locations():
+            distances = self._distances(latitude, longitude)
+            for radius in [0, 10, 50, 150, 20050]:
+                within = self.index.within(latitude, longitude, radius)
+                # Stations right on the border may fall on either side through rounding
+                expected = [code for distance, code in distances if distance < radius - 1e-6]
+                self.assertEqual([station.code for station, _ in within][:len(expected)], expected)
+                self.assertTrue(all(distance <= radius + 1e-6 for _, distance in within))
+                self.assertLessEqual(len(within), sum(1 for distance, _ in distances if distance <= radius + 1e-6))
+
+        # A station is at distance 0 of itself
+        station = self.stations[0]
+        self.assertEqual([(found.code, distance) for found, distance in self.index.within(
+            float(station.latitude), float(station.longitude), 0)], [(station.code, 0)])
+
+    def test_rebuilt_after_import(self):
+        Station.objects.filter(code=self.stations[0].code).delete()
+        self.assertIs(StationIndex.get(), self.index)
+        call_command('reset_stations')
+        self.assertIsNot(StationIndex.get(), self.index)
+
+    def _locations(self):
+        generator = random.Random(1)
+        # Locations in and around the Netherlands, and a few far away
+        locations = [(generator.uniform(50, 54), generator.uniform(2, 8)) for _ in range(30)]
+        return locations + [(-52, -175), (89.9, 0), (0, 0)]
+
+    def _distances(self, latitude: float, longitude: float):
+        return sorted((self._distance(station, latitude, longitude), station.code) for station in self.stations)
+
+    @staticmethod
+    def _distance(station: Station, latitude: float, longitude: float) -> float:
+        return great_circle_km(float(station.latitude), float(station.longitude), latitude, longitude)